@@ -31,6 +31,16 @@ module alu
     assign adder_result = $signed(operand_a_i) + $signed(adder_op_b);
 
 
+    ///////////////////////////
+    // shifter
+    ///////////////////////////
+    localparam SHAMT_WIDTH = $clog2(DATA_WIDTH);
+
+    logic [SHAMT_WIDTH-1:0] shamt;                  // only the lower bits of operand b, like RV32I shifts
+
+    assign shamt = operand_b_i[SHAMT_WIDTH-1:0];
+
+
     ////////////////////////////////////////
     // rest of ALU and result MUX
     ///////////////////////////////////////
@@ -48,15 +58,19 @@ module alu
             ALU_XOR:            result_o = operand_a_i ^ operand_b_i;
 
             // shifts
-            ALU_SRL:            result_o = operand_a_i >>  operand_b_i;
-            ALU_SRA:            result_o = $signed(operand_a_i) >>> operand_b_i;
-            ALU_SLL:            result_o = operand_a_i <<  operand_b_i;
+            ALU_SRL:            result_o = operand_a_i >>  shamt;
+            ALU_SRA:            result_o = $signed(operand_a_i) >>> shamt;
+            ALU_SLL:            result_o = operand_a_i <<  shamt;
 
             //comparisons
-            ALU_SLT, ALU_SLTU:  result_o[0] = $signed(operand_a_i) < $signed(operand_b_i);
-            ALU_LES, ALU_LEU:   result_o[0] = $signed(operand_a_i) <= $signed(operand_b_i);
-            ALU_GTS, ALU_GTU:   result_o[0] = $signed(operand_a_i) >  $signed(operand_b_i);
-            ALU_GES, ALU_GEU:   result_o[0] = $signed(operand_a_i) >= $signed(operand_b_i);
+            ALU_SLT:            result_o[0] = $signed(operand_a_i) <  $signed(operand_b_i);
+            ALU_LES:            result_o[0] = $signed(operand_a_i) <= $signed(operand_b_i);
+            ALU_GTS:            result_o[0] = $signed(operand_a_i) >  $signed(operand_b_i);
+            ALU_GES:            result_o[0] = $signed(operand_a_i) >= $signed(operand_b_i);
+            ALU_SLTU:           result_o[0] = operand_a_i <  operand_b_i;
+            ALU_LEU:            result_o[0] = operand_a_i <= operand_b_i;
+            ALU_GTU:            result_o[0] = operand_a_i >  operand_b_i;
+            ALU_GEU:            result_o[0] = operand_a_i >= operand_b_i;
             ALU_EQ:             result_o[0] = operand_a_i == operand_b_i;
             ALU_NE:             result_o[0] = operand_a_i != operand_b_i;
 
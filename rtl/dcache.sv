@@ -24,7 +24,7 @@ module dcache #(
     localparam SIZE_LAU      = 1024;  // in LAU
     localparam N_BYTES      = DATA_WIDTH / LAU;
 
-    logic [LAU-1:0] mem [0:SIZE_LAU];
+    logic [LAU-1:0] mem [0:SIZE_LAU] /* verilator public_flat_rw */;
 
     always @ (posedge clk)
     begin
@@ -65,9 +65,14 @@ always_comb begin: instruction_decoder
     rf_wp_mux_sel_o         = RF_WP_A_SEL_ALU;        // ALU
     ctrl_trans_instr_o   = CTRL_TRANS_SEL_NONE;        // none
 
+    alu_operator_o          = ALU_ADD;
+    alu_op_a_mux_sel_o      = ALU_OP_A_SEL_REG;
+    alu_op_b_mux_sel_o      = ALU_OP_B_SEL_REG;
+
     data_req_o  = 1'b0;
     data_type_o = 2'b10;                    // word
     data_we_o     = 1'b0;                   // load
+    data_sign_ext_o = 1'b0;
 
     unique case (instr_i[6:0])
 
@@ -132,6 +137,13 @@ always_comb begin: instruction_decoder
                 end
 
             endcase
+
+            // funct7 is zero, only sub and sra set bit 30
+            if ( !( (instr_i[31:25] == 7'b000_0000) ||
+                    (instr_i[31:25] == 7'b010_0000 && (instr_i[14:12] == 3'b000 || instr_i[14:12] == 3'b101)) ) )
+            begin
+                instr_invalid_o = 1'b1;
+            end
         end
 
         I_TYPE: begin
@@ -174,6 +186,8 @@ always_comb begin: instruction_decoder
                 3'b001: begin        // slli
                     alu_operator_o = ALU_SLL;
                     imm_o    = { {27{1'b0}}, instr_i[24:20]};    // zero extented shift amount
+
+                    if (instr_i[31:25] != 7'b000_0000) instr_invalid_o = 1'b1;
                 end
 
                 3'b101: begin       // srai   
@@ -189,6 +203,8 @@ always_comb begin: instruction_decoder
                     begin
                         alu_operator_o = ALU_SRL;
                     end
+
+                    if ( (instr_i[31:25] != 7'b000_0000) && (instr_i[31:25] != 7'b010_0000) ) instr_invalid_o = 1'b1;
                 end
 
 
@@ -280,6 +296,8 @@ always_comb begin: instruction_decoder
                 rs1_used_o          = 1'b1;
                 alu_op_a_mux_sel_o  = ALU_OP_A_SEL_REG;
                 imm_o               = { {21{instr_i[31]}} , instr_i[30:20]};
+
+                if (instr_i[14:12] != 3'b000) instr_invalid_o = 1'b1;
             end
         end
 
@@ -296,17 +314,17 @@ always_comb begin: instruction_decoder
 
             data_req_o  = 1'b1;
 
-            unique case (instr_i[13:12])
-                2'b00:  data_type_o = 2'b00;        // byte
-                2'b01:  data_type_o = 2'b01;        // halfword
-                2'b10:  data_type_o = 2'b10;        // word
-                2'b11:  instr_invalid_o = 1'b1;
+            unique case (instr_i[14:12])
+                3'b000, 3'b100: data_type_o = 2'b00;    // byte, lb / lbu
+                3'b001, 3'b101: data_type_o = 2'b01;    // halfword, lh / lhu
+                3'b010:         data_type_o = 2'b10;    // word
+                default:        instr_invalid_o = 1'b1;
             endcase
 
-            imm_valid_o = 1'b1;
+            data_sign_ext_o = !instr_i[14];             // lbu and lhu zero extend the loaded data
 
-            if (instr_i[14]) imm_o = { {20{1'b0}}, instr_i[31:20]};       // zero extend
-            else           imm_o = { { 21{instr_i[31]} }, instr_i[30:20]};  // sign extend
+            imm_valid_o = 1'b1;
+            imm_o       = { { 21{instr_i[31]} }, instr_i[30:20]};  // the offset is always sign extended
 
         end
 
@@ -0,0 +1,168 @@
+"""
+Vectorized reference model of rtl/alu.sv for any DATA_WIDTH up to 32 bit.
+
+Operands and results are unsigned DATA_WIDTH bit values held in uint64 arrays, signed
+operations work on the two's complement reinterpretation in int64:
+
+    a, b     = random_operands(ALU_SRA, 100_000, width=32, rng=np.random.default_rng())
+    expected = alu(ALU_SRA, a, b, width=32)
+
+"""
+
+from constants_pkg import *
+import numpy as np
+
+
+# alu_opcode_e, name -> encoding
+OPERATORS = {
+    'ADD'   : ALU_ADD,  'SUB'   : ALU_SUB,  'ADDU'  : ALU_ADDU, 'SUBU'  : ALU_SUBU,
+    'AND'   : ALU_AND,  'OR'    : ALU_OR,   'XOR'   : ALU_XOR,
+    'SRL'   : ALU_SRL,  'SRA'   : ALU_SRA,  'SLL'   : ALU_SLL,
+    'SLT'   : ALU_SLT,  'SLTU'  : ALU_SLTU, 'LES'   : ALU_LES,  'LEU'   : ALU_LEU,
+    'GTS'   : ALU_GTS,  'GTU'   : ALU_GTU,  'GES'   : ALU_GES,  'GEU'   : ALU_GEU,
+    'EQ'    : ALU_EQ,   'NE'    : ALU_NE,
+}
+
+SHIFTS      = {ALU_SRL, ALU_SRA, ALU_SLL}
+COMPARISONS = {ALU_SLT, ALU_SLTU, ALU_LES, ALU_LEU, ALU_GTS, ALU_GTU, ALU_GES, ALU_GEU, ALU_EQ, ALU_NE}
+
+
+def _signed(x : np.ndarray, width : int) -> np.ndarray:
+    sign = np.int64(1 << (width - 1))
+    return (x.astype(np.int64) ^ sign) - sign
+
+
+def shamt_bits(width : int) -> int:
+    """ Bits of operand b used as shift amount, $clog2(DATA_WIDTH) """
+    return (width - 1).bit_length()
+
+
+def alu(operator : int, a, b, width : int = 32) -> np.ndarray:
+    """ Expected result_o for arrays of operands """
+
+    mask    = np.uint64((1 << width) - 1)
+    a       = np.asarray(a, dtype=np.uint64) & mask
+    b       = np.asarray(b, dtype=np.uint64) & mask
+    shamt   = b & np.uint64((1 << shamt_bits(width)) - 1)
+
+    if operator in (ALU_ADD, ALU_ADDU):
+        return (a + b) & mask
+    if operator in (ALU_SUB, ALU_SUBU):
+        return (a - b) & mask
+    if operator == ALU_AND:
+        return a & b
+    if operator == ALU_OR:
+        return a | b
+    if operator == ALU_XOR:
+        return a ^ b
+    if operator == ALU_SRL:
+        return a >> shamt
+    if operator == ALU_SRA:
+        return (_signed(a, width) >> shamt.astype(np.int64)).astype(np.uint64) & mask
+    if operator == ALU_SLL:
+        return (a << shamt) & mask
+
+    sa, sb = _signed(a, width), _signed(b, width)
+    compare = {
+        ALU_SLT : lambda: sa <  sb,     ALU_SLTU : lambda: a <  b,
+        ALU_LES : lambda: sa <= sb,     ALU_LEU  : lambda: a <= b,
+        ALU_GTS : lambda: sa >  sb,     ALU_GTU  : lambda: a >  b,
+        ALU_GES : lambda: sa >= sb,     ALU_GEU  : lambda: a >= b,
+        ALU_EQ  : lambda: a == b,       ALU_NE   : lambda: a != b,
+    }
+    if operator in compare:
+        return compare[operator]().astype(np.uint64)
+
+    return np.zeros(np.broadcast(a, b).shape, dtype=np.uint64)     # default branch of the case statement
+
+
+
+def corner_values(width : int) -> np.ndarray:
+    """ 0, 1, 2, -1, -2, most negative and most positive value and their neighbours """
+
+    mask, sign = (1 << width) - 1, 1 << (width - 1)
+    return np.unique(np.array([0, 1, 2, mask, mask - 1, sign, sign + 1, sign - 1, sign - 2], dtype=np.uint64))
+
+
+def random_operands(operator : int, n : int, width : int = 32, rng : np.random.Generator = None):
+    """ n operand pairs, every pair of corner values first, then random values shaped for the operator """
+
+    rng     = rng or np.random.default_rng()
+    mask    = (1 << width) - 1
+
+    corners = corner_values(width)
+    ca, cb  = np.meshgrid(corners, corners)
+    ca, cb  = ca.ravel(), cb.ravel()
+
+    m       = max(n - len(ca), 0)
+    a       = rng.integers(0, mask, m, dtype=np.uint64, endpoint=True)
+    b       = rng.integers(0, mask, m, dtype=np.uint64, endpoint=True)
+    part    = rng.integers(0, 4, m)
+
+    if operator in SHIFTS:
+        # mostly in range shift amounts, the rest checks that upper bits of b are ignored
+        in_range = part < 3
+        b[in_range] = rng.integers(0, width, in_range.sum(), dtype=np.uint64)
+
+    elif operator in COMPARISONS:
+        # equal operands, off by one, and operands that only differ in the sign bit
+        b = np.where(part == 0, a, b)
+        b = np.where(part == 1, (a + rng.integers(0, 2, m, dtype=np.uint64) * 2 - 1) & np.uint64(mask), b)
+        b = np.where(part == 2, a ^ np.uint64(1 << (width - 1)), b)
+
+    return np.concatenate([ca, a])[:n], np.concatenate([cb, b])[:n]
+
+
+
+def mismatch_report(name : str, a : np.ndarray, b : np.ndarray, expected : np.ndarray, actual : np.ndarray,
+                    limit : int = 5) -> str:
+    """ One line summary of mismatching vectors with the first few examples, None if all match """
+
+    bad = np.flatnonzero(expected != actual)
+    if len(bad) == 0:
+        return None
+
+    examples = ", ".join(f"{int(a[k]):#x} {name} {int(b[k]):#x} = {int(expected[k]):#x} got {int(actual[k]):#x}"
+                         for k in bad[:limit])
+    return f"{name}: {len(bad)}/{len(expected)} vectors failed, e.g. {examples}"
+
+
+
+def exhaustive_operands(width : int):
+    """ Every operand pair of a width bit ALU, a major """
+
+    values = np.arange(1 << width, dtype=np.uint64)
+    return np.repeat(values, len(values)), np.tile(values, len(values))
+
+
+
+class CoverageBitmap:
+    """ One bit per operator and operand pair, for sweeps of reduced width ALUs """
+
+    def __init__(self, width : int, operators : dict = OPERATORS):
+
+        self.width      = width
+        self.operators  = list(operators)
+        self.bits       = np.zeros((len(self.operators), (1 << (2*width)) // 8), dtype=np.uint8)
+
+
+    def sample(self, name : str, a : np.ndarray, b : np.ndarray):
+        """ Mark the operand pairs applied to operator name """
+
+        hit = np.unpackbits(self.bits[self.operators.index(name)])
+        hit[(a.astype(np.uint64) << np.uint64(self.width)) | b.astype(np.uint64)] = 1
+        self.bits[self.operators.index(name)] = np.packbits(hit)
+
+
+    def covered(self, name : str = None) -> float:
+        """ Fraction of operand pairs applied, to one or all operators """
+
+        bits = self.bits if name is None else self.bits[self.operators.index(name)]
+        return np.unpackbits(bits).mean()
+
+
+    def holes(self, name : str, limit : int = 5) -> list:
+        """ First operand pairs never applied to operator name """
+
+        missing = np.flatnonzero(np.unpackbits(self.bits[self.operators.index(name)]) == 0)[:limit]
+        return [(int(k) >> self.width, int(k) & ((1 << self.width) - 1)) for k in missing]
@@ -0,0 +1,238 @@
+"""
+Branch predictor evaluation on the branch streams of commit traces (commit_trace.py, make
+COMMIT_TRACE=...). program_counter.sv has no prediction, a pipelined core fetches past every
+branch and flushes when it is taken. Evaluated direction predictors:
+
+    btfn        static, backward taken forward not taken
+    bimodal     table of 2 bit counters indexed by pc
+    gshare      table of 2 bit counters indexed by pc xor global history
+
+optionally combined with a direct mapped branch target buffer (BTB) of taken branches and jumps.
+
+Cycle estimate, defaults as the 5 stage pipeline of pipeline_model.py: a redirect from execute
+costs RESOLVE cycles, from decode DECODE cycles. Without prediction taken branches and jalr cost
+RESOLVE, jal DECODE. With a predictor a wrong direction costs RESOLVE, a correctly predicted taken
+branch DECODE for its target, nothing if the BTB holds it. A BTB hit also saves the redirect of
+jumps. Savings are against no prediction.
+
+Counter tables are evaluated without a loop over branches: the counter updates of each table
+entry are composed with a segmented prefix scan over the 4 state transition tables. The scan is
+a Python loop of log2(branches) numpy passes over all branches, 17 for 100000 branches, run once
+for bimodal and once for gshare per table size.
+
+    python verification/unittests/branch_predictor.py commit.trace
+    python verification/unittests/branch_predictor.py commit.*.trace --sizes 16,64,256 --btb 0,8,32
+
+"""
+
+import argparse
+import json
+import typing
+import numpy as np
+import rv_disasm
+from constants_pkg import OPC_JAL, OPC_JALR, B_TYPE
+from commit_trace import read_trace
+
+
+SIZES       = (16, 64, 256, 1024)       # counter table entries
+BTB_SIZES   = (0, 16, 64)               # 0: no BTB
+RESOLVE     = 2                         # redirect from execute
+DECODE      = 1                         # redirect from decode
+
+WEAKLY_NOT_TAKEN = 1                    # initial counter state, 0..3, taken from 2 on
+
+# 2 bit saturating counter, next state by current state
+_TAKEN      = np.array([1, 2, 3, 3], dtype=np.int8)
+_NOT_TAKEN  = np.array([0, 0, 1, 2], dtype=np.int8)
+
+
+class Stream(typing.NamedTuple):
+    """ Control transfers of a trace in program order """
+    pc      : np.ndarray
+    target  : np.ndarray            # branch target whether taken or not, next pc for jumps
+    taken   : np.ndarray
+    branch  : np.ndarray            # conditional branch, else jal or jalr
+    jalr    : np.ndarray
+
+
+class Result(typing.NamedTuple):
+    predictor       : str
+    entries         : int           # counter table entries, 0 for btfn
+    btb             : int           # BTB entries, 0 for none
+    branches        : int
+    accuracy        : float         # direction of conditional branches
+    btb_hit_rate    : float         # of taken branches and jumps
+    penalty_cycles  : int
+    saved_cycles    : int           # against no prediction
+
+
+def stream(records : np.ndarray) -> Stream:
+    """ Branches and jumps of a commit trace, taken if the next instruction is not at pc + 4 """
+
+    fields  = rv_disasm.decode(records['instr'])
+    opcode  = fields['opcode']
+    pc      = records['pc'].astype(np.int64)
+    next_pc = np.r_[pc[1:], pc[-1:] + 4]            # the last instruction falls through
+
+    cti     = np.isin(opcode, [B_TYPE, OPC_JAL, OPC_JALR])
+    branch  = opcode == B_TYPE
+    target  = np.where(branch, pc + fields['imm'], next_pc)
+    return Stream(pc[cti], target[cti], (next_pc != pc + 4)[cti], branch[cti], (opcode == OPC_JALR)[cti])
+
+
+def _segments(index : np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """ Order grouping equal indices in program order, and the group start of each sorted position """
+
+    order   = np.argsort(index, kind='stable')
+    keys    = index[order]
+    first   = np.r_[True, keys[1:] != keys[:-1]]
+    start   = np.maximum.accumulate(np.where(first, np.arange(len(keys)), 0))
+    return order, start
+
+
+def counter_predictions(index : np.ndarray, taken : np.ndarray) -> np.ndarray:
+    """ Predicted direction of each branch by a table of 2 bit counters, index is its table entry,
+        log2(len(index)) passes of the scan loop """
+
+    n = len(index)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    order, start = _segments(index)
+    pos     = np.arange(n)
+
+    # state transitions of the updates up to each position within its entry, Hillis-Steele scan
+    scan    = np.where(taken[order][:, None], _TAKEN, _NOT_TAKEN)
+    k = 1
+    while k < n:
+        valid = pos - k >= start
+        later = scan[pos[valid]]
+        scan[pos[valid]] = np.take_along_axis(later, scan[pos[valid] - k], axis=1)
+        k *= 2
+
+    state   = np.full(n, WEAKLY_NOT_TAKEN, dtype=np.int8)
+    before  = pos > start                           # state before the update = after the previous one
+    state[before] = scan[pos[before] - 1, WEAKLY_NOT_TAKEN]
+
+    predicted = np.empty(n, dtype=bool)
+    predicted[order] = state >= 2
+    return predicted
+
+
+def gshare_index(s : Stream, entries : int, history : int = None) -> np.ndarray:
+    """ pc xor the outcomes of the last history branches, history defaults to the index width """
+
+    history = history if history is not None else entries.bit_length() - 1
+    taken   = s.taken[s.branch].astype(np.int64)
+    ghr     = np.zeros(len(taken), dtype=np.int64)
+    for k in range(1, history + 1):
+        ghr[k:] |= taken[:-k] << (k - 1)
+    return ((s.pc[s.branch] >> 2) ^ ghr) & (entries - 1)
+
+
+def btb_hits(s : Stream, entries : int) -> np.ndarray:
+    """ Whether a direct mapped BTB, filled by taken transfers, holds pc and target of each transfer """
+
+    n = len(s.pc)
+    if entries == 0 or n == 0:
+        return np.zeros(n, dtype=bool)
+    order, start = _segments((s.pc >> 2) % entries)
+    pos     = np.arange(n)
+
+    # last taken transfer before each position within its entry
+    filled  = np.maximum.accumulate(np.where(s.taken[order], pos, -1))
+    last    = np.r_[-1, filled[:-1]]
+    valid   = last >= start
+
+    hits    = np.zeros(n, dtype=bool)
+    source  = order[last[valid]]
+    hits[order[valid]] = (s.pc[source] == s.pc[order[valid]]) & (s.target[source] == s.target[order[valid]])
+    return hits
+
+
+def predict(s : Stream, predictor : str, entries : int = 0) -> np.ndarray:
+    """ Predicted direction of the conditional branches """
+
+    pc, target, taken = s.pc[s.branch], s.target[s.branch], s.taken[s.branch]
+    if predictor == 'btfn':
+        return target < pc
+    if predictor == 'bimodal':
+        return counter_predictions((pc >> 2) & (entries - 1), taken)
+    if predictor == 'gshare':
+        return counter_predictions(gshare_index(s, entries), taken)
+    raise ValueError(f"unknown predictor {predictor}")
+
+
+def evaluate(s : Stream, predictor : str, entries : int = 0, btb : int = 0,
+             resolve : int = RESOLVE, decode : int = DECODE) -> Result:
+    return _result(s, predictor, entries, btb, predict(s, predictor, entries), btb_hits(s, btb), resolve, decode)
+
+
+def _result(s : Stream, predictor : str, entries : int, btb : int, predicted : np.ndarray, hits : np.ndarray,
+            resolve : int, decode : int) -> Result:
+
+    jal         = ~s.branch & ~s.jalr
+    baseline    = int(np.sum(s.taken & (s.branch | s.jalr))) * resolve + int(np.sum(jal)) * decode
+
+    # jumps: the BTB saves the redirect
+    penalty     = int(np.sum(jal & ~hits)) * decode + int(np.sum(s.jalr & ~hits)) * resolve
+
+    taken       = s.taken[s.branch]
+    correct     = predicted == taken
+    penalty    += int(np.sum(~correct)) * resolve
+    penalty    += int(np.sum(correct & taken & ~hits[s.branch])) * decode
+
+    n           = len(taken)
+    redirects   = int(np.sum(s.taken))
+    return Result(predictor, entries, btb, n,
+                  float(np.mean(correct)) if n else 1.0,
+                  float(np.sum(hits & s.taken)) / redirects if redirects else 0.0,
+                  penalty, baseline - penalty)
+
+
+def sweep(s : Stream, sizes=SIZES, btb_sizes=BTB_SIZES, resolve : int = RESOLVE, decode : int = DECODE) -> typing.List[Result]:
+
+    predictors  = [('btfn', 0)] + [(predictor, entries) for predictor in ('bimodal', 'gshare') for entries in sizes]
+    predictions = {key : predict(s, *key) for key in predictors}      # each predictor once for all BTB sizes
+
+    results = []
+    for btb in btb_sizes:
+        hits = btb_hits(s, btb)
+        for predictor, entries in predictors:
+            results.append(_result(s, predictor, entries, btb, predictions[predictor, entries], hits, resolve, decode))
+    return results
+
+
+def format_results(results : typing.List[Result]) -> str:
+
+    lines = [f"{'predictor':<10}{'entries':>8}{'btb':>6}{'branches':>10}{'accuracy %':>12}{'btb hit %':>11}"
+             f"{'penalty':>10}{'saved':>10}"]
+    for r in results:
+        lines.append(f"{r.predictor:<10}{r.entries:>8}{r.btb:>6}{r.branches:>10}{100 * r.accuracy:>12.2f}"
+                     f"{100 * r.btb_hit_rate:>11.2f}{r.penalty_cycles:>10}{r.saved_cycles:>10}")
+    return "\n".join(lines)
+
+
+
+if __name__ == "__main__":
+
+    ints = lambda s: tuple(int(v, 0) for v in s.split(','))
+
+    parser = argparse.ArgumentParser(description="Evaluate branch predictors on the branches of commit traces")
+    parser.add_argument("traces", nargs='+')
+    parser.add_argument("--sizes", type=ints, default=SIZES, help="counter table entries, powers of 2, each size costs two scans of log2(branches) numpy passes")
+    parser.add_argument("--btb", type=ints, default=BTB_SIZES, help="BTB entries, 0 for none")
+    parser.add_argument("--resolve", type=int, default=RESOLVE, help="cycles of a redirect from execute")
+    parser.add_argument("--decode", type=int, default=DECODE, help="cycles of a redirect from decode")
+    parser.add_argument("--json", help="write the results of all traces to this file")
+    args = parser.parse_args()
+
+    report = {}
+    for path in args.traces:
+        results = sweep(stream(read_trace(path)), args.sizes, args.btb, args.resolve, args.decode)
+        report[path] = [r._asdict() for r in results]
+        print(f"#### {path}")
+        print(format_results(results))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,162 @@
+"""
+Content addressed build cache, used by the Makefile to pick SIM_BUILD for Verilator models and
+the output directory of assembled programs.
+
+An entry is keyed on its name (top level or program), the tool arguments (defines, parameters,
+trace flags, ARCH), the tool version and the content of every source file, so it is rebuilt
+whenever any of them changes and reused otherwise, no matter what was built last:
+
+    python verification/unittests/build_cache.py --name alu --args "-DSIMULATION --trace" rtl/*.sv
+    sim_build/cache/alu-3f2a9c01d4e5b687
+
+Every lookup marks its entry as used, entries that were not used for the longest time are
+removed once the cache exceeds its size limit. Outputs given with --touch are set to the time of
+the lookup if they exist, make rebuilds them by mtime and would do so for sources that were only
+touched or checked out again. --owner (the pid of make) locks the entry against removal by
+parallel jobs until the build releases it, or that process ends if the build fails:
+
+    python verification/unittests/build_cache.py --release sim_build/cache/alu-3f2a9c01d4e5b687 --owner 4242
+
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import subprocess
+import time
+
+
+CACHE_DIR   = 'sim_build/cache'
+MAX_SIZE_MB = int(os.environ.get("SIM_CACHE_MB", 2048))
+
+
+def _tool_version(tool : str) -> str:
+    try:
+        return subprocess.run([tool, '--version'], capture_output=True, text=True).stdout
+    except OSError:
+        return ""
+
+
+def model_key(name : str, args : str, sources : list, tools : list = ('verilator',)) -> str:
+    """ Hash of everything the build output depends on """
+
+    digest = hashlib.sha256()
+    digest.update(f"{name}\0{' '.join(args.split())}\0".encode())
+    for tool in tools:
+        digest.update(f"{tool}\0{_tool_version(tool)}\0".encode())
+    for path in sources:
+        digest.update(os.path.basename(path).encode() + b'\0')
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()[:16]
+
+
+def _size(path : str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names
+               if not os.path.islink(os.path.join(root, name)))
+
+
+LOCK_PREFIX = '.lock-'
+
+
+def _alive(pid : int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def locked(path : str) -> bool:
+    """ Whether a running process uses the entry, locks of processes that ended are removed """
+
+    result = False
+    for name in os.listdir(path):
+        if not name.startswith(LOCK_PREFIX):
+            continue
+        if _alive(int(name[len(LOCK_PREFIX):])):
+            result = True
+        else:
+            try:
+                os.remove(os.path.join(path, name))
+            except FileNotFoundError:       # removed by another lookup
+                pass
+    return result
+
+
+def release(path : str, owner : int):
+    """ Remove the lock of owner from the entry, nothing if it holds none """
+
+    try:
+        os.remove(os.path.join(path, f"{LOCK_PREFIX}{owner}"))
+    except FileNotFoundError:
+        pass
+
+
+def evict(cache_dir : str, max_bytes : int, keep : str = None) -> list:
+    """ Remove least recently used entries until the cache fits into max_bytes, returns the removed paths """
+
+    entries = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir)]
+    entries = sorted((path for path in entries if os.path.isdir(path)), key=os.path.getmtime)
+    sizes   = {path : _size(path) for path in entries}
+    total   = sum(sizes.values())
+
+    removed = []
+    for path in entries:
+        if total <= max_bytes:
+            break
+        if path == keep or locked(path):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= sizes[path]
+        removed.append(path)
+    return removed
+
+
+def lookup(name : str, args : str, sources : list, cache_dir : str = CACHE_DIR, tools : list = ('verilator',),
+           max_bytes : int = MAX_SIZE_MB << 20, touch : list = (), owner : int = None) -> str:
+    """ Build directory of the entry, created if new and marked as most recently used """
+
+    path = os.path.join(cache_dir, f"{name}-{model_key(name, args, sources, tools)}")
+    os.makedirs(path, exist_ok=True)
+    if owner is not None:
+        open(os.path.join(path, f"{LOCK_PREFIX}{owner}"), 'w').close()
+
+    now = time.time()
+    for output in touch:                    # in build order, same time: up to date with each other
+        output = os.path.join(path, output)
+        if os.path.exists(output):
+            os.utime(output, (now, now))
+    os.utime(path, (now, now))
+    evict(cache_dir, max_bytes, keep=path)
+    return path
+
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Print the cached build directory of a model or program")
+    parser.add_argument("sources", nargs='*')
+    parser.add_argument("--name", "--top", help="top level or program name, required for a lookup")
+    parser.add_argument("--args", default="", help="tool arguments that change the output")
+    parser.add_argument("--tool", action='append', help="its --version output is part of the key, repeatable (default: verilator)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--touch", type=lambda s: s.split(','), default=[],
+                        help="comma separated outputs in the entry, marked up to date if they exist")
+    parser.add_argument("--owner", type=int, help="pid of the process using the entry, locks it against eviction")
+    parser.add_argument("--release", metavar="ENTRY", help="remove the lock of --owner from ENTRY instead of a lookup")
+    args = parser.parse_args()
+
+    if args.release:
+        if args.owner is None:
+            parser.error("--release needs --owner")
+        release(args.release, args.owner)
+    elif not args.name or not args.sources:
+        parser.error("a lookup needs --name and at least one source")
+    else:
+        print(lookup(args.name, args.args, args.sources, args.cache_dir, args.tool or ['verilator'],
+                     touch=args.touch, owner=args.owner))
@@ -0,0 +1,196 @@
+"""
+Trace driven what-if model of instruction and data caches in front of the SRAM macros.
+
+icache.sv and dcache.sv are flat memories, for synthesis one sram_1rw1r_32_256_8_sky130 macro of
+256 32 bit words (1 KiB). The model replays the fetch addresses (pc) and the load/store addresses
+of a commit trace (commit_trace.py, make COMMIT_TRACE=...) through caches of a given data size,
+line size, associativity and replacement policy (lru, fifo, random). Stores allocate like loads
+(write back, write allocate). A miss refills the line from the backing memory one 32 bit word
+per cycle after LATENCY cycles, the stall cycles of a configuration are misses times that.
+
+All sets are simulated side by side with numpy: accesses are grouped by set, repeated accesses
+to the line a set used last are hits for every policy and dropped, a direct mapped cache misses
+on all that remain. Set associative caches step through the remaining accesses of all sets at
+once, one access per set and step. The steps are a Python loop, as many iterations as the busiest
+set has accesses: a trace that crowds into few sets (small caches, a tight loop over several
+lines of one set) takes close to one iteration of a few numpy operations per access.
+
+    python verification/unittests/cache_model.py commit.trace
+    python verification/unittests/cache_model.py commit.trace --sizes 512,1024 --ways 1,2 --json cache.json
+
+"""
+
+import argparse
+import itertools
+import json
+import typing
+import numpy as np
+from commit_trace import read_trace
+
+
+SIZES       = (256, 512, 1024, 2048)        # bytes of data, 1024: one SRAM macro
+LINES       = (4, 8, 16, 32)                # bytes per line
+WAYS        = (1, 2, 4)
+POLICIES    = ('lru', 'fifo', 'random')
+LATENCY     = 2                             # cycles until the first word of a refill arrives
+WORD_BYTES  = 4                             # SRAM macro width
+
+
+class Config(typing.NamedTuple):
+    size    : int
+    line    : int
+    ways    : int
+    policy  : str
+
+    @property
+    def sets(self) -> int:
+        return self.size // (self.line * self.ways)
+
+    def penalty(self, latency : int = LATENCY) -> int:
+        """ Stall cycles of a miss, the line is refilled word by word """
+        return latency + self.line // WORD_BYTES
+
+
+class Result(typing.NamedTuple):
+    cache           : str           # 'icache' or 'dcache'
+    size            : int
+    line            : int
+    ways            : int
+    policy          : str
+    accesses        : int
+    misses          : int
+    hit_rate        : float
+    mpki            : float         # misses per 1000 instructions
+    stall_cycles    : int
+
+
+def streams(records : np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """ Fetch and data byte addresses of a commit trace in program order """
+
+    fetch = records['pc'].astype(np.int64)
+    data  = records['mem_addr'][records['mem_req']].astype(np.int64)
+    return fetch, data
+
+
+def misses(addrs : np.ndarray, config : Config, seed : int = 0) -> int:
+    """ Misses of a cache starting empty """
+
+    if config.sets < 1 or config.size % (config.line * config.ways):
+        raise ValueError(f"{config}: size is not a multiple of line size times ways")
+
+    lines   = np.asarray(addrs, dtype=np.int64) // config.line
+    sets    = lines % config.sets
+    tags    = lines // config.sets
+
+    # group by set in program order, drop repeated accesses to the line the set used last
+    order   = np.argsort(sets, kind='stable')
+    sets, tags = sets[order], tags[order]
+    new     = np.ones(len(sets), dtype=bool)
+    new[1:] = (sets[1:] != sets[:-1]) | (tags[1:] != tags[:-1])
+    sets, tags = sets[new], tags[new]
+
+    if config.ways == 1 or len(sets) == 0:
+        return len(sets)
+    return _step_sets(sets, tags, config, np.random.default_rng(seed))
+
+
+def _step_sets(sets : np.ndarray, tags : np.ndarray, config : Config, rng) -> int:
+    """ Set associative replay, step k handles the k-th access of every set, one Python iteration per step """
+
+    first   = np.flatnonzero(np.r_[True, sets[1:] != sets[:-1]])
+    counts  = np.diff(np.r_[first, len(sets)])
+    pos     = np.arange(len(sets)) - np.repeat(first, counts)
+    order   = np.argsort(pos, kind='stable')
+    steps   = np.bincount(pos)
+
+    way_tags = np.full((config.sets, config.ways), -1, dtype=np.int64)
+    stamps   = np.full((config.sets, config.ways), -1, dtype=np.int64)     # last use (lru) or fill (fifo), -1 empty
+    ways     = np.arange(config.ways)
+
+    total, start = 0, 0
+    for k, count in enumerate(steps.tolist()):
+        idx     = order[start:start + count]
+        start  += count
+        s, t    = sets[idx], tags[idx]
+
+        match   = way_tags[s] == t[:, None]
+        hit     = match.any(axis=1)
+        if config.policy == 'lru':
+            stamps[s[hit], match[hit].argmax(axis=1)] = k
+
+        miss    = ~hit
+        s, t    = s[miss], t[miss]
+        total  += len(s)
+        if config.policy == 'random':
+            empty  = stamps[s] < 0
+            victim = np.where(empty.any(axis=1), empty.argmax(axis=1), rng.integers(config.ways, size=len(s)))
+        else:
+            victim = stamps[s].argmin(axis=1)
+        way_tags[s, victim] = t
+        stamps[s, victim]   = k
+    return total
+
+
+def sweep(addrs : np.ndarray, instructions : int, cache : str, configs, latency : int = LATENCY) -> typing.List[Result]:
+
+    results = []
+    for config in configs:
+        n = misses(addrs, config)
+        results.append(Result(cache, *config, len(addrs), n,
+                              1 - n / len(addrs) if len(addrs) else 1.0,
+                              1000 * n / instructions if instructions else 0.0,
+                              n * config.penalty(latency)))
+    return results
+
+
+def configs(sizes=SIZES, lines=LINES, ways=WAYS, policies=POLICIES) -> typing.List[Config]:
+    """ Every valid combination, the policy only matters for set associative caches """
+
+    result = []
+    for size, line, n_ways in itertools.product(sizes, lines, ways):
+        if size % (line * n_ways):
+            continue
+        for policy in (policies if n_ways > 1 else policies[:1]):
+            result.append(Config(size, line, n_ways, policy))
+    return result
+
+
+def format_results(results : typing.List[Result]) -> str:
+
+    lines = [f"{'cache':<8}{'size':>6}{'line':>6}{'ways':>6}  {'policy':<8}{'accesses':>10}{'misses':>9}"
+             f"{'hit %':>8}{'MPKI':>8}{'stalls':>10}"]
+    for r in results:
+        lines.append(f"{r.cache:<8}{r.size:>6}{r.line:>6}{r.ways:>6}  {r.policy:<8}{r.accesses:>10}{r.misses:>9}"
+                     f"{100 * r.hit_rate:>8.2f}{r.mpki:>8.2f}{r.stall_cycles:>10}")
+    return "\n".join(lines)
+
+
+
+if __name__ == "__main__":
+
+    ints = lambda s: tuple(int(v, 0) for v in s.split(','))
+
+    parser = argparse.ArgumentParser(description="Replay the fetch and data addresses of commit traces through caches")
+    parser.add_argument("traces", nargs='+')
+    parser.add_argument("--sizes", type=ints, default=SIZES, help="data bytes, comma separated")
+    parser.add_argument("--lines", type=ints, default=LINES, help="line bytes, comma separated")
+    parser.add_argument("--ways", type=ints, default=WAYS)
+    parser.add_argument("--policies", type=lambda s: tuple(s.split(',')), default=POLICIES)
+    parser.add_argument("--latency", type=int, default=LATENCY, help="cycles until a refill starts")
+    parser.add_argument("--json", help="write the results of all traces to this file")
+    args = parser.parse_args()
+
+    sweep_configs = configs(args.sizes, args.lines, args.ways, args.policies)
+    report = {}
+    for path in args.traces:
+        records     = read_trace(path)
+        fetch, data = streams(records)
+        results     = (sweep(fetch, len(records), 'icache', sweep_configs, args.latency)
+                       + sweep(data, len(records), 'dcache', sweep_configs, args.latency))
+        report[path] = [r._asdict() for r in results]
+        print(f"#### {path}")
+        print(format_results(results))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
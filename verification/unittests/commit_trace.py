@@ -0,0 +1,151 @@
+"""
+Binary commit trace of a core run, one fixed size record per retired instruction.
+
+A CoreMonitor listener collects the samples in a preallocated structured array and appends
+it to the trace file whenever it is full, so recording costs one row assignment per cycle.
+The file is a short header followed by raw TRACE_DTYPE records, read_trace() maps it without
+copying and numpy queries run over millions of records in milliseconds:
+
+    with CommitTrace("commit.trace") as trace:
+        monitor.listeners.insert(0, trace)
+        await monitor.run(max_cycles=MAX_CYCLES)
+
+    trace  = read_trace("commit.trace")
+    stores = trace[trace['mem_we']]
+    loop   = np.flatnonzero(trace['pc'] == 0x100a0)
+
+    python verification/unittests/commit_trace.py commit.trace --tail 20
+
+The soc and top testbenches record a trace with make COMMIT_TRACE=<file>.
+
+"""
+
+import argparse
+import os
+import numpy as np
+import rv_disasm
+from core_monitor import Sample
+
+
+# field order of Sample, a sample is stored as it is
+TRACE_DTYPE = np.dtype([
+    ('cycle',         np.uint32),
+    ('pc',            np.uint32),
+    ('instr',         np.uint32),
+    ('rd',            np.uint8),        # 0 if the register file is not written
+    ('rd_value',      np.uint32),
+    ('instr_invalid', np.bool_),
+    ('mem_req',       np.bool_),
+    ('mem_we',        np.bool_),
+    ('mem_addr',      np.uint32),
+    ('mem_wdata',     np.uint32),
+    ('mem_be',        np.uint8),
+])
+assert TRACE_DTYPE.names == Sample._fields
+
+MAGIC       = b"toothless-ct\x00\x00\x00\x01"      # format version in the last byte
+CHUNK       = 1 << 16                               # records per write
+
+
+def trace_file(path : str, program : str = None) -> str:
+    """ Trace file of one program of a multi program run: commit.trace -> commit.<program>.trace """
+
+    if not program:
+        return path
+    stem, ext = os.path.splitext(path)
+    name      = os.path.splitext(os.path.basename(program))[0]
+    return f"{stem}.{name}{ext}"
+
+
+class CommitTrace:
+    """ Listener appending every retired instruction to a trace file """
+
+    def __init__(self, path : str, chunk : int = CHUNK):
+
+        self.path       = path
+        self.records    = 0             # records written to the file and buffered
+        self._buffer    = np.zeros(chunk, dtype=TRACE_DTYPE)
+        self._count     = 0
+        self._file      = open(path, 'wb')
+        self._file.write(MAGIC)
+
+
+    def __call__(self, sample : Sample):
+
+        if sample.instr_invalid:
+            return None
+        self._buffer[self._count] = sample
+        self._count  += 1
+        self.records += 1
+        if self._count == len(self._buffer):
+            self.flush()
+        return None
+
+
+    def flush(self):
+        self._buffer[:self._count].tofile(self._file)
+        self._file.flush()
+        self._count = 0
+
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+    def __enter__(self) -> "CommitTrace":
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+
+def read_trace(path : str) -> np.ndarray:
+    """ Records of a trace file, memory mapped read only, a partly written last record is ignored """
+
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: not a commit trace of this version")
+
+    records = (os.path.getsize(path) - len(MAGIC)) // TRACE_DTYPE.itemsize
+    if records == 0:
+        return np.zeros(0, dtype=TRACE_DTYPE)
+    return np.memmap(path, dtype=TRACE_DTYPE, mode='r', offset=len(MAGIC), shape=(records,))
+
+
+def format_trace(records : np.ndarray) -> str:
+    """ One line per record, disassembled, with register and memory writes """
+
+    asm   = rv_disasm.disassemble(records['instr'])
+    lines = []
+    for record, text in zip(records.tolist(), asm.tolist()):
+        cycle, pc, instr, rd, rd_value, _, mem_req, mem_we, mem_addr, mem_wdata, mem_be = record
+        write = f"x{rd} <- {rd_value:#010x}" if rd else ""
+        if mem_req and mem_we:
+            write = f"[{mem_addr:#010x}] <- {mem_wdata:#010x} be {mem_be:04b}"
+        lines.append(f"{cycle:8}  {pc:08x}:  {instr:08x}  {text:<28}{write}")
+    return "\n".join(lines)
+
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Print a commit trace")
+    parser.add_argument("trace")
+    parser.add_argument("--head", type=int, help="first N records")
+    parser.add_argument("--tail", type=int, help="last N records")
+    parser.add_argument("--pc", type=lambda s: int(s, 0), help="only records of this pc")
+    args = parser.parse_args()
+
+    records = read_trace(args.trace)
+    print(f"{args.trace}: {len(records)} instructions")
+    if args.pc is not None:
+        records = records[records['pc'] == args.pc]
+    if args.head is not None:
+        records = records[:args.head]
+    if args.tail is not None:
+        records = records[-args.tail:]
+    print(format_trace(records))
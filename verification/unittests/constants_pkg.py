@@ -40,6 +40,15 @@ F3_LW       = int('010', 2)
 F3_LBU      = int('100', 2)
 F3_LHU      = int('101', 2)
 
+# stores
+F3_SB       = int('000', 2)
+F3_SH       = int('001', 2)
+F3_SW       = int('010', 2)
+
+# funct7 field
+F7_DEFAULT  = int('000_0000', 2)
+F7_SUB_SRA  = int('010_0000', 2)
+
 
 # ALU operations
 # arithmetic operations
@@ -82,6 +91,7 @@ OP_B_IMM      = int('10', 2)
 
 RF_IN_ALU             = int('00', 2)
 RF_IN_PC              = int('01', 2)
+RF_IN_LSU             = int('10', 2)
 
 CTRL_TRANS_SEL_NONE    = int('00', 2) 
 CTRL_TRANS_SEL_JUMP    = int('01', 2) 
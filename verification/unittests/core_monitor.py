@@ -0,0 +1,211 @@
+"""
+Cycle based monitor of the core, end of program detection and a lockstep scoreboard
+against the reference model.
+
+The core retires one instruction per clock. Its combinational signals are stable at the
+falling edge, so the monitor samples pc, instruction and register file write port there,
+before the rising edge commits them, and hands every sample to a list of listeners.
+A listener returns None to continue or a string to stop the run with that reason.
+
+    monitor = CoreMonitor(dut.core_i, dut.clk, dut.rst_n)
+    monitor.listeners.append(Scoreboard(rv_iss.ISS.from_hex(HEX_FILE)))
+    monitor.listeners.append(Termination())
+    reason  = await monitor.run(max_cycles=MAX_CYCLES)
+
+"""
+
+import collections
+import functools
+import typing
+from cocotb.triggers import FallingEdge, ReadOnly
+import harness
+import rv_disasm
+import rv_iss
+
+
+class Sample(typing.NamedTuple):
+    cycle       : int
+    pc          : int
+    instr       : int
+    rd          : int           # 0 if the register file is not written
+    rd_value    : int
+    instr_invalid : bool
+    mem_req     : bool
+    mem_we      : bool
+    mem_addr    : int
+    mem_wdata   : int
+    mem_be      : int
+
+
+class CoreMonitor:
+    """ Samples the retiring instruction of core_i once per cycle """
+
+    def __init__(self, core, clk, rst_n):
+
+        core            = harness.Core.of(core)
+        self.clk        = clk
+        self.rst_n      = rst_n
+
+        self._pc        = core.pc_o
+        self._instr     = core.instruction_i
+        self._rf_we     = core.rf_we
+        self._rd        = core.rd
+        self._rd_value  = core.rf_wp_a
+        self._invalid   = core.instr_invalid_o
+        self._mem_req   = core.mem_data_req
+        self._mem_we    = core.mem_we
+        self._mem_addr  = core.alu_result
+        self._mem_wdata = core.wdata_o
+        self._mem_be    = core.data_be_o
+
+        self.listeners  : list = []
+        self.cycle      = 0         # cycles sampled since reset release
+        self.stop_reason = None
+
+
+    def sample(self) -> Sample:
+        """ Current state of the retiring instruction """
+
+        rd = int(self._rd.value) if int(self._rf_we.value) else 0
+        return Sample(
+            cycle           = self.cycle,
+            pc              = int(self._pc.value),
+            instr           = int(self._instr.value),
+            rd              = rd,
+            rd_value        = int(self._rd_value.value) if rd else 0,
+            instr_invalid   = bool(int(self._invalid.value)),
+            mem_req         = bool(int(self._mem_req.value)),
+            mem_we          = bool(int(self._mem_we.value)),
+            mem_addr        = int(self._mem_addr.value),
+            mem_wdata       = int(self._mem_wdata.value),
+            mem_be          = int(self._mem_be.value),
+        )
+
+
+    async def run(self, max_cycles : int) -> str:
+        """ Sample every cycle until a listener stops the run or max_cycles elapsed, returns the reason """
+
+        # reset() releases rst_n at a falling edge and the first instruction retires at the next rising edge,
+        # so the current cycle is the first one, sampled once the release has propagated
+        await ReadOnly()
+        while self.cycle < max_cycles:
+            if int(self.rst_n.value):
+                sample = self.sample()
+                self.cycle += 1
+                for listener in self.listeners:
+                    reason = listener(sample)
+                    if reason:
+                        self.stop_reason = reason
+                        return reason
+
+            if self.cycle < max_cycles:
+                await FallingEdge(self.clk)
+
+        self.stop_reason = 'max_cycles'
+        return self.stop_reason
+
+
+
+# end of program markers used by the programs in verification/system
+SELF_LOOPS  = {0x0000_006F, 0x0000_0063}        # jal x0, 0 ('end: j end') and beq x0, x0, 0
+SENTINEL_REG = 31
+SENTINELS   = {0xBEEF, 0xDEAD}                  # pass, fail
+
+
+class Termination:
+    """ Stops the run at a self loop, a sentinel written to x31 or a store to tohost """
+
+    def __init__(self, tohost : int = None):
+        self.tohost     = tohost
+        self.retired    = 0             # instructions retired including the terminating one
+        self.cycles     = 0
+        self.reason     = None          # 'self_loop', 'sentinel' or 'tohost'
+        self.value      = None          # sentinel or the word stored to tohost
+
+
+    def __call__(self, sample : Sample):
+
+        self.cycles     = sample.cycle + 1
+        if sample.instr_invalid:
+            return None
+        self.retired   += 1
+
+        if sample.instr in SELF_LOOPS:
+            self.reason = 'self_loop'
+        elif sample.rd == SENTINEL_REG and sample.rd_value in SENTINELS:
+            self.reason, self.value = 'sentinel', sample.rd_value
+        elif self.tohost is not None and sample.mem_req and sample.mem_we and sample.mem_addr == self.tohost:
+            self.reason, self.value = 'tohost', sample.mem_wdata
+        return self.reason
+
+
+    def summary(self) -> str:
+        value = f" ({self.value:#x})" if self.value is not None else ""
+        return f"{self.reason}{value} after {self.retired} instructions, {self.cycles} cycles"
+
+
+
+@functools.lru_cache(maxsize=None)
+def _written_rd(word : int) -> int:
+    """ Destination register an instruction writes, 0 if none """
+
+    fields = rv_disasm.decode(word)[0]
+    if fields['mnemonic'] < 0 or fields['fmt'] in (rv_disasm.FMT_S, rv_disasm.FMT_B):
+        return 0
+    return int(fields['rd'])
+
+
+class Scoreboard:
+    """ Steps the reference model with every sample and compares pc, instruction and register write """
+
+    def __init__(self, iss : rv_iss.ISS, history : int = 8):
+        self.iss        = iss
+        self.history    = collections.deque(maxlen=history)
+        self.report     = None          # set on the first mismatch
+
+
+    def __call__(self, sample : Sample):
+
+        iss             = self.iss
+        pc, instr       = iss.pc, iss.fetch(iss.pc)
+        rd              = _written_rd(instr)
+        iss.step()
+
+        expected = {
+            'pc'    : pc,
+            'instr' : instr,
+            'rd'    : rd,
+            'rd_value' : iss.x[rd] if rd else 0,
+        }
+        actual = {name : getattr(sample, name) for name in expected}
+
+        if iss.halt_reason == rv_iss.HALT_INVALID:
+            self.report = self._format_report(sample, expected, actual, "reference model: invalid instruction")
+            return 'mismatch'
+
+        if actual != expected:
+            self.report = self._format_report(sample, expected, actual)
+            return 'mismatch'
+
+        self.history.append(sample)
+        return None
+
+
+    def _format_report(self, sample : Sample, expected : dict, actual : dict, note : str = None) -> str:
+
+        lines = [f"co-simulation mismatch in cycle {sample.cycle} ({self.iss.retired} instructions retired)"]
+        if note:
+            lines.append(f"  {note}")
+        lines.append(f"  {'':<10}{'core':>12}{'reference':>12}")
+        for name in expected:
+            marker = "" if actual[name] == expected[name] else "   <--"
+            lines.append(f"  {name:<10}{actual[name]:>#12x}{expected[name]:>#12x}{marker}")
+        lines.append(f"  core:      {rv_disasm.format_instr(sample.instr)}")
+        lines.append(f"  reference: {rv_disasm.format_instr(expected['instr'])}")
+
+        lines.append("last matching instructions:")
+        for s in self.history:
+            write = f"x{s.rd} <- {s.rd_value:#010x}" if s.rd else ""
+            lines.append(f"  {s.cycle:6}  {s.pc:08x}:  {s.instr:08x}  {rv_disasm.format_instr(s.instr):<28}{write}")
+
+        return "\n".join(lines)
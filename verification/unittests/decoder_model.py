@@ -0,0 +1,186 @@
+"""
+Golden model of rtl/decoder.sv, computes the expected outputs of the decoder for any machine word.
+
+Everything but the register fields and the immediate only depends on opcode, funct3 and funct7.
+These 17 bits index a precomputed control table, built from the RV32I instruction table and
+cached on disk next to the bytecode. Register fields and immediates come from rv_disasm.decode:
+
+    expected = expected_outputs(words)         # one EXPECTED_DTYPE record per word
+    report   = compare(words, actual)           # None if the decoder matches
+
+Invalid instructions only need to raise instr_invalid_o, their other outputs are not checked.
+
+"""
+
+from constants_pkg import *
+import functools
+import hashlib
+import inspect
+import os
+import numpy as np
+import rv_disasm
+import rv_instructions as rv
+
+
+# field name + '_o' is the decoder port
+CONTROL_DTYPE = np.dtype([
+    ('instr_invalid',       np.uint8),
+    ('alu_operator',        np.uint8),
+    ('imm_valid',           np.uint8),
+    ('rs1_used',            np.uint8),
+    ('rs2_used',            np.uint8),
+    ('rd_used',             np.uint8),
+    ('rf_wp_mux_sel',       np.uint8),
+    ('alu_op_a_mux_sel',    np.uint8),
+    ('alu_op_b_mux_sel',    np.uint8),
+    ('ctrl_trans_instr',    np.uint8),
+    ('data_req',            np.uint8),
+    ('data_type',           np.uint8),
+    ('data_we',             np.uint8),
+    ('data_sign_ext',       np.uint8),
+])
+
+EXPECTED_DTYPE = np.dtype(CONTROL_DTYPE.descr + [
+    ('imm',                 np.uint32),
+    ('rs1',                 np.uint8),
+    ('rs2',                 np.uint8),
+    ('rd',                  np.uint8),
+])
+
+PORTS = [name + '_o' for name in EXPECTED_DTYPE.names]
+
+
+_ALU_OPERATORS = {
+    'ADD' : ALU_ADD,    'ADDI' : ALU_ADD,   'SUB' : ALU_SUB,
+    'SLL' : ALU_SLL,    'SLLI' : ALU_SLL,   'SRL' : ALU_SRL,    'SRLI' : ALU_SRL,   'SRA' : ALU_SRA,    'SRAI' : ALU_SRA,
+    'SLT' : ALU_SLT,    'SLTI' : ALU_SLT,   'SLTU': ALU_SLTU,   'SLTIU': ALU_SLTU,
+    'XOR' : ALU_XOR,    'XORI' : ALU_XOR,   'OR'  : ALU_OR,     'ORI'  : ALU_OR,    'AND' : ALU_AND,    'ANDI' : ALU_AND,
+    'BEQ' : ALU_EQ,     'BNE'  : ALU_NE,    'BLT' : ALU_SLT,    'BGE'  : ALU_GES,   'BLTU': ALU_SLTU,   'BGEU' : ALU_GEU,
+}
+
+
+def _control(mnemonic : str, spec : rv.InstrSpec) -> dict:
+    """ Decoder outputs of a valid instruction, defaults are those of decoder.sv """
+
+    c = dict(instr_invalid=0, alu_operator=_ALU_OPERATORS.get(mnemonic, ALU_ADD), imm_valid=1,
+             rs1_used=0, rs2_used=0, rd_used=0,
+             rf_wp_mux_sel=RF_IN_ALU, alu_op_a_mux_sel=OP_A_REG, alu_op_b_mux_sel=OP_B_IMM,
+             ctrl_trans_instr=CTRL_TRANS_SEL_NONE,
+             data_req=0, data_type=0b10, data_we=0, data_sign_ext=0)
+
+    if spec.fmt == 'R':
+        c.update(imm_valid=0, rs1_used=1, rs2_used=1, rd_used=1, alu_op_b_mux_sel=OP_B_REG)
+    elif spec.opcode == I_TYPE:
+        c.update(rs1_used=1, rd_used=1)
+    elif spec.opcode == OPC_LUI:
+        c.update(rd_used=1)
+    elif spec.opcode == OPC_AUIPC:
+        c.update(rd_used=1, alu_op_a_mux_sel=OP_A_CURPC)
+    elif spec.fmt == 'B':
+        c.update(rs1_used=1, rs2_used=1, alu_op_b_mux_sel=OP_B_REG, ctrl_trans_instr=CTRL_TRANS_SEL_BRANCH)
+    elif spec.opcode == OPC_JAL:
+        c.update(rd_used=1, alu_op_a_mux_sel=OP_A_CURPC, rf_wp_mux_sel=RF_IN_PC, ctrl_trans_instr=CTRL_TRANS_SEL_JUMP)
+    elif spec.opcode == OPC_JALR:
+        c.update(rs1_used=1, rd_used=1, rf_wp_mux_sel=RF_IN_PC, ctrl_trans_instr=CTRL_TRANS_SEL_JUMP)
+    elif spec.opcode == OPC_LOAD:
+        c.update(rs1_used=1, rd_used=1, rf_wp_mux_sel=RF_IN_LSU, data_req=1,
+                 data_type=spec.funct3 & 0b11, data_sign_ext=int(not (spec.funct3 & 0b100)))
+    elif spec.opcode == OPC_STORE:
+        c.update(rs1_used=1, rs2_used=1, data_req=1, data_we=1, data_type=spec.funct3 & 0b11)
+
+    return c
+
+
+def build_table() -> np.ndarray:
+    """ Control record for every funct7 << 10 | funct3 << 7 | opcode """
+
+    rows = np.zeros(len(rv.RV32I) + 1, dtype=CONTROL_DTYPE)      # row 0: invalid instruction
+    rows[0]['instr_invalid'] = 1
+    for index, (mnemonic, spec) in enumerate(rv.RV32I.items()):
+        rows[index + 1] = tuple(_control(mnemonic, spec)[name] for name in CONTROL_DTYPE.names)
+
+    return rows[rv_disasm._MNEMONIC_TABLE.astype(np.int32) + 1]
+
+
+def _cache_path() -> str:
+    """ Cache file name, changes whenever the model or the instruction table changes """
+
+    digest = hashlib.sha1()
+    for module in (inspect.getmodule(_control), rv, rv_disasm):
+        digest.update(inspect.getsource(module).encode())
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__',
+                        f"decoder_table.{digest.hexdigest()[:16]}.npy")
+
+
+@functools.lru_cache(maxsize=None)
+def table() -> np.ndarray:
+    """ Control table, loaded from the disk cache or built and stored there """
+
+    path = _cache_path()
+    if os.path.exists(path):
+        return np.load(path)
+
+    control = build_table()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}"                  # parallel runs never see a partial file
+    with open(tmp, 'wb') as f:
+        np.save(f, control)
+    os.replace(tmp, path)
+    return control
+
+
+
+def expected_outputs(words) -> np.ndarray:
+    """ Expected decoder outputs of every word """
+
+    fields  = rv_disasm.decode(words)
+    key     = (fields['funct7'].astype(np.int32) << 10) | (fields['funct3'].astype(np.int32) << 7) | fields['opcode']
+
+    expected = np.empty(len(fields), dtype=EXPECTED_DTYPE)
+    control  = table()[key]
+    for name in CONTROL_DTYPE.names:
+        expected[name] = control[name]
+
+    expected['imm'] = fields['imm'].view(np.uint32)
+    expected['rs1'] = fields['rs1']
+    expected['rs2'] = fields['rs2']
+    expected['rd']  = fields['rd']
+    return expected
+
+
+def sweep_words(rng : np.random.Generator = None, chunk : int = 1 << 12):
+    """ Every opcode/funct3/funct7 combination once, random register fields and immediate bits, yields arrays of chunk words """
+
+    rng  = rng or np.random.default_rng()
+    keys = np.arange(1 << 17, dtype=np.uint32)
+
+    for start in range(0, len(keys), chunk):
+        key     = keys[start:start + chunk]
+        free    = rng.integers(0, 1 << 15, len(key), dtype=np.uint32)      # rd, rs1, rs2 / immediate bits
+
+        yield ((key >> 10) << 25) | ((free >> 10) << 20) | ((free >> 5 & 0x1F) << 15) | \
+              (((key >> 7) & 0x7) << 12) | ((free & 0x1F) << 7) | (key & 0x7F)
+
+
+def compare(words, actual : np.ndarray, limit : int = 5) -> str:
+    """ Summary of decoder outputs that differ from the model, None if all match """
+
+    words       = np.asarray(words, dtype=np.uint32)
+    expected    = expected_outputs(words)
+    valid       = expected['instr_invalid'] == 0
+
+    lines = []
+    for name in EXPECTED_DTYPE.names:
+        bad = expected[name] != actual[name]
+        if name != 'instr_invalid':
+            bad &= valid                                        # only instr_invalid_o matters for invalid words
+        bad = np.flatnonzero(bad)
+        if len(bad) == 0:
+            continue
+
+        lines.append(f"{name}_o: {len(bad)}/{len(words)} words differ")
+        for k in bad[:limit]:
+            lines.append(f"    {int(words[k]):08x}  {rv_disasm.format_instr(int(words[k])):<28}"
+                         f"expected {int(expected[name][k]):#x}, got {int(actual[name][k]):#x}")
+
+    return "\n".join(lines) or None
@@ -0,0 +1,136 @@
+"""
+Shared cocotb harness for the testbenches: clock, reset, cycle waits and cached signal handles.
+
+    dut = Decoder.of(dut)               # handles resolved once per DUT
+    start_clock(dut.clk)
+    await reset(dut.clk, dut.rst_n)
+    dut.instr_i.value = word
+    await wait_cycles(dut.clk)          # inputs applied, outputs stable at the falling edge
+
+Clocks start low, so rising edges are at CLK_PRD/2 + k*CLK_PRD and waits end on falling edges,
+the same points in time the previous Timer(CLK_PRD) based testbenches sampled at.
+
+"""
+
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import ClockCycles, Timer
+
+
+CLK_PRD = 10        # ns
+
+_COCOTB_2 = int(cocotb.__version__.split('.')[0]) >= 2
+
+
+def start_clock(clk, period : int = CLK_PRD, start_high : bool = False):
+    """ Free running clock on clk, driven by the simulator (GPI) on cocotb >= 2, a Python coroutine on cocotb 1.x """
+
+    if _COCOTB_2:
+        return Clock(clk, period, unit='ns', impl='gpi').start(start_high=start_high)
+    return cocotb.start_soon(Clock(clk, period, units='ns').start(start_high=start_high))
+
+
+def wait_cycles(clk, cycles : int = 1) -> ClockCycles:
+    """ Trigger for the falling edge cycles clocks ahead """
+    return ClockCycles(clk, cycles, rising=False)
+
+
+async def reset(clk, rst_n, cycles : int = 3):
+    """ Hold the active low reset for a number of cycles, released at a falling edge """
+
+    rst_n.value = 0
+    await wait_cycles(clk, cycles)
+    rst_n.value = 1
+
+
+async def settle():
+    """ Let combinational logic of clockless DUTs propagate """
+    await Timer(1, 'ns')
+
+
+
+###########################################################################
+#### Signal handle bundles
+##########################################################################
+
+
+class Bundle:
+    """ Signal handles of a DUT resolved once, any other name is resolved on first use and kept """
+
+    SIGNALS : tuple = ()            # dotted paths below the DUT, available under their last name
+
+    _cache  : dict = {}
+
+
+    def __init__(self, dut):
+
+        self._dut = dut
+        for path in self.SIGNALS:
+            handle = dut
+            for name in path.split('.'):
+                handle = getattr(handle, name)
+            setattr(self, path.rsplit('.', 1)[-1], handle)
+
+
+    def __getattr__(self, name : str):
+        handle = getattr(self._dut, name)
+        setattr(self, name, handle)
+        return handle
+
+
+    @classmethod
+    def of(cls, dut) -> "Bundle":
+        """ Bundle of dut, created on the first call """
+
+        key = (cls, dut._path)
+        if key not in Bundle._cache:
+            Bundle._cache[key] = cls(dut)
+        return Bundle._cache[key]
+
+
+
+class Decoder(Bundle):
+    SIGNALS = (
+        'clk', 'rst_n', 'instr_i',
+        'alu_operator_o', 'imm_o', 'imm_valid_o',
+        'rs1_used_o', 'rs2_used_o', 'rd_used_o', 'rs1_o', 'rs2_o', 'rd_o',
+        'rf_wp_mux_sel_o', 'alu_op_a_mux_sel_o', 'alu_op_b_mux_sel_o', 'ctrl_trans_instr_o',
+        'data_req_o', 'data_type_o', 'data_we_o', 'data_sign_ext_o',
+        'instr_invalid_o',
+    )
+
+
+class LoadStoreUnit(Bundle):
+    SIGNALS = (
+        'clk', 'we_i', 'data_req_i', 'data_type_i', 'data_sign_ext_i',
+        'wdata_i', 'rdata_o', 'rdata_i', 'data_be_o', 'wdata_o',
+    )
+
+
+class RegisterFile(Bundle):
+    SIGNALS = (
+        'clk', 'rst_n',
+        'raddr_a_i', 'rdata_a_o', 'raddr_b_i', 'rdata_b_o',
+        'waddr_a_i', 'wdata_a_i', 'we_a_i',
+    )
+
+
+class Core(Bundle):
+    """ Internal signals of core_i the monitors sample every cycle """
+
+    SIGNALS = (
+        'if_id_ex_stage_i.program_counter_i.pc_o',
+        'if_id_ex_stage_i.instruction_i',
+        'if_id_ex_stage_i.instr_invalid_o',
+        'if_id_ex_stage_i.rf_we',
+        'if_id_ex_stage_i.rd',
+        'if_id_ex_stage_i.rf_wp_a',
+        'if_id_ex_stage_i.mem_data_req',
+        'if_id_ex_stage_i.mem_we',
+        'if_id_ex_stage_i.alu_result',
+        'if_id_ex_stage_i.wdata_o',
+        'if_id_ex_stage_i.data_be_o',
+        'if_id_ex_stage_i.ctrl_trans_instr',
+        'data_type_o',
+        'if_id_ex_stage_i.register_file_i.reg_file',
+    )
@@ -0,0 +1,329 @@
+"""
+Streaming converter between the memory image formats of the project:
+
+    hex     Verilog hex as written by objcopy -O verilog, simulation image of icache
+    coe     Vivado coefficient file for the block memories in fpga/ (fpga/test_program.coe)
+    bin     raw binary as written by objcopy -O binary
+    elf     linked program, input only
+
+Images flow as chunks, Segments of at most CHUNK bytes in ascending address order, so
+multi-megabyte images are never held in memory as a whole. Binaries and ELF files are read
+through mmap. coe and bin files have no addresses: they start at base, by default the first
+address of the image, and gaps are zero filled. This matches the FPGA build, where the program
+counter resets to 0 and the block memory holds the image from its first byte on.
+
+    convert("verification/system/build/test_program.hex", "fpga/test_program.coe")
+    python verification/unittests/image_convert.py test_program.elf test_program.coe --depth 1024
+
+hex_to_coe() is the fast path for the FPGA build, it copies the byte tokens of the hex file
+straight into the coe file without converting them.
+
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import typing
+import memory_image
+from memory_image import Segment
+
+
+CHUNK           = 1 << 16       # bytes per chunk
+HEX_PER_LINE    = 16            # bytes per line of hex and coe files, like objcopy and the existing coe
+COE_NEWLINE     = '\r\n'        # line ends of coe files, like Vivado and the existing coe
+FORMATS         = ('hex', 'coe', 'bin', 'elf')
+
+
+def detect_format(path : str) -> str:
+    """ Format of a file, ELF by its magic number, the others by extension """
+
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            if f.read(4) == memory_image.ELF_MAGIC:
+                return 'elf'
+    ext = os.path.splitext(path)[1].lstrip('.').lower()
+    if ext in FORMATS:
+        return ext
+    if ext in ('vh', 'mem'):
+        return 'hex'
+    raise ValueError(f"{path}: unknown image format, use one of {', '.join(FORMATS)}")
+
+
+
+###########################################################################
+#### Readers, yield Segments of at most CHUNK bytes
+##########################################################################
+
+
+def read_hex_chunks(path : str, chunk : int = CHUNK) -> typing.Iterator[Segment]:
+
+    addr, data = 0, bytearray()
+    with open(path) as f:
+        for line in f:
+            line = line.split('//', 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith('@'):
+                if data:
+                    yield Segment(addr, bytes(data))
+                addr, data = int(line[1:], 16), bytearray()
+                continue
+            data += bytes.fromhex(line)
+            if len(data) >= chunk:
+                yield Segment(addr, bytes(data))
+                addr, data = addr + len(data), bytearray()
+    if data:
+        yield Segment(addr, bytes(data))
+
+
+def read_bin_chunks(path : str, base : int = memory_image.BIN_BASE, chunk : int = CHUNK) -> typing.Iterator[Segment]:
+
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        for offset in range(0, len(m), chunk):
+            yield Segment(base + offset, m[offset:offset + chunk])
+
+
+def read_elf_chunks(path : str, chunk : int = CHUNK) -> typing.Iterator[Segment]:
+    """ PT_LOAD segments by physical address, .bss zero filled """
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as elf:
+        phoff, = struct.unpack_from('<I', elf, 28)
+        phentsize, phnum = struct.unpack_from('<HH', elf, 42)
+        headers = [struct.unpack_from('<8I', elf, phoff + k*phentsize) for k in range(phnum)]
+
+        for p_type, offset, _, paddr, filesz, memsz, _, _ in sorted(headers, key=lambda h: h[3]):
+            if p_type != memory_image.PT_LOAD:
+                continue
+            for pos in range(0, memsz, chunk):
+                n    = min(chunk, memsz - pos)
+                data = elf[offset + pos:offset + min(pos + n, filesz)] if pos < filesz else b''
+                yield Segment(paddr + pos, data + bytes(n - len(data)))
+
+
+def read_coe_chunks(path : str, base : int = memory_image.BIN_BASE, width : int = 1,
+                    chunk : int = CHUNK) -> typing.Iterator[Segment]:
+    """ memory_initialization_vector of a coe file, entries are width byte little endian values """
+
+    radix, addr, data, in_vector = 16, base, bytearray(), False
+    with open(path) as f:
+        for line in f:
+            line = line.split(';', 1)[0] if in_vector else line
+            line = line.strip()
+            if not in_vector:
+                key, _, value = line.partition('=')
+                if key.strip() == 'memory_initialization_radix':
+                    radix = int(value.strip().rstrip(';'))
+                if key.strip() != 'memory_initialization_vector':
+                    continue
+                in_vector, line = True, value.split(';', 1)[0]
+            for token in line.replace(',', ' ').split():
+                data += int(token, radix).to_bytes(width, 'little')
+            if len(data) >= chunk:
+                yield Segment(addr, bytes(data))
+                addr, data = addr + len(data), bytearray()
+    if data:
+        yield Segment(addr, bytes(data))
+
+
+def read_chunks(path : str, fmt : str = None, base : int = memory_image.BIN_BASE, width : int = 1,
+                chunk : int = CHUNK) -> typing.Iterator[Segment]:
+    """ Chunks of an image in any format, base is the address of bin and coe files """
+
+    fmt = fmt or detect_format(path)
+    if fmt == 'hex':
+        return read_hex_chunks(path, chunk)
+    if fmt == 'bin':
+        return read_bin_chunks(path, base, chunk)
+    if fmt == 'elf':
+        return read_elf_chunks(path, chunk)
+    if fmt == 'coe':
+        return read_coe_chunks(path, base, width, chunk)
+    raise ValueError(f"unknown image format {fmt}")
+
+
+
+###########################################################################
+#### Writers, consume chunks in ascending address order
+##########################################################################
+
+
+def write_hex(f, chunks):
+
+    addr = None
+    line = bytearray()
+    for chunk_addr, data in chunks:
+        if chunk_addr != addr:
+            if line:
+                f.write(" ".join(f"{b:02X}" for b in line) + "\n")
+                line.clear()
+            f.write(f"@{chunk_addr:08X}\n")
+            addr = chunk_addr
+        line += data
+        full = len(line) - len(line) % HEX_PER_LINE
+        for k in range(0, full, HEX_PER_LINE):
+            f.write(" ".join(f"{b:02X}" for b in line[k:k + HEX_PER_LINE]) + "\n")
+        del line[:full]
+        addr += len(data)
+    if line:
+        f.write(" ".join(f"{b:02X}" for b in line) + "\n")
+
+
+def _contiguous(chunks, base : int = None) -> typing.Iterator[bytes]:
+    """ Image bytes from base (default: the first chunk) on, gaps zero filled """
+
+    addr = base
+    for chunk_addr, data in chunks:
+        if addr is None:
+            addr = chunk_addr
+        if chunk_addr < addr:
+            raise ValueError(f"image data at {chunk_addr:#x} below {addr:#x}, chunks out of order or below base")
+        while chunk_addr > addr:
+            gap = min(chunk_addr - addr, CHUNK)
+            yield bytes(gap)
+            addr += gap
+        yield data
+        addr += len(data)
+
+
+def _limit(blocks, depth : int = None) -> typing.Iterator[bytes]:
+    """ Zero pad a byte stream to depth bytes, error if it is longer """
+
+    if depth is None:
+        yield from blocks
+        return
+    left = depth
+    for block in blocks:
+        if len(block) > left:
+            raise ValueError(f"image does not fit into {depth} bytes")
+        left -= len(block)
+        yield block
+    yield bytes(left)
+
+
+def write_bin(f, chunks, base : int = None, depth : int = None):
+    for block in _limit(_contiguous(chunks, base), depth):
+        f.write(block)
+
+
+def write_coe(f, chunks, base : int = None, depth : int = None, width : int = 1):
+    """ f is a text file opened with newline=COE_NEWLINE """
+
+    f.write("memory_initialization_radix = 16;\nmemory_initialization_vector = \n")
+    per_line = max(HEX_PER_LINE // width, 1)
+    pending  = bytearray()
+    line     = None                 # complete line not yet written, the last one ends with ';'
+
+    for block in _limit(_contiguous(chunks, base), depth):
+        pending += block
+        n = len(pending) - len(pending) % (per_line * width)
+        for k in range(0, n, per_line * width):
+            if line is not None:
+                f.write(line + ",\n")
+            line = _coe_line(pending[k:k + per_line * width], width)
+        del pending[:n]
+
+    if pending:
+        if len(pending) % width:
+            pending += bytes(width - len(pending) % width)
+        if line is not None:
+            f.write(line + ",\n")
+        line = _coe_line(pending, width)
+    f.write((line or "0") + ";\n")
+
+
+def _coe_line(data : bytes, width : int) -> str:
+    return ", ".join(f"{int.from_bytes(data[k:k + width], 'little'):0{2*width}X}" for k in range(0, len(data), width))
+
+
+def hex_to_coe(src : str, dst : str, depth : int = None):
+    """ Fast path from the simulation image to a byte wide coe, copies the hex tokens, gaps zero filled """
+
+    with open(src) as fin, open(dst, 'w', newline=COE_NEWLINE) as fout:
+        fout.write("memory_initialization_radix = 16;\nmemory_initialization_vector = \n")
+        addr, base, line, count = None, None, None, 0
+
+        def emit(tokens):
+            nonlocal line, count
+            for k in range(0, len(tokens), HEX_PER_LINE):
+                if line is not None:
+                    fout.write(line + ",\n")
+                line   = ", ".join(tokens[k:k + HEX_PER_LINE])
+                count += len(tokens[k:k + HEX_PER_LINE])
+
+        tokens = []
+        for text in fin:
+            text = text.split('//', 1)[0].strip()
+            if not text:
+                continue
+            if text.startswith('@'):
+                target = int(text[1:], 16)
+                if base is None:
+                    addr = base = target
+                if target < addr:
+                    raise ValueError(f"{src}: address {target:#x} below {addr:#x}")
+                tokens += ["00"] * (target - addr)
+                addr = target
+                continue
+            new     = text.upper().split()
+            tokens += new
+            addr   += len(new)
+            full    = len(tokens) - len(tokens) % HEX_PER_LINE
+            emit(tokens[:full])
+            del tokens[:full]
+
+        if depth is not None:
+            if count + len(tokens) > depth:
+                raise ValueError(f"image does not fit into {depth} bytes")
+            tokens += ["00"] * (depth - count - len(tokens))
+        emit(tokens)
+        fout.write((line or "0") + ";\n")
+
+
+def convert(src : str, dst : str, src_fmt : str = None, dst_fmt : str = None, base : int = None,
+            depth : int = None, width : int = 1):
+    """ Convert an image between formats, base is the address coe and bin data starts at (default: first address) """
+
+    src_fmt = src_fmt or detect_format(src)
+    dst_fmt = dst_fmt or detect_format(dst)
+
+    if src_fmt == 'hex' and dst_fmt == 'coe' and base is None and width == 1:
+        return hex_to_coe(src, dst, depth)
+
+    in_base = base if base is not None else memory_image.BIN_BASE
+    chunks  = read_chunks(src, src_fmt, in_base, width)
+
+    tmp = f"{dst}.{os.getpid()}"                    # no half written image on errors
+    try:
+        mode = 'w' if dst_fmt in ('hex', 'coe') else 'wb'
+        with open(tmp, mode, newline=COE_NEWLINE if dst_fmt == 'coe' else None) as f:
+            if dst_fmt == 'hex':
+                write_hex(f, chunks)
+            elif dst_fmt == 'bin':
+                write_bin(f, chunks, base, depth)
+            elif dst_fmt == 'coe':
+                write_coe(f, chunks, base, depth, width)
+            else:
+                raise ValueError(f"cannot write {dst_fmt} images")
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Convert memory images between hex, coe, bin and ELF")
+    parser.add_argument("src")
+    parser.add_argument("dst")
+    parser.add_argument("--from", dest="src_fmt", choices=FORMATS)
+    parser.add_argument("--to", dest="dst_fmt", choices=FORMATS[:3])
+    parser.add_argument("--base", type=lambda s: int(s, 0), help="address of the first coe/bin byte")
+    parser.add_argument("--depth", type=lambda s: int(s, 0), help="pad coe/bin output to this many bytes")
+    parser.add_argument("--width", type=int, default=1, help="bytes per coe entry, 4 for the data memory")
+    args = parser.parse_args()
+
+    convert(args.src, args.dst, args.src_fmt, args.dst_fmt, args.base, args.depth, args.width)
@@ -0,0 +1,150 @@
+"""
+Read program images as produced by `make bin`: Verilog hex (objcopy -O verilog), raw binary
+(objcopy -O binary) and the linked ELF file.
+
+    image = read_image("verification/system/build/test_program.elf")
+    image.entry, image.code, image.data
+
+ELF files are read through mmap, only the bytes of their loadable segments are copied. Images
+are lists of segments at their real addresses, never arrays of the whole memory.
+
+"""
+
+import mmap
+import numpy as np
+import struct
+import typing
+
+
+BIN_BASE    = 0x10074           # load address of raw binaries, first address of the default linker layout
+
+ELF_MAGIC   = b'\x7fELF'
+EM_RISCV    = 0xF3
+PT_LOAD     = 1
+PF_X        = 1                 # segment flags
+PF_W        = 2
+SHT_SYMTAB  = 2
+STT_SECTION = 3                 # symbol types that are not code or data labels
+STT_FILE    = 4
+
+
+class Segment(typing.NamedTuple):
+    """ Contiguous block of bytes starting at byte address addr """
+    addr : int
+    data : bytes
+
+
+def read_hex(path : str) -> typing.List[Segment]:
+    """ Parse a Verilog hex file (objcopy -O verilog): '@<addr>' lines followed by byte tokens """
+
+    segments = []
+    addr     = 0
+    data     = bytearray()
+
+    with open(path, 'r') as file:
+        for line in file:
+            line = line.split('//', 1)[0].strip()
+            if not line:
+                continue
+
+            if line.startswith('@'):
+                if data:
+                    segments.append(Segment(addr, bytes(data)))
+                addr = int(line[1:], 16)
+                data = bytearray()
+            else:
+                data += bytes.fromhex(line)
+
+    if data:
+        segments.append(Segment(addr, bytes(data)))
+
+    return segments
+
+
+def segment_words(segment : Segment) -> np.ndarray:
+    """ View a segment as little endian 32 bit words, a trailing partial word is zero padded """
+
+    data = segment.data + bytes(-len(segment.data) % 4)
+    return np.frombuffer(data, dtype='<u4').astype(np.uint32)
+
+
+
+def read_bin(path : str, addr : int = BIN_BASE) -> typing.List[Segment]:
+    """ Raw binary, one segment at addr """
+
+    with open(path, 'rb') as file:
+        return [Segment(addr, file.read())]
+
+
+class Image(typing.NamedTuple):
+    """ Program with the segments for instruction and data memory """
+    entry   : int
+    code    : typing.List[Segment]      # instruction memory
+    data    : typing.List[Segment]      # data memory
+
+
+def read_elf(path : str) -> Image:
+    """ PT_LOAD segments of a 32 bit RISC-V ELF file at their physical addresses, .bss zero filled, executable
+        segments are code, writable and non-executable ones data """
+
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as elf:
+
+        if elf[:4] != ELF_MAGIC or elf[4] != 1 or elf[5] != 1:
+            raise ValueError(f"{path}: not a 32 bit little endian ELF file")
+        machine, = struct.unpack_from('<H', elf, 18)
+        if machine != EM_RISCV:
+            raise ValueError(f"{path}: ELF machine {machine:#x} is not RISC-V")
+
+        entry, phoff = struct.unpack_from('<II', elf, 24)
+        phentsize, phnum = struct.unpack_from('<HH', elf, 42)
+
+        code, data = [], []
+        for k in range(phnum):
+            p_type, offset, _, paddr, filesz, memsz, flags, _ = struct.unpack_from('<8I', elf, phoff + k*phentsize)
+            if p_type != PT_LOAD or memsz == 0:
+                continue
+            segment = Segment(paddr, elf[offset:offset + filesz] + bytes(memsz - filesz))
+            if flags & PF_X:
+                code.append(segment)
+            if flags & PF_W or not flags & PF_X:
+                data.append(segment)
+
+    return Image(entry, code, data)
+
+
+def read_symbols(path : str) -> typing.Dict[str, int]:
+    """ Labels of the .symtab of an ELF file and their addresses, without section, file and mapping symbols """
+
+    symbols = {}
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as elf:
+
+        if elf[:4] != ELF_MAGIC:
+            raise ValueError(f"{path}: not an ELF file")
+        shoff, = struct.unpack_from('<I', elf, 32)
+        shentsize, shnum = struct.unpack_from('<HH', elf, 46)
+        sections = [struct.unpack_from('<10I', elf, shoff + k*shentsize) for k in range(shnum)]
+
+        for _, sh_type, _, _, offset, size, link, _, _, entsize in sections:
+            if sh_type != SHT_SYMTAB:
+                continue
+            strtab = sections[link][4]
+            for pos in range(offset, offset + size, entsize or 16):
+                name, value, _, info, _, shndx = struct.unpack_from('<IIIBBH', elf, pos)
+                end   = elf.find(b'\0', strtab + name)
+                label = elf[strtab + name:end].decode()
+                if not label or shndx == 0 or info & 0xF in (STT_SECTION, STT_FILE) or label.startswith(('$', '.L')):
+                    continue
+                symbols[label] = value
+    return symbols
+
+
+def read_image(path : str) -> Image:
+    """ ELF, raw binary (.bin) or Verilog hex file, the latter two are code only, like the $readmemh image of icache """
+
+    with open(path, 'rb') as file:
+        magic = file.read(4)
+
+    if magic == ELF_MAGIC:
+        return read_elf(path)
+    segments = read_bin(path) if path.endswith('.bin') else read_hex(path)
+    return Image(BIN_BASE, segments, [])
@@ -0,0 +1,121 @@
+"""
+Performance counters of the core: cycles, retired instructions, CPI, loads and stores by
+width, taken and not taken branches, jumps, cycles with an invalid instruction and the
+instruction mix.
+
+A CoreMonitor listener, every cycle it writes one row with the instruction and the control
+signals of core_i into a preallocated array. Full arrays are folded into the counters with
+numpy, so a cycle costs one row assignment, no matter how many counters there are:
+
+    counters = PerfCounters(dut.soc_i.core_i)
+    monitor.listeners.insert(0, counters)
+    await monitor.run(max_cycles=MAX_CYCLES)
+    write_json("perf.json", [counters.report("alu")])
+
+The soc and top testbenches report every program they run with make PERF_COUNTERS=perf.json.
+
+"""
+
+import json
+import numpy as np
+import harness
+import rv_disasm
+from constants_pkg import CTRL_TRANS_SEL_JUMP, CTRL_TRANS_SEL_BRANCH
+from core_monitor import Sample
+
+
+CHUNK   = 1 << 14                   # cycles buffered before they are folded into the counters
+
+WIDTHS  = ('byte', 'half', 'word')  # data_type_o 00, 01, 10
+
+
+_ROW_DTYPE = np.dtype([
+    ('instr',       np.uint32),
+    ('invalid',     np.bool_),
+    ('mem_req',     np.bool_),
+    ('mem_we',      np.bool_),
+    ('data_type',   np.uint8),
+    ('ctrl',        np.uint8),      # ctrl_trans_instr: 00 none, 01 jump, 10 branch
+    ('taken',       np.bool_),      # alu_result[0], branch_tkn_i of the program counter
+])
+
+
+class PerfCounters:
+    """ Listener counting the events of every cycle of core_i """
+
+    def __init__(self, core, chunk : int = CHUNK):
+
+        core            = harness.Core.of(core)
+        self._data_type = core.data_type_o
+        self._ctrl      = core.ctrl_trans_instr
+
+        self._rows      = np.zeros(chunk, dtype=_ROW_DTYPE)
+        self._count     = 0
+
+        self.cycles         = 0
+        self.retired        = 0
+        self.invalid_cycles = 0
+        self.jumps          = 0
+        self.branches       = np.zeros(2, dtype=np.int64)               # not taken, taken
+        self.loads          = np.zeros(4, dtype=np.int64)               # by data_type_o
+        self.stores         = np.zeros(4, dtype=np.int64)
+        self.mix            = np.zeros(len(rv_disasm.MNEMONICS), dtype=np.int64)
+
+
+    def __call__(self, sample : Sample):
+
+        self._rows[self._count] = (sample.instr, sample.instr_invalid, sample.mem_req, sample.mem_we,
+                                   int(self._data_type.value), int(self._ctrl.value), sample.mem_addr & 1)
+        self._count += 1
+        if self._count == len(self._rows):
+            self.fold()
+        return None
+
+
+    def fold(self):
+        """ Add the buffered cycles to the counters """
+
+        rows        = self._rows[:self._count]
+        self._count = 0
+        valid       = ~rows['invalid']
+        retired     = rows[valid]
+
+        self.cycles         += len(rows)
+        self.retired        += len(retired)
+        self.invalid_cycles += len(rows) - len(retired)
+
+        ctrl        = retired['ctrl']
+        self.jumps         += np.count_nonzero(ctrl == CTRL_TRANS_SEL_JUMP)
+        self.branches      += np.bincount(retired['taken'][ctrl == CTRL_TRANS_SEL_BRANCH], minlength=2)
+
+        access      = retired[retired['mem_req']]
+        self.loads         += np.bincount(access['data_type'][~access['mem_we']] & 0b11, minlength=4)
+        self.stores        += np.bincount(access['data_type'][access['mem_we']] & 0b11, minlength=4)
+
+        mnemonic    = rv_disasm.decode(retired['instr'])['mnemonic']
+        self.mix           += np.bincount(mnemonic[mnemonic >= 0], minlength=len(self.mix))
+
+
+    def report(self, program : str = None) -> dict:
+        """ Counters as a JSON serializable dict """
+
+        self.fold()
+        return {
+            'program'       : program,
+            'cycles'        : self.cycles,
+            'instructions'  : self.retired,
+            'cpi'           : self.cycles / self.retired if self.retired else None,
+            'invalid_cycles': self.invalid_cycles,
+            'loads'         : {width : int(n) for width, n in zip(WIDTHS, self.loads)},
+            'stores'        : {width : int(n) for width, n in zip(WIDTHS, self.stores)},
+            'branches'      : {'taken' : int(self.branches[1]), 'not_taken' : int(self.branches[0])},
+            'jumps'         : int(self.jumps),
+            'mix'           : {rv_disasm.MNEMONICS[k] : int(self.mix[k]) for k in np.flatnonzero(self.mix)},
+        }
+
+
+
+def write_json(path : str, reports : list):
+    with open(path, 'w') as f:
+        json.dump(reports, f, indent=2)
+        f.write("\n")
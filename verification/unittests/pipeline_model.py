@@ -0,0 +1,198 @@
+"""
+Trace driven what-if model of pipelined versions of if_id_ex_stage: replays the commit trace of
+a program (commit_trace.py, make COMMIT_TRACE=...) and estimates the cycles and CPI of a 2, 3
+and 5 stage pipeline, with and without forwarding.
+
+In order, single issue, predict not taken. The model counts
+
+    data stalls       a source register is written by one of the previous instructions and
+                      the value is not available in time. The register file is read in decode
+                      and written in writeback, writes before reads. Forwarding also passes
+                      results to the start of execute (memory for store data) from the end of
+                      execute, or of memory for loads (load-use hazard)
+    control bubbles   taken branches and jalr are resolved in execute, jal in its jump stage,
+                      the instructions fetched after them are flushed
+
+The hazards are computed with numpy over the whole trace. Stalls only depend on each other if a
+producer two or more instructions back needs a stall, those instructions are resolved in order.
+
+    python verification/unittests/pipeline_model.py commit.trace
+    python verification/unittests/pipeline_model.py commit.*.trace --json pipeline.json
+
+"""
+
+import argparse
+import json
+import typing
+import numpy as np
+import rv_disasm
+from constants_pkg import OPC_LOAD, OPC_STORE, OPC_JAL, OPC_JALR, B_TYPE
+from commit_trace import read_trace
+
+
+class Pipeline(typing.NamedTuple):
+    """ Stage numbers, 1 is fetch """
+    name        : str
+    stages      : int
+    decode      : int           # register file read
+    execute     : int           # ALU result and branch condition
+    memory      : int           # load data
+    writeback   : int           # register file write
+    jump        : int           # jal target known
+    forwarding  : bool
+
+
+PIPELINES = [
+    Pipeline('1-stage',       1, 1, 1, 1, 1, 1, True),     # if_id_ex_stage as it is
+    Pipeline('2-stage',       2, 2, 2, 2, 2, 2, True),     # IF | ID EX MEM WB
+    Pipeline('3-stage',       3, 2, 2, 3, 3, 2, True),     # IF | ID EX | MEM WB
+    Pipeline('3-stage-nofwd', 3, 2, 2, 3, 3, 2, False),
+    Pipeline('5-stage',       5, 2, 3, 4, 5, 2, True),     # IF | ID | EX | MEM | WB
+    Pipeline('5-stage-nofwd', 5, 2, 3, 4, 5, 2, False),
+]
+
+
+class Result(typing.NamedTuple):
+    pipeline        : str
+    instructions    : int
+    cycles          : int
+    cpi             : float
+    data_stalls     : int
+    load_use_stalls : int           # data stalls waiting for the result of a load in the instruction before
+    control_bubbles : int
+
+
+class _Trace(typing.NamedTuple):
+    """ Per instruction properties of a trace the pipelines are evaluated on """
+    pc      : np.ndarray
+    rd      : np.ndarray            # written register, 0 if none
+    rs      : tuple                 # rs1, rs2, 0 if not read
+    load    : np.ndarray
+    store   : np.ndarray
+    branch  : np.ndarray            # conditional branch, taken
+    jal     : np.ndarray
+    jalr    : np.ndarray
+
+
+def _analyze(records : np.ndarray) -> _Trace:
+
+    fields  = rv_disasm.decode(records['instr'])
+    fmt     = fields['fmt']
+    opcode  = fields['opcode']
+    uses_rs1 = np.isin(fmt, [rv_disasm.FMT_R, rv_disasm.FMT_I, rv_disasm.FMT_S, rv_disasm.FMT_B])
+    uses_rs2 = np.isin(fmt, [rv_disasm.FMT_R, rv_disasm.FMT_S, rv_disasm.FMT_B])
+
+    pc      = records['pc'].astype(np.int64)
+    taken   = np.zeros(len(pc), dtype=bool)
+    taken[:-1] = pc[1:] != pc[:-1] + 4          # the last instruction has no successor
+
+    return _Trace(
+        pc      = pc,
+        rd      = records['rd'].astype(np.int64),
+        rs      = (np.where(uses_rs1, fields['rs1'], 0).astype(np.int64),
+                   np.where(uses_rs2, fields['rs2'], 0).astype(np.int64)),
+        load    = opcode == OPC_LOAD,
+        store   = opcode == OPC_STORE,
+        branch  = (opcode == B_TYPE) & taken,
+        jal     = opcode == OPC_JAL,
+        jalr    = opcode == OPC_JALR,
+    )
+
+
+def _shift(values : np.ndarray, d : int, fill=0) -> np.ndarray:
+    """ values[i - d] at index i """
+
+    shifted = np.full_like(values, fill)
+    shifted[d:] = values[:len(values) - d]
+    return shifted
+
+
+def evaluate(records : np.ndarray, pipeline : Pipeline, trace : _Trace = None) -> Result:
+    """ Cycles of pipeline for the instructions of a commit trace """
+
+    t = trace or _analyze(records)
+    n = len(t.pc)
+
+    # flushed fetches after each instruction, they sit between it and its successors
+    bubbles = (np.where(t.branch | t.jalr, pipeline.execute - 1, 0)
+               + np.where(t.jal, pipeline.jump - 1, 0)).astype(np.int64)
+    bubbles[-1:] = 0
+
+    # required distance in cycles between producer and consumer for every source operand
+    # through the register file: written in writeback, read in decode of a later cycle or the same one
+    regfile = pipeline.writeback - pipeline.decode
+    if pipeline.forwarding:
+        ready   = np.where(t.load, pipeline.memory, pipeline.execute)             # producer, end of stage
+        need    = [np.full(n, pipeline.execute), np.where(t.store, pipeline.memory, pipeline.execute)]
+        max_d   = min(pipeline.memory - pipeline.execute + 1, regfile)
+    else:
+        max_d   = regfile
+
+    # terms[d][i]: stalls instruction i needs for its producer d instructions back, before the stalls in between
+    terms   = {}
+    found   = [t.rs[0] == 0, t.rs[1] == 0]           # operand already has a closer producer
+    gap     = np.zeros(n, dtype=np.int64)           # bubbles between i - d and i
+    for d in range(1, max_d + 1):
+        gap += _shift(bubbles, d)
+        rd   = _shift(t.rd, d)
+        term = np.zeros(n, dtype=np.int64)
+        for k in range(2):
+            hit       = ~found[k] & (t.rs[k] == rd) & (np.arange(n) >= d)
+            found[k]  = found[k] | hit
+            required  = regfile - d - gap
+            if pipeline.forwarding:
+                required = np.minimum(required, _shift(ready, d) - need[k] + 1 - d - gap)
+            term      = np.maximum(term, np.where(hit, required, 0))
+        terms[d] = term
+
+    stalls  = terms.get(1, np.zeros(n, dtype=np.int64)).copy()
+    load_use = int(stalls[1:][t.load[:-1]].sum()) if n else 0
+
+    # farther producers are reduced by the stalls of the instructions in between, in order
+    coupled = np.zeros(n, dtype=bool)
+    for d in range(2, max_d + 1):
+        coupled |= terms[d] > 0
+    for i in np.flatnonzero(coupled).tolist():
+        stall = int(stalls[i])
+        for d in range(2, max_d + 1):
+            stall = max(stall, int(terms[d][i]) - int(stalls[i - d + 1:i].sum()))
+        stalls[i] = stall
+
+    data    = int(stalls.sum())
+    control = int(bubbles.sum())
+    cycles  = n + pipeline.stages - 1 + data + control if n else 0
+    return Result(pipeline.name, n, cycles, cycles / n if n else 0.0, data, load_use, control)
+
+
+def evaluate_all(records : np.ndarray, pipelines : list = PIPELINES) -> typing.List[Result]:
+    trace = _analyze(records)
+    return [evaluate(records, pipeline, trace) for pipeline in pipelines]
+
+
+def format_results(results : typing.List[Result]) -> str:
+
+    lines = [f"{'pipeline':<16}{'instr':>10}{'cycles':>10}{'CPI':>7}{'data':>9}{'load-use':>10}{'control':>9}"]
+    for r in results:
+        lines.append(f"{r.pipeline:<16}{r.instructions:>10}{r.cycles:>10}{r.cpi:>7.3f}"
+                     f"{r.data_stalls:>9}{r.load_use_stalls:>10}{r.control_bubbles:>9}")
+    return "\n".join(lines)
+
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Estimate cycles and CPI of pipelined cores from commit traces")
+    parser.add_argument("traces", nargs='+')
+    parser.add_argument("--json", help="write the results of all traces to this file")
+    args = parser.parse_args()
+
+    report = {}
+    for path in args.traces:
+        results = evaluate_all(read_trace(path))
+        report[path] = [r._asdict() for r in results]
+        print(f"#### {path}")
+        print(format_results(results))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,222 @@
+"""
+Cycle profiler of programs running on the core, tells which labels and loops the cycles go to.
+
+A CoreMonitor listener records pc_o every cycle, or every period-th cycle, into a preallocated
+array that is folded into a histogram with numpy when it is full. It also keeps a shadow call
+stack from the calling convention (jal/jalr writing ra or t0 call, jalr x0, ra returns), so the
+profile can be written as folded stacks for flamegraph.pl or speedscope:
+
+    profiler = Profiler(period=1)
+    monitor.listeners.insert(0, profiler)
+    await monitor.run(max_cycles=MAX_CYCLES)
+
+    symbols  = Symbols(load_symbols("verification/system/build/calculator.elf"))
+    print(profiler.flat(symbols))
+    open("profile.folded", "w").write(profiler.folded(symbols))
+
+Addresses are mapped to the closest label at or below them. Labels come from the first of these
+that holds the same bytes as the image: the image itself if it is an ELF file, the ELF file next
+to it (make bin), the assembly source (ASM_FILE of the Makefile, or verification/system/<name>.s).
+The soc and top testbenches profile every program with make PROFILE=<name>, which writes
+<name>.txt and <name>.folded.
+
+"""
+
+import collections
+import os
+import typing
+import numpy as np
+import memory_image
+import rv_assembler
+import rv_disasm
+from core_monitor import Sample
+
+
+CHUNK           = 1 << 14               # samples buffered before they are folded into the histogram
+ASSEMBLY_DIR    = "verification/system"
+
+OPC_JAL, OPC_JALR = 0x6F, 0x67
+LINK_REGS       = (1, 5)                # ra, t0
+
+
+def _nonzero_bytes(image : memory_image.Image) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """ Addresses and values of the non zero bytes of an image, alike for hex, bin and ELF (.bss, gaps) """
+
+    addrs, values = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.uint8)]
+    for segment in image.code + image.data:
+        data    = np.frombuffer(segment.data, dtype=np.uint8)
+        nonzero = np.flatnonzero(data)
+        addrs.append(segment.addr + nonzero)
+        values.append(data[nonzero])
+    addrs, first = np.unique(np.concatenate(addrs), return_index=True)
+    return addrs, np.concatenate(values)[first]
+
+
+def same_image(a : memory_image.Image, b : memory_image.Image) -> bool:
+    """ Same entry point and memory contents """
+
+    (addrs_a, values_a), (addrs_b, values_b) = _nonzero_bytes(a), _nonzero_bytes(b)
+    return a.entry == b.entry and np.array_equal(addrs_a, addrs_b) and np.array_equal(values_a, values_b)
+
+
+def load_symbols(program : str, source : str = None) -> dict:
+    """ Labels of a program image from itself, the ELF file next to it or its assembly source, the first that
+        holds the same image, {} if none does. source defaults to verification/system/<name>.s """
+
+    with open(program, 'rb') as f:
+        if f.read(4) == memory_image.ELF_MAGIC:
+            return memory_image.read_symbols(program)
+
+    image = memory_image.read_image(program)
+    stem  = os.path.splitext(program)[0]
+    if os.path.exists(stem + '.elf') and same_image(image, memory_image.read_elf(stem + '.elf')):
+        return memory_image.read_symbols(stem + '.elf')
+
+    source = source or os.path.join(ASSEMBLY_DIR, os.path.basename(stem) + '.s')
+    if os.path.exists(source):
+        with open(source) as f:
+            try:
+                assembled = rv_assembler.assemble(f.read())
+            except rv_assembler.AssemblerError:         # GNU as syntax the Python assembler does not know
+                return {}
+        if same_image(image, memory_image.Image(assembled.origin, assembled.segments(), [])):
+            return assembled.symbols
+    return {}
+
+
+
+class Symbols:
+    """ Address to label lookup """
+
+    def __init__(self, symbols : dict):
+
+        items       = sorted((addr, name) for name, addr in symbols.items())
+        self.addrs  = np.array([addr for addr, _ in items], dtype=np.int64)
+        self.names  = [name for _, name in items]
+
+
+    def lookup(self, pcs) -> list:
+        """ Closest label at or below each pc, the address itself below the first label """
+
+        pcs   = np.asarray(pcs, dtype=np.int64).ravel()
+        index = np.searchsorted(self.addrs, pcs, side='right') - 1
+        return [self.names[k] if k >= 0 else f"{pc:#010x}" for k, pc in zip(index.tolist(), pcs.tolist())]
+
+
+    def offset(self, pc : int) -> str:
+        k = int(np.searchsorted(self.addrs, pc, side='right')) - 1
+        return f"{self.names[k]}+{pc - int(self.addrs[k]):#x}" if k >= 0 else f"{pc:#010x}"
+
+
+
+class Profiler:
+    """ Listener building a histogram of pc over call stacks """
+
+    def __init__(self, period : int = 1, chunk : int = CHUNK):
+
+        self.period     = period
+        self.cycles     = 0                 # cycles seen, samples are every period-th of them
+        self.histogram  = collections.Counter()     # (stack id, pc) -> samples
+        self.words      = {}                # pc -> instruction word, for the listing of hot instructions
+
+        self._pcs       = np.zeros(chunk, dtype=np.uint64)
+        self._stack_ids = np.zeros(chunk, dtype=np.uint64)
+        self._instrs    = np.zeros(chunk, dtype=np.uint32)
+        self._count     = 0
+
+        self.stacks     = [()]              # stack id -> tuple of function entry pcs, outermost first
+        self._stack_ids_of = {() : 0}
+        self._stack     = ()
+        self._stack_id  = 0
+        self._call      = False             # the previous instruction was a call, this pc is the callee
+
+
+    def _set_stack(self, stack : tuple):
+
+        if stack not in self._stack_ids_of:
+            self._stack_ids_of[stack] = len(self.stacks)
+            self.stacks.append(stack)
+        self._stack, self._stack_id = stack, self._stack_ids_of[stack]
+
+
+    def __call__(self, sample : Sample):
+
+        if not sample.instr_invalid and (self._call or not self._stack):
+            self._set_stack(self._stack + (sample.pc,))
+            self._call = False
+
+        if self.cycles % self.period == 0:
+            self._pcs[self._count]       = sample.pc
+            self._stack_ids[self._count] = self._stack_id
+            self._instrs[self._count]    = sample.instr
+            self._count += 1
+            if self._count == len(self._pcs):
+                self.fold()
+        self.cycles += 1
+
+        instr = sample.instr
+        if not sample.instr_invalid and instr & 0x7F in (OPC_JAL, OPC_JALR):
+            rd, rs1 = (instr >> 7) & 0x1F, (instr >> 15) & 0x1F
+            if rd in LINK_REGS:
+                self._call = True
+            elif instr & 0x7F == OPC_JALR and rd == 0 and rs1 in LINK_REGS and len(self._stack) > 1:
+                self._set_stack(self._stack[:-1])
+        return None
+
+
+    def fold(self):
+        """ Add the buffered samples to the histogram """
+
+        keys = (self._stack_ids[:self._count] << np.uint64(32)) | self._pcs[:self._count]
+        pcs, first = np.unique(self._pcs[:self._count], return_index=True)
+        self.words.update(zip(pcs.tolist(), self._instrs[first].tolist()))
+        self._count = 0
+
+        keys, counts = np.unique(keys, return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.histogram[(key >> 32, key & 0xFFFF_FFFF)] += count
+
+
+    def pc_counts(self) -> collections.Counter:
+        """ Samples per pc over all stacks """
+
+        self.fold()
+        counts = collections.Counter()
+        for (_, pc), count in self.histogram.items():
+            counts[pc] += count
+        return counts
+
+
+    def flat(self, symbols : Symbols, top : int = 20) -> str:
+        """ Samples per label, then the top hottest instructions """
+
+        counts  = self.pc_counts()
+        total   = sum(counts.values()) or 1
+        pcs     = sorted(counts)
+        labels  = collections.Counter()
+        for label, pc in zip(symbols.lookup(pcs), pcs):
+            labels[label] += counts[pc]
+
+        lines = [f"{sum(counts.values())} samples of {self.cycles} cycles, period {self.period}",
+                 f"{'samples':>10}{'%':>8}  label"]
+        for label, count in labels.most_common():
+            lines.append(f"{count:>10}{100 * count / total:>8.2f}  {label}")
+
+        lines += ["", f"{'samples':>10}{'%':>8}  {'pc':<10}{'location':<24}instruction"]
+        for pc, count in counts.most_common(top):
+            text = rv_disasm.format_instr(self.words[pc])
+            lines.append(f"{count:>10}{100 * count / total:>8.2f}  {pc:08x}  {symbols.offset(pc):<24}{text}")
+        return "\n".join(lines) + "\n"
+
+
+    def folded(self, symbols : Symbols) -> str:
+        """ One 'outer;inner;label count' line per stack and label, the flame graph input format """
+
+        self.fold()
+        folded = collections.Counter()
+        for (stack_id, pc), count in self.histogram.items():
+            frames = symbols.lookup(self.stacks[stack_id] + (pc,))
+            if len(frames) > 1 and frames[-1] == frames[-2]:
+                frames.pop()
+            folded[";".join(frames)] += count
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(folded.items()))
@@ -0,0 +1,109 @@
+"""
+Backdoor program loading, writes a program image straight into the icache and dcache memories
+of a soc, so one compiled model runs any number of programs.
+
+Load while the core is held in reset, the writes take effect before the next clock edge:
+
+    loader = ProgramLoader.of(dut.soc_i)
+    image  = loader.load("verification/system/build/test_program.elf")    # hex, bin or ELF
+    assert image.entry == rv_iss.RESET_PC
+    await reset(dut.clk, dut.rst_n)
+
+Code segments go to the icache, data segments to the dcache, both at their real addresses (see
+memory_image.read_image). The loader remembers the segments in the icache and only writes the
+bytes of the address ranges the previous and the new program cover that differ, so memory is
+never handled as a whole 1 MiB array. Without the +backdoor_load plusarg (make PROGRAM=...)
+icache still starts with HEX_FILE from $readmemh, the loader then starts from that image.
+The dcache is written completely, as the core modifies it: data bytes below its size, zero
+elsewhere.
+
+"""
+
+import os
+import cocotb
+import numpy as np
+import memory_image
+
+
+ICACHE_SIZE = 1 << 20           # icache RAM_DEPTH
+DCACHE_SIZE = 1025              # dcache mem [0:SIZE_LAU]
+
+HEX_FILE    = "verification/system/build/test_program.hex"     # $readmemh image of icache
+PLUSARG     = "backdoor_load"                                  # skips $readmemh
+
+
+def _spans(segments, size : int) -> list:
+    """ Merged [start, end) address ranges of segments, clipped to a memory of size bytes """
+
+    spans = []
+    for start, end in sorted((addr, min(addr + len(data), size)) for addr, data in segments if addr < size):
+        if spans and start <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], end)
+        else:
+            spans.append([start, end])
+    return spans
+
+
+def _place(start : int, end : int, segments) -> np.ndarray:
+    """ Bytes start..end of a memory holding only segments, zero elsewhere """
+
+    mem = np.zeros(end - start, dtype=np.uint8)
+    for addr, data in segments:
+        lo, hi = max(addr, start), min(addr + len(data), end)
+        if lo < hi:
+            mem[lo - start:hi - start] = np.frombuffer(data, dtype=np.uint8, count=hi - addr)[lo - addr:]
+    return mem
+
+
+class ProgramLoader:
+    """ Writes program images into icache_i.mem and dache_i.mem of a soc """
+
+    _cache : dict = {}
+
+
+    def __init__(self, soc):
+
+        self._icache    = soc.icache_i.mem
+        self._dcache    = soc.dache_i.mem
+
+        self.code       = []            # segments currently in the icache
+        if PLUSARG not in cocotb.plusargs and os.path.exists(HEX_FILE):
+            self.code   = memory_image.read_hex(HEX_FILE)
+
+        self.bytes_written = 0
+
+
+    @classmethod
+    def of(cls, soc) -> "ProgramLoader":
+        """ Loader of soc, created on the first call so it tracks the icache across programs """
+
+        if soc._path not in cls._cache:
+            cls._cache[soc._path] = cls(soc)
+        return cls._cache[soc._path]
+
+
+    def load(self, image) -> memory_image.Image:
+        """ Write a program: a path to a hex, bin or ELF file, an Image or a list of code segments """
+
+        if isinstance(image, str):
+            image = memory_image.read_image(image)
+        elif not isinstance(image, memory_image.Image):
+            image = memory_image.Image(memory_image.BIN_BASE, list(image), [])
+
+        for start, end in _spans(self.code + image.code, ICACHE_SIZE):
+            old, new = _place(start, end, self.code), _place(start, end, image.code)
+            changed  = np.flatnonzero(old != new)
+            for addr, value in zip((changed + start).tolist(), new[changed].tolist()):
+                self._icache[addr].value = value
+            self.bytes_written += len(changed)
+        self.code = image.code
+
+        for addr, value in enumerate(_place(0, DCACHE_SIZE, image.data).tolist()):
+            self._dcache[addr].value = value
+        self.bytes_written += DCACHE_SIZE
+
+        dropped = [segment.addr for segment in image.data if segment.addr + len(segment.data) > DCACHE_SIZE]
+        if dropped:
+            print(f"Data segments at {', '.join(f'{addr:#x}' for addr in dropped)} do not fit into the "
+                  f"{DCACHE_SIZE} byte dcache, only the part below is loaded")
+        return image
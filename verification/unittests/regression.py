@@ -0,0 +1,173 @@
+"""
+Regression runner, builds and runs the testbench of every TOP in parallel and merges the
+cocotb results into one JUnit report.
+
+Each job is a 'make TOP=<top>' from the repository root with its own model from the build
+cache (build_cache.py), results file and trace file, so jobs never share files. Jobs run in a pool sized to the
+available cores, a job that exceeds its timeout is killed with its whole process group.
+
+    python verification/unittests/regression.py                     # all tb_*.py testbenches
+    python verification/unittests/regression.py alu decoder -j 2 SEED=1
+
+Arguments of the form NAME=VALUE are passed on to make. The report is written to
+regression.xml, build and simulation output of each job to sim_build/regression/<top>/make.log.
+
+"""
+
+import argparse
+import concurrent.futures
+import glob
+import os
+import shlex
+import signal
+import subprocess
+import time
+import typing
+import xml.etree.ElementTree as ET
+
+
+ROOT        = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+BUILD_DIR   = 'sim_build/regression'        # relative to ROOT
+TIMEOUT     = 1800                          # s per job, build and simulation
+LOG_TAIL    = 40                            # lines of make output kept in the report of a failed job
+
+
+class Job(typing.NamedTuple):
+    top         : str
+    cmd         : str
+    returncode  : int
+    timed_out   : bool
+    time        : float         # s, build and simulation
+    results     : str           # cocotb results.xml
+    log         : str
+
+
+def testbenches() -> list:
+    """ Every TOP with a tb_<top>.py testbench """
+
+    pattern = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tb_*.py')
+    return sorted(os.path.basename(path)[3:-3] for path in glob.glob(pattern))
+
+
+def run_job(top : str, make_vars : list = (), timeout : float = TIMEOUT) -> Job:
+    """ Build and run the testbench of top in its own build directory """
+
+    build   = f"{BUILD_DIR}/{top}"
+    results = f"{build}/results.xml"
+    log     = os.path.join(ROOT, build, 'make.log')
+    os.makedirs(os.path.dirname(log), exist_ok=True)
+    if os.path.exists(os.path.join(ROOT, results)):
+        os.remove(os.path.join(ROOT, results))
+
+    # the Makefile picks the model from the build cache, models of different TOPs never share a directory
+    cmd = ['make', f"TOP={top}", f"COCOTB_RESULTS_FILE={results}",
+           f"TRACE_DIR={build}", *make_vars]
+    env = dict(os.environ, PWD=ROOT)                # the Makefile derives its paths from $(PWD)
+
+    start = time.perf_counter()
+    with open(log, 'w') as f:
+        proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=f, stderr=subprocess.STDOUT,
+                                start_new_session=True)
+        try:
+            returncode = proc.wait(timeout=timeout)
+            timed_out  = False
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)     # make, verilator and the simulation
+            returncode = proc.wait()
+            timed_out  = True
+
+    return Job(top, shlex.join(cmd), returncode, timed_out, time.perf_counter() - start,
+               os.path.join(ROOT, results), log)
+
+
+
+###########################################################################
+#### Report
+##########################################################################
+
+
+def _log_tail(path : str, lines : int = LOG_TAIL) -> str:
+    with open(path, errors='replace') as f:
+        return "".join(f.readlines()[-lines:])
+
+
+def job_suite(job : Job) -> ET.Element:
+    """ Test suite of one job, the cocotb test cases or a single error if the job produced no results """
+
+    suite = ET.Element('testsuite', name=job.top, time=f"{job.time:.2f}")
+    ET.SubElement(ET.SubElement(suite, 'properties'), 'property', name='command', value=job.cmd)
+
+    if not job.timed_out and os.path.exists(job.results):
+        for case in ET.parse(job.results).getroot().iter('testcase'):
+            case.set('classname', f"{job.top}.{case.get('classname', '')}".rstrip('.'))
+            suite.append(case)
+
+    if job.timed_out or len(suite.findall('testcase')) == 0:
+        message = f"timeout after {job.time:.0f} s" if job.timed_out else f"make exited with {job.returncode}"
+        case    = ET.SubElement(suite, 'testcase', name='build_and_run', classname=job.top, time=f"{job.time:.2f}")
+        ET.SubElement(case, 'error', message=message).text = _log_tail(job.log)
+
+    cases = suite.findall('testcase')
+    suite.set('tests',    str(len(cases)))
+    suite.set('failures', str(sum(case.find('failure') is not None for case in cases)))
+    suite.set('errors',   str(sum(case.find('error') is not None for case in cases)))
+    suite.set('skipped',  str(sum(case.find('skipped') is not None for case in cases)))
+    return suite
+
+
+def write_report(jobs : list, path : str) -> ET.Element:
+    """ Merge the test suites of all jobs into one JUnit file """
+
+    report = ET.Element('testsuites', name='regression')
+    for job in jobs:
+        report.append(job_suite(job))
+
+    ET.indent(report)
+    ET.ElementTree(report).write(path, encoding='unicode', xml_declaration=True)
+    return report
+
+
+def print_summary(report : ET.Element, wall_time : float):
+
+    print(f"{'TOP':<18}{'tests':>6}{'fail':>6}{'error':>6}{'skip':>6}{'time/s':>9}")
+    busy = 0.0
+    for suite in report.iter('testsuite'):
+        print(f"{suite.get('name'):<18}{suite.get('tests'):>6}{suite.get('failures'):>6}"
+              f"{suite.get('errors'):>6}{suite.get('skipped'):>6}{float(suite.get('time')):>9.1f}")
+        busy += float(suite.get('time'))
+    print(f"wall time {wall_time:.1f} s, sum of job times {busy:.1f} s")
+
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Run the cocotb testbenches of several TOPs in parallel")
+    parser.add_argument("args", nargs='*', metavar="TOP | NAME=VALUE",
+                        help="testbenches to run (default: all tb_*.py), NAME=VALUE is passed to make")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="parallel jobs (default: cores)")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="seconds per job")
+    parser.add_argument("-o", "--output", default=os.path.join(ROOT, 'regression.xml'))
+    args = parser.parse_args()
+
+    make_vars   = [arg for arg in args.args if '=' in arg]
+    tops        = [arg for arg in args.args if '=' not in arg] or testbenches()
+    workers     = max(1, min(args.jobs, len(tops)))
+    print(f"Running {len(tops)} testbenches in {workers} parallel jobs: {' '.join(tops)}")
+
+    start = time.perf_counter()
+    jobs  = {}
+    with concurrent.futures.ThreadPoolExecutor(workers) as pool:        # each job is a make process group
+        futures = {pool.submit(run_job, top, make_vars, args.timeout) : top for top in tops}
+        for future in concurrent.futures.as_completed(futures):
+            job = future.result()
+            jobs[job.top] = job
+            status = "timeout" if job.timed_out else "ok" if job.returncode == 0 else f"exit {job.returncode}"
+            print(f"  {job.top:<18}{status:<10}{job.time:7.1f} s   {job.log}")
+
+    report = write_report([jobs[top] for top in tops], args.output)
+    print_summary(report, time.perf_counter() - start)
+    print(f"Report written to {args.output}")
+
+    failed = sum(int(report_suite.get('failures')) + int(report_suite.get('errors'))
+                 for report_suite in report.iter('testsuite'))
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,318 @@
+"""
+RV32I assembler for the programs in verification/system, no GNU toolchain needed.
+
+Supports the subset these programs use: labels (also '.local' ones and on the same line as an
+instruction), .section/.text/.global, .word, every RV32I instruction with x or ABI register names
+and the usual pseudo-instructions: li, mv, not, neg, nop, j, jr, ret, seqz, snez and the branch
+variants beqz, bnez, blez, bgez, bltz, bgtz, bgt, ble, bgtu, bleu. li expands like GNU as: addi
+for 12 bit values, otherwise lui plus addi if the low part is not zero. Code starts at the address
+the linker places .text at, the output is the same Verilog hex format as objcopy -O verilog:
+
+    program = assemble(open("verification/system/alu.s").read())
+    program.words, program.symbols['success']
+    assemble_file("verification/system/alu.s", "verification/system/build/test_program.hex")
+
+Instructions are encoded in batches per mnemonic with rv_instructions.encode. assemble() caches
+results by source text, assemble_file() caches hex files on disk by source hash.
+
+"""
+
+import argparse
+import functools
+import hashlib
+import inspect
+import os
+import re
+import typing
+import numpy as np
+import memory_image
+import rv_instructions as rv
+
+
+ORIGIN = memory_image.BIN_BASE        # .text address of the default linker layout, program_counter.sv reset address
+
+
+class AssemblerError(ValueError):
+    pass
+
+
+class Program(typing.NamedTuple):
+    origin  : int
+    words   : np.ndarray            # uint32 machine words from origin on
+    symbols : dict                  # label -> address
+
+    def segments(self) -> typing.List[memory_image.Segment]:
+        return [memory_image.Segment(self.origin, self.words.astype('<u4').tobytes())]
+
+
+REGISTERS = {f"x{k}" : k for k in range(32)}
+REGISTERS.update({name : k for k, name in enumerate(
+    ['zero', 'ra', 'sp', 'gp', 'tp', 't0', 't1', 't2', 's0', 's1', 'a0', 'a1', 'a2', 'a3', 'a4', 'a5',
+     'a6', 'a7', 's2', 's3', 's4', 's5', 's6', 's7', 's8', 's9', 's10', 's11', 't3', 't4', 't5', 't6'])})
+REGISTERS['fp'] = 8
+
+# pseudo-instruction -> (instruction, operand order), operands are the given ones by index, or 'zero', 'ra', '0', ...
+PSEUDO = {
+    'NOP'   : ('ADDI',  ('zero', 'zero', '0')),
+    'MV'    : ('ADDI',  (0, 1, '0')),
+    'NOT'   : ('XORI',  (0, 1, '-1')),
+    'NEG'   : ('SUB',   (0, 'zero', 1)),
+    'SEQZ'  : ('SLTIU', (0, 1, '1')),
+    'SNEZ'  : ('SLTU',  (0, 'zero', 1)),
+    'J'     : ('JAL',   ('zero', 0)),
+    'JR'    : ('JALR',  ('zero', 0, '0')),
+    'RET'   : ('JALR',  ('zero', 'ra', '0')),
+    'BEQZ'  : ('BEQ',   (0, 'zero', 1)),
+    'BNEZ'  : ('BNE',   (0, 'zero', 1)),
+    'BLEZ'  : ('BGE',   ('zero', 0, 1)),
+    'BGEZ'  : ('BGE',   (0, 'zero', 1)),
+    'BLTZ'  : ('BLT',   (0, 'zero', 1)),
+    'BGTZ'  : ('BLT',   ('zero', 0, 1)),
+    'BGT'   : ('BLT',   (1, 0, 2)),
+    'BLE'   : ('BGE',   (1, 0, 2)),
+    'BGTU'  : ('BLTU',  (1, 0, 2)),
+    'BLEU'  : ('BGEU',  (1, 0, 2)),
+}
+
+IGNORED_DIRECTIVES = {'.section', '.text', '.global', '.globl', '.type', '.size', '.option', '.file'}
+
+_LABEL  = re.compile(r'^\s*([A-Za-z_.$][\w.$]*)\s*:')
+_MEMORY = re.compile(r'^(.*)\((\w+)\)$')          # imm(rs1)
+
+
+class _Line(typing.NamedTuple):
+    number      : int
+    mnemonic    : str
+    operands    : tuple
+    addr        : int
+
+
+def _split_li(value : int) -> typing.Tuple[int, int]:
+    """ lui and addi immediates of a 32 bit constant, hi is rounded so that the sign extended lo adds up """
+
+    lo    = ((value & 0xFFF) ^ 0x800) - 0x800
+    hi    = ((value - lo) >> 12) & 0xFFFFF
+    return hi, lo
+
+
+def _parse(source : str):
+    """ Pass 1: labels, pseudo-instruction expansion and addresses, returns lines, symbols and .word data """
+
+    lines, symbols, words = [], {}, {}
+    addr = 0
+
+    for number, text in enumerate(source.splitlines(), 1):
+        text = text.split('#', 1)[0].split('//', 1)[0].strip()
+
+        while (label := _LABEL.match(text)):
+            if label.group(1) in symbols:
+                raise AssemblerError(f"line {number}: label '{label.group(1)}' defined twice")
+            symbols[label.group(1)] = addr
+            text = text[label.end():].strip()
+        if not text:
+            continue
+
+        mnemonic, rest = (text.split(None, 1) + [''])[:2]
+        operands = tuple(op.strip() for op in rest.split(',')) if rest.strip() else ()
+
+        if mnemonic.startswith('.'):
+            if mnemonic == '.word':
+                for op in operands:
+                    words[addr] = (number, op)
+                    addr += 4
+            elif mnemonic not in IGNORED_DIRECTIVES:
+                raise AssemblerError(f"line {number}: unsupported directive {mnemonic}")
+            continue
+
+        mnemonic = mnemonic.upper()
+        if mnemonic == 'LI':
+            if len(operands) != 2:
+                raise AssemblerError(f"line {number}: li expects rd, imm")
+            value = _immediate(operands[1], number)
+            if not -(1 << 31) <= value < (1 << 32):
+                raise AssemblerError(f"line {number}: li value {value} does not fit into 32 bit")
+            value = (value + (1 << 31)) % (1 << 32) - (1 << 31)           # 0xFFFFFFFF is -1
+            if -2048 <= value < 2048:
+                lines.append(_Line(number, 'ADDI', (operands[0], 'zero', str(value)), addr))
+                addr += 4
+            else:
+                hi, lo = _split_li(value)
+                lines.append(_Line(number, 'LUI', (operands[0], str(hi)), addr))
+                addr += 4
+                if lo:
+                    lines.append(_Line(number, 'ADDI', (operands[0], operands[0], str(lo)), addr))
+                    addr += 4
+            continue
+
+        if mnemonic in PSEUDO:
+            mnemonic, order = PSEUDO[mnemonic]
+            try:
+                operands = tuple(operands[k] if isinstance(k, int) else k for k in order)
+            except IndexError:
+                raise AssemblerError(f"line {number}: too few operands for {text}") from None
+        elif mnemonic == 'JAL' and len(operands) == 1:
+            operands = ('ra', operands[0])
+        elif mnemonic == 'JALR' and len(operands) == 1:
+            operands = ('zero', operands[0], '0')
+        elif mnemonic not in rv.RV32I:
+            raise AssemblerError(f"line {number}: unknown instruction {mnemonic.lower()}")
+
+        lines.append(_Line(number, mnemonic, operands, addr))
+        addr += 4
+
+    return lines, symbols, words, addr
+
+
+def _immediate(token : str, number : int) -> int:
+    try:
+        return int(token, 0)
+    except ValueError:
+        raise AssemblerError(f"line {number}: invalid immediate '{token}'") from None
+
+
+def _register(token : str, number : int) -> int:
+    if token not in REGISTERS:
+        raise AssemblerError(f"line {number}: invalid register '{token}'")
+    return REGISTERS[token]
+
+
+def _check(value : int, low : int, high : int, line : _Line, what : str = "immediate") -> int:
+    if not low <= value <= high:
+        raise AssemblerError(f"line {line.number}: {what} {value} out of range [{low}, {high}] for {line.mnemonic.lower()}")
+    return value
+
+
+def _fields(line : _Line, symbols : dict) -> typing.Tuple[int, int, int, int]:
+    """ rd, rs1, rs2, imm of an instruction in the conventions of rv_instructions.encode """
+
+    spec, ops, n = rv.RV32I[line.mnemonic], line.operands, line.number
+
+    def target(token : str) -> int:
+        if token in symbols:
+            offset = symbols[token] - line.addr
+        elif re.fullmatch(r'[-+]?\d\w*', token):
+            offset = _immediate(token, n)
+        else:
+            raise AssemblerError(f"line {n}: undefined label '{token}'")
+        if offset % 2:
+            raise AssemblerError(f"line {n}: odd branch offset {offset}")
+        return offset
+
+    def memory(rd_or_rs2 : str, token : str) -> tuple:
+        match = _MEMORY.match(token.replace(' ', ''))
+        if not match:
+            raise AssemblerError(f"line {n}: expected imm(rs1), got '{token}'")
+        imm = _immediate(match.group(1) or '0', n)
+        return _register(rd_or_rs2, n), _register(match.group(2), n), _check(imm, -2048, 2047, line)
+
+    expected = {'R' : 3, 'B' : 3, 'U' : 2, 'J' : 2, 'S' : 2, 'I' : 2 if spec.opcode == rv.OPC_LOAD else 3}[spec.fmt]
+    if line.mnemonic == 'JALR' and len(ops) == 2:
+        expected = 2
+    if len(ops) != expected:
+        raise AssemblerError(f"line {n}: {line.mnemonic.lower()} expects {expected} operands, got {len(ops)}")
+
+    if spec.fmt == 'R':
+        return _register(ops[0], n), _register(ops[1], n), _register(ops[2], n), 0
+    if spec.fmt == 'B':
+        return 0, _register(ops[0], n), _register(ops[1], n), _check(target(ops[2]), -4096, 4094, line, "offset")
+    if spec.fmt == 'J':
+        return _register(ops[0], n), 0, 0, _check(target(ops[1]), -(1 << 20), (1 << 20) - 2, line, "offset")
+    if spec.fmt == 'U':
+        return _register(ops[0], n), 0, 0, _check(_immediate(ops[1], n), 0, 0xFFFFF, line)
+    if spec.fmt == 'S':
+        rs2, rs1, imm = memory(ops[0], ops[1])
+        return 0, rs1, rs2, imm
+    if len(ops) == 2:                                   # loads and jalr rd, imm(rs1)
+        rd, rs1, imm = memory(ops[0], ops[1])
+        return rd, rs1, 0, imm
+    if spec.funct7 is not None:                         # immediate shifts
+        return _register(ops[0], n), _register(ops[1], n), 0, _check(_immediate(ops[2], n), 0, 31, line, "shift amount")
+    return _register(ops[0], n), _register(ops[1], n), 0, _check(_immediate(ops[2], n), -2048, 2047, line)
+
+
+@functools.lru_cache(maxsize=256)
+def assemble(source : str, origin : int = ORIGIN) -> Program:
+    """ Machine code of an assembly source, results are cached by source text """
+
+    lines, symbols, data, size = _parse(source)
+    symbols = {name : origin + addr for name, addr in symbols.items()}
+
+    words   = np.zeros(size // 4, dtype=np.uint32)
+    batches = {}
+    for line in lines:
+        fields = _fields(line._replace(addr=origin + line.addr), symbols)
+        batches.setdefault(line.mnemonic, ([], []))
+        batches[line.mnemonic][0].append(line.addr // 4)
+        batches[line.mnemonic][1].append(fields)
+
+    for mnemonic, (index, fields) in batches.items():
+        rd, rs1, rs2, imm = np.array(fields, dtype=np.int64).T
+        words[index] = rv.encode(mnemonic, rd=rd, rs1=rs1, rs2=rs2, imm=imm)
+
+    for addr, (number, token) in data.items():
+        value = symbols[token] if token in symbols else _immediate(token, number)
+        words[addr // 4] = value & 0xFFFF_FFFF
+
+    words.flags.writeable = False                       # shared through the cache
+    return Program(origin, words, symbols)
+
+
+def format_hex(segments, bytes_per_line : int = 16) -> str:
+    """ Verilog hex text in the layout of objcopy -O verilog """
+
+    out = []
+    for addr, data in segments:
+        out.append(f"@{addr:08X}")
+        for k in range(0, len(data), bytes_per_line):
+            out.append(" ".join(f"{b:02X}" for b in data[k:k + bytes_per_line]))
+    return "\n".join(out) + "\n"
+
+
+def _cache_path(source : bytes, origin : int) -> str:
+    """ Disk cache file of a source, changes with the source, the origin and the assembler itself """
+
+    digest = hashlib.sha1(source + origin.to_bytes(4, 'little'))
+    for module in (inspect.getmodule(_fields), rv):
+        digest.update(inspect.getsource(module).encode())
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__',
+                        f"rv_assembler.{digest.hexdigest()[:16]}.hex")
+
+
+def assemble_file(path : str, hex_path : str = None, origin : int = ORIGIN) -> str:
+    """ Assemble a source file into Verilog hex, cached on disk by source hash, returns the hex text """
+
+    with open(path, 'rb') as f:
+        source = f.read()
+
+    cache = _cache_path(source, origin)
+    if os.path.exists(cache):
+        with open(cache) as f:
+            text = f.read()
+    else:
+        text = format_hex(assemble(source.decode(), origin).segments())
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        tmp = f"{cache}.{os.getpid()}"
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.replace(tmp, cache)
+
+    if hex_path:
+        os.makedirs(os.path.dirname(hex_path) or '.', exist_ok=True)
+        with open(hex_path, 'w') as f:
+            f.write(text)
+    return text
+
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Assemble an RV32I program into a Verilog hex file")
+    parser.add_argument("source")
+    parser.add_argument("-o", "--output", default="verification/system/build/test_program.hex")
+    parser.add_argument("--origin", type=lambda s: int(s, 0), default=ORIGIN)
+    args = parser.parse_args()
+
+    try:
+        assemble_file(args.source, args.output, args.origin)
+    except AssemblerError as error:
+        raise SystemExit(f"{args.source}: {error}")
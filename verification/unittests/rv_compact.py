@@ -0,0 +1,350 @@
+"""
+Compact RISCV instruction objects, drop-in replacement for rv_instructions:
+
+    import rv_compact as rv
+
+Every instruction is a single 32 bit machine word in a __slots__ object. Fields are
+decoded lazily from the word when accessed, encoding is done once in the constructor
+by the per-format encoders of rv_instructions instead of probing attributes. Keeps the
+constructor signatures and attribute names of rv_instructions.
+
+"""
+
+from constants_pkg import *
+import numpy as np
+import rv_disasm
+from rv_instructions import encode, encode_r_type, encode_i_type, encode_s_type, encode_b_type, encode_u_type, encode_j_type
+
+
+class RVInstr:
+    """ Single 32 bit machine word, the base of all formats """
+
+    __slots__ = ('word', 'mnemonic')
+
+    LAYOUT      = (('opcode', 6, 0),)       # (name, hi, lo) from msb to lsb, for printing and the field properties
+    ASM_FIELDS  = ()                        # operands printed by get_asm()
+
+    def __init_subclass__(cls, mnemonic : str = None, **kwargs):
+        """ Properties for the LAYOUT fields a format does not define itself, the mnemonic of named instructions """
+
+        super().__init_subclass__(**kwargs)
+        for name, hi, lo in cls.LAYOUT:
+            if not hasattr(cls, name):
+                setattr(cls, name, property(lambda self, hi=hi, lo=lo: self._bits(hi, lo)))
+        if mnemonic:
+            cls.MNEMONIC    = mnemonic
+
+    def __init__(self, word : int, mnemonic : str = None):
+        self.word       = int(word) & 0xFFFF_FFFF
+        self.mnemonic   = mnemonic
+
+    def _bits(self, hi : int, lo : int) -> int:
+        return (self.word >> lo) & ((1 << (hi - lo + 1)) - 1)
+
+    def _imm(self, decode) -> int:
+        """ Sign extended immediate, decode is one of the rv_disasm.imm_* functions """
+        return int(decode(np.int64(self.word)))
+
+    @property
+    def opcode(self) -> int:
+        return self._bits(6, 0)
+
+    @property
+    def rd(self) -> int:
+        return self._bits(11, 7)
+
+    @property
+    def funct3(self) -> int:
+        return self._bits(14, 12)
+
+    @property
+    def rs1(self) -> int:
+        return self._bits(19, 15)
+
+    @property
+    def rs2(self) -> int:
+        return self._bits(24, 20)
+
+
+    def get_binary_string(self, with_spaces=False):
+        """ Machine word, or its fields as binary strings separated by '_' if `with_spaces` is True """
+
+        if not with_spaces:
+            return self.word
+
+        return "_".join(format(self._bits(hi, lo), f'0{hi - lo + 1}b') for _, hi, lo in self.LAYOUT)
+
+
+    def get_asm(self):
+        """ Generic assembly format method. """
+
+        if self.mnemonic is None:
+            return "UNKNOWN_INSTR"
+
+        asm_parts = [self.mnemonic]
+        for name in self.ASM_FIELDS:
+            value = getattr(self, name)
+            asm_parts.append(f"x{value}" if name != 'imm12' else str(value))
+
+        return " ".join(asm_parts)
+
+
+    def get_formatted_fields(self):
+        """ Print instruction fields for debugging purposes in a human-readable, table-like format with right-aligned columns. """
+
+        widths  = [max(len(name), hi - lo + 1) for name, hi, lo in self.LAYOUT]
+        values  = [self._bits(hi, lo) for _, hi, lo in self.LAYOUT]
+        signed  = [self.imm12 if name == 'imm12' else v for v, (name, _, _) in zip(values, self.LAYOUT)]
+
+        header  = "rdx " + "  ".join(f"{name:>{w}}" for (name, _, _), w in zip(self.LAYOUT, widths))
+        rows    = [
+            "0b  " + "  ".join(f"{v:0{hi - lo + 1}b}".rjust(w) for v, (_, hi, lo), w in zip(values, self.LAYOUT, widths)),
+            "0d  " + "  ".join(f"{v:>{w}}" for v, w in zip(signed, widths)),
+            "0x  " + "  ".join(f"{v:>{w}x}" for v, w in zip(values, widths)),
+        ]
+
+        return "\n".join(["", header, "-" * len(header)] + rows + [""])
+
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.word:#010x} {self.get_asm()}>"
+
+
+    @classmethod
+    def from_word(cls, word : int) -> "RVInstr":
+        """ Wrap an existing machine word in the compact object of its format """
+
+        fields  = rv_disasm.decode(word)[0]
+        fmt     = rv_disasm.FORMATS[fields['fmt']]
+        klass   = {'R': RType, 'I': IType, 'S': SType, 'B': BType, 'U': UType, 'J': JalInstr}.get(fmt, RVInstr)
+
+        instr = object.__new__(klass)
+        RVInstr.__init__(instr, word, rv_disasm.MNEMONICS[fields['mnemonic']] if fields['mnemonic'] >= 0 else None)
+        return instr
+
+
+
+class IType(RVInstr):
+    """ RISCV I opcode Instruction: 12imm + rs1 + func3 + rd + opcode """
+
+    __slots__   = ()
+    LAYOUT      = (('imm12', 31, 20), ('rs1', 19, 15), ('funct3', 14, 12), ('rd', 11, 7), ('opcode', 6, 0))
+    ASM_FIELDS  = ('rd', 'rs1', 'imm12')
+
+    def __init__(self, imm12 : int, rs1 : int, funct3 : int, rd : int, opcode : int = I_TYPE, mnemonic : str = None):
+        super().__init__(encode_i_type(rd, rs1, imm12, funct3, opcode), mnemonic)
+
+    @property
+    def imm12(self) -> int:
+        return self._imm(rv_disasm.imm_i)
+
+
+class RType(RVInstr):
+    """ RISCV R-opcode Instruction: funct7 + rs2 + rs1 + funct3 + rd + opcode """
+
+    __slots__   = ()
+    LAYOUT      = (('funct7', 31, 25), ('rs2', 24, 20), ('rs1', 19, 15), ('funct3', 14, 12), ('rd', 11, 7), ('opcode', 6, 0))
+    ASM_FIELDS  = ('rd', 'rs1', 'rs2')
+
+    def __init__(self, rs2 : int, rs1 : int, funct3 : int, rd : int, mnemonic : str = None, funct7 : int = F7_DEFAULT):
+        super().__init__(encode_r_type(rd, rs1, rs2, funct3, funct7), mnemonic)
+
+
+class UType(RVInstr):
+    """ RISCV U opcode Instruction: imm20 + rd + opcode """
+
+    __slots__   = ()
+    LAYOUT      = (('imm20', 31, 12), ('rd', 11, 7), ('opcode', 6, 0))
+    ASM_FIELDS  = ('rd',)
+
+    def __init__(self, imm : int, rd : int, opcode : int, mnemonic : str = None):
+        super().__init__(encode_u_type(rd, imm, opcode), mnemonic)
+
+
+class SType(RVInstr):
+    """ RISCV S opcode Instruction: imm[11:5] + rs2 + rs1 + funct3 + imm[4:0] + opcode """
+
+    __slots__   = ()
+    LAYOUT      = (('imm_higher', 31, 25), ('rs2', 24, 20), ('rs1', 19, 15), ('funct3', 14, 12), ('imm_lower', 11, 7), ('opcode', 6, 0))
+    ASM_FIELDS  = ('rs1', 'rs2')
+
+    def __init__(self, offset : int, rs2 : int, rs1 : int, funct3 : int, mnemonic : str = None):
+        super().__init__(encode_s_type(rs1, rs2, offset, funct3), mnemonic)
+
+    @property
+    def offset(self) -> int:
+        return self._imm(rv_disasm.imm_s)
+
+
+class BType(RVInstr):
+    """ RISCV B opcode Instruction: imm + rs2 + rs1 + funct3 + imm + opcode, bit 0 of the offset is not encoded """
+
+    __slots__   = ()
+    LAYOUT      = (('imm_higher', 31, 25), ('rs2', 24, 20), ('rs1', 19, 15), ('funct3', 14, 12), ('imm_lower', 11, 7), ('opcode', 6, 0))
+    ASM_FIELDS  = ('rs1', 'rs2')
+
+    def __init__(self, offset : int, rs2 : int, rs1 : int, funct3 : int, mnemonic : str = None):
+        super().__init__(encode_b_type(rs1, rs2, offset, funct3), mnemonic)
+
+    @property
+    def offset(self) -> int:
+        return self._imm(rv_disasm.imm_b)
+
+
+class JalInstr(RVInstr):
+    """ RISCV JAL opcode Instruction: imm20 + rd + opcode """
+
+    __slots__   = ()
+    LAYOUT      = (('imm20', 31, 12), ('rd', 11, 7), ('opcode', 6, 0))
+    ASM_FIELDS  = ('rd',)
+
+    def __init__(self, rd : int, offset : int, ):
+        super().__init__(encode_j_type(rd, offset), "JAL")
+
+    @property
+    def offset(self) -> int:
+        return self._imm(rv_disasm.imm_j)
+
+
+class LoadInstr(IType):
+
+    __slots__ = ()
+
+    def __init__(self, offset : int, base_r, width : int, dest_r : int, mnemonic : str = None):
+        super().__init__(imm12=offset, rs1=base_r, funct3=width, rd=dest_r, opcode=OPC_LOAD, mnemonic=mnemonic)
+
+
+
+###########################################################################
+#### Instruction Listing
+##########################################################################
+#
+# Named instructions share one constructor per operand order, the words are encoded by
+# rv_instructions.encode() from the RV32I table entry of the mnemonic.
+
+
+class _IInstr(IType):
+    """ I types: (rd, rs1, imm12) """
+
+    __slots__ = ()
+
+    def __init__(self, rd : int, rs1 : int, imm12 : int):
+        RVInstr.__init__(self, encode(self.MNEMONIC, rd=rd, rs1=rs1, imm=imm12), self.MNEMONIC)
+
+
+class _ShiftInstr(_IInstr):
+    """ Immediate shifts: (rd, rs1, shamt), encode() puts funct7 into imm[11:5] """
+
+    __slots__ = ()
+
+    def __init__(self, rd : int, rs1 : int, shamt : int):
+        super().__init__(rd, rs1, shamt)
+
+
+class _RInstr(RType):
+    """ R types: (rd, rs1, rs2) """
+
+    __slots__ = ()
+
+    def __init__(self, rd : int, rs1 : int, rs2 : int):
+        RVInstr.__init__(self, encode(self.MNEMONIC, rd=rd, rs1=rs1, rs2=rs2), self.MNEMONIC)
+
+
+class _LoadInstr(LoadInstr):
+    """ Loads: (rd, rs1, offset) """
+
+    __slots__ = ()
+
+    def __init__(self, rd : int, rs1 : int, offset : int):
+        RVInstr.__init__(self, encode(self.MNEMONIC, rd=rd, rs1=rs1, imm=offset), self.MNEMONIC)
+
+
+class _StoreInstr(SType):
+    """ Stores: (rs2, rs1, offset) """
+
+    __slots__ = ()
+
+    def __init__(self, rs2 : int, rs1 : int, offset : int):
+        RVInstr.__init__(self, encode(self.MNEMONIC, rs1=rs1, rs2=rs2, imm=offset), self.MNEMONIC)
+
+
+class _BranchInstr(BType):
+    """ Branches: (rs1, rs2, imm) """
+
+    __slots__ = ()
+
+    def __init__(self, rs1 : int, rs2 : int, imm : int):
+        RVInstr.__init__(self, encode(self.MNEMONIC, rs1=rs1, rs2=rs2, imm=imm), self.MNEMONIC)
+
+
+class _UInstr(UType):
+    """ Upper immediates: (rd, imm20) """
+
+    __slots__ = ()
+
+    def __init__(self, rd : int, imm20 : int):
+        RVInstr.__init__(self, encode(self.MNEMONIC, rd=rd, imm=imm20), self.MNEMONIC)
+
+
+#### I Types
+
+class AddiInstr(_IInstr, mnemonic='ADDI'):      __slots__ = ()
+class SltiInstr(_IInstr, mnemonic='SLTI'):      __slots__ = ()
+class SltiuInstr(_IInstr, mnemonic='SLTIU'):    __slots__ = ()
+class AndiInstr(_IInstr, mnemonic='ANDI'):      __slots__ = ()
+class XoriInstr(_IInstr, mnemonic='XORI'):      __slots__ = ()
+class OriInstr(_IInstr, mnemonic='ORI'):        __slots__ = ()
+class SlliInstr(_ShiftInstr, mnemonic='SLLI'):  __slots__ = ()
+class SrliInstr(_ShiftInstr, mnemonic='SRLI'):  __slots__ = ()
+class SraiInstr(_ShiftInstr, mnemonic='SRAI'):  __slots__ = ()
+
+#### U Types
+
+class LuiInstr(_UInstr, mnemonic='LUI'):        __slots__ = ()
+class AuipcInstr(_UInstr, mnemonic='AUIPC'):    __slots__ = ()
+
+#### Loads
+
+class LbInstr(_LoadInstr, mnemonic='LB'):       __slots__ = ()
+class LhInstr(_LoadInstr, mnemonic='LH'):       __slots__ = ()
+class LwInstr(_LoadInstr, mnemonic='LW'):       __slots__ = ()
+class LbuInstr(_LoadInstr, mnemonic='LBU'):     __slots__ = ()
+class LhuInstr(_LoadInstr, mnemonic='LHU'):     __slots__ = ()
+
+#### Stores
+
+class SbInstr(_StoreInstr, mnemonic='SB'):      __slots__ = ()
+class ShInstr(_StoreInstr, mnemonic='SH'):      __slots__ = ()
+class SwInstr(_StoreInstr, mnemonic='SW'):      __slots__ = ()
+
+#### R Types
+
+class AddInstr(_RInstr, mnemonic='ADD'):        __slots__ = ()
+class SubInstr(_RInstr, mnemonic='SUB'):        __slots__ = ()
+class SllInstr(_RInstr, mnemonic='SLL'):        __slots__ = ()
+class SltInstr(_RInstr, mnemonic='SLT'):        __slots__ = ()
+class SltuInstr(_RInstr, mnemonic='SLTU'):      __slots__ = ()
+class XorInstr(_RInstr, mnemonic='XOR'):        __slots__ = ()
+class SrlInstr(_RInstr, mnemonic='SRL'):        __slots__ = ()
+class SraInstr(_RInstr, mnemonic='SRA'):        __slots__ = ()
+class OrInstr(_RInstr, mnemonic='OR'):          __slots__ = ()
+class AndInstr(_RInstr, mnemonic='AND'):        __slots__ = ()
+
+#### B Types
+
+class BeqInstr(_BranchInstr, mnemonic='BEQ'):   __slots__ = ()
+class BneInstr(_BranchInstr, mnemonic='BNE'):   __slots__ = ()
+class BltInstr(_BranchInstr, mnemonic='BLT'):   __slots__ = ()
+class BgeInstr(_BranchInstr, mnemonic='BGE'):   __slots__ = ()
+class BltuInstr(_BranchInstr, mnemonic='BLTU'): __slots__ = ()
+class BgeuInstr(_BranchInstr, mnemonic='BGEU'): __slots__ = ()
+
+## J Type
+
+class JalrInstr(IType, mnemonic='JALR'):
+    """ RISCV JALR opcode Instruction: imm + rs1 + funct3 + rd + opcode """
+
+    __slots__ = ()
+
+    def __init__(self, rd : int, rs1 : int, offset : int):
+        RVInstr.__init__(self, encode(self.MNEMONIC, rd=rd, rs1=rs1, imm=offset), self.MNEMONIC)
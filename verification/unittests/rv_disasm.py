@@ -0,0 +1,160 @@
+"""
+Vectorized RV32I field decoder and disassembler, the inverse of rv_instructions.encode().
+
+Decodes whole arrays of machine words (hex images, commit traces) at once:
+
+    fields = decode(words)          # structured array, one record per word
+    asm    = disassemble(words)     # mnemonic rendering, cached per distinct word
+
+"""
+
+from constants_pkg import *
+import functools
+import numpy as np
+import sys
+import memory_image
+import rv_instructions as rv
+
+
+# format codes as stored in the 'fmt' field, index into FORMATS
+FORMATS = 'XRISBUJ'                 # X: not part of RV32I
+FMT_INVALID, FMT_R, FMT_I, FMT_S, FMT_B, FMT_U, FMT_J = range(len(FORMATS))
+
+MNEMONICS = list(rv.RV32I)          # mnemonic index as stored in the 'mnemonic' field, -1 if invalid
+
+
+DECODED_DTYPE = np.dtype([
+    ('word',     np.uint32),
+    ('fmt',      np.uint8),
+    ('mnemonic', np.int16),
+    ('opcode',   np.uint8),
+    ('funct3',   np.uint8),
+    ('funct7',   np.uint8),
+    ('rd',       np.uint8),
+    ('rs1',      np.uint8),
+    ('rs2',      np.uint8),
+    ('imm',      np.int32),         # sign extended, byte offset for B and J, shifted for U
+])
+
+
+def _build_tables():
+    """ Mnemonic lookup over the full opcode/funct3/funct7 space, format lookup over opcodes """
+
+    mnemonic_table  = np.full(1 << 17, -1, dtype=np.int16)     # index: funct7 << 10 | funct3 << 7 | opcode
+    fmt_table       = np.zeros(1 << 7, dtype=np.uint8)
+
+    for index, (mnemonic, spec) in enumerate(rv.RV32I.items()):
+        fmt_table[spec.opcode] = FORMATS.index(spec.fmt)
+
+        funct3s = range(8) if spec.fmt in 'UJ' else [spec.funct3]
+        funct7s = range(128) if spec.funct7 is None else [spec.funct7]
+
+        for funct3 in funct3s:
+            for funct7 in funct7s:
+                mnemonic_table[(funct7 << 10) | (funct3 << 7) | spec.opcode] = index
+
+    return mnemonic_table, fmt_table
+
+
+_MNEMONIC_TABLE, _FMT_TABLE = _build_tables()
+
+
+def _sext(value : np.ndarray, bits : int) -> np.ndarray:
+    """ Sign extend the lower bits of value to int32 """
+    value = value.astype(np.int64) & ((1 << bits) - 1)
+    return (value - ((value >> (bits - 1)) << bits)).astype(np.int32)
+
+
+# sign extended immediates of int64 machine words by format, the inverse of rv_instructions.encode_*_type
+
+def imm_i(w : np.ndarray) -> np.ndarray:
+    return _sext(w >> 20, 12)
+
+def imm_s(w : np.ndarray) -> np.ndarray:
+    return _sext(((w >> 25) << 5) | ((w >> 7) & 0x1F), 12)
+
+def imm_b(w : np.ndarray) -> np.ndarray:
+    return _sext(((w >> 31) << 12) | (((w >> 7) & 0x1) << 11) | (((w >> 25) & 0x3F) << 5) | (((w >> 8) & 0xF) << 1), 13)
+
+def imm_u(w : np.ndarray) -> np.ndarray:
+    return (w & 0xFFFF_F000).astype(np.uint32).view(np.int32)
+
+def imm_j(w : np.ndarray) -> np.ndarray:
+    return _sext(((w >> 31) << 20) | (((w >> 12) & 0xFF) << 12) | (((w >> 20) & 0x1) << 11) | (((w >> 21) & 0x3FF) << 1), 21)
+
+
+def decode(words) -> np.ndarray:
+    """ Split uint32 machine words into their fields, see DECODED_DTYPE """
+
+    words   = np.asarray(words, dtype=np.uint32).ravel()
+    w       = words.astype(np.int64)
+
+    fields = np.empty(words.shape, dtype=DECODED_DTYPE)
+    fields['word']   = words
+    fields['opcode'] = w & 0x7F
+    fields['rd']     = (w >> 7) & 0x1F
+    fields['funct3'] = (w >> 12) & 0x7
+    fields['rs1']    = (w >> 15) & 0x1F
+    fields['rs2']    = (w >> 20) & 0x1F
+    fields['funct7'] = (w >> 25) & 0x7F
+
+    mnemonic = _MNEMONIC_TABLE[((w >> 25) << 10) | (((w >> 12) & 0x7) << 7) | (w & 0x7F)]
+    fmt      = np.where(mnemonic >= 0, _FMT_TABLE[w & 0x7F], FMT_INVALID)
+    fields['mnemonic'] = mnemonic
+    fields['fmt']      = fmt
+
+    fields['imm'] = np.select(
+        [fmt == FMT_I, fmt == FMT_S, fmt == FMT_B, fmt == FMT_U, fmt == FMT_J],
+        [imm_i(w),     imm_s(w),     imm_b(w),     imm_u(w),     imm_j(w)],
+        default=0)
+
+    # immediate shifts only use imm[4:0] as shift amount
+    shifts = (fmt == FMT_I) & (fields['opcode'] == I_TYPE) & ((fields['funct3'] & 0b11) == F3_SLL)
+    fields['imm'][shifts] &= 0x1F
+
+    return fields
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def format_instr(word : int) -> str:
+    """ Assembly text of a single machine word, same syntax as objdump with relative offsets """
+
+    f = decode(word)[0]
+
+    if f['mnemonic'] < 0:
+        return f".word {int(word):#010x}"
+
+    mnemonic    = MNEMONICS[f['mnemonic']].lower()
+    rd, rs1, rs2, imm = int(f['rd']), int(f['rs1']), int(f['rs2']), int(f['imm'])
+    fmt         = f['fmt']
+
+    if fmt == FMT_R:
+        return f"{mnemonic} x{rd}, x{rs1}, x{rs2}"
+    if fmt == FMT_I and f['opcode'] in (OPC_LOAD, OPC_JALR):
+        return f"{mnemonic} x{rd}, {imm}(x{rs1})"
+    if fmt == FMT_I:
+        return f"{mnemonic} x{rd}, x{rs1}, {imm}"
+    if fmt == FMT_S:
+        return f"{mnemonic} x{rs2}, {imm}(x{rs1})"
+    if fmt == FMT_B:
+        return f"{mnemonic} x{rs1}, x{rs2}, {imm}"
+    if fmt == FMT_U:
+        return f"{mnemonic} x{rd}, {(imm >> 12) & 0xFFFFF:#x}"
+    return f"{mnemonic} x{rd}, {imm}"
+
+
+def disassemble(words) -> np.ndarray:
+    """ Render every word as assembly text, each distinct word is only formatted once """
+
+    unique, inverse = np.unique(np.asarray(words, dtype=np.uint32).ravel(), return_inverse=True)
+    rendered        = np.array([format_instr(int(word)) for word in unique], dtype=object)
+    return rendered[inverse]
+
+
+if __name__ == "__main__":
+
+    # usage: python rv_disasm.py verification/system/build/test_program.hex
+    for segment in memory_image.read_hex(sys.argv[1]):
+        words = memory_image.segment_words(segment)
+        for offset, (word, asm) in enumerate(zip(words, disassemble(words))):
+            print(f"{segment.addr + 4*offset:8x}:  {int(word):08x}  {asm}")
@@ -1,6 +1,7 @@
 
 from constants_pkg import *
 import numpy as np
+import typing
 
 """
 Generate RISCV instructions for verification purposes. 
@@ -105,9 +106,9 @@ class IType(RVInstr):
 class RType(RVInstr):
     """ RISCV R-opcode Instruction: funct7 + rs2 + rs1 + funct3 + rd + opcode """
         
-    def __init__(self, rs2 : int, rs1 : int, funct3 : int, rd : int, mnemonic : str = None):
+    def __init__(self, rs2 : int, rs1 : int, funct3 : int, rd : int, mnemonic : str = None, funct7 : int = F7_DEFAULT):
         
-        self.funct7 = np.uint8(1 << 5 if funct3 in [ALU_SUB, ALU_SRA] else 0)
+        self.funct7 = np.uint8(funct7)                  # F7_SUB_SRA selects SUB / SRA
         self.rs2    = np.uint8(rs2)
         self.rs1    = np.uint8(rs1)
         self.funct3 = np.uint8(funct3)
@@ -133,10 +134,10 @@ class RType(RVInstr):
 class UType(RVInstr):
     """ RISCV U opcode Instruction: imm20 + rd + opcode """
         
-    def __init__(self, imm : int, rd : int, opcode : int):
+    def __init__(self, imm : int, rd : int, opcode : int, mnemonic : str = None):
         self.imm20  = imm
         self.rd = np.uint8(rd)
-        super().__init__(opcode=opcode)
+        super().__init__(opcode=opcode, mnemonic=mnemonic)
 
     
     def get_formatted_fields(self):
@@ -197,6 +198,36 @@ class BeqInstr(BType):
     """ Instruction instantiation """
     def __init__(self, rs1 : int, rs2 : int, imm : int):
         super().__init__(offset=imm, rs1=rs1, rs2=rs2, funct3=F3_BEQ, mnemonic='BEQ')
+
+
+class BneInstr(BType):
+    """ Instruction instantiation """
+    def __init__(self, rs1 : int, rs2 : int, imm : int):
+        super().__init__(offset=imm, rs1=rs1, rs2=rs2, funct3=F3_BNE, mnemonic='BNE')
+
+
+class BltInstr(BType):
+    """ Instruction instantiation """
+    def __init__(self, rs1 : int, rs2 : int, imm : int):
+        super().__init__(offset=imm, rs1=rs1, rs2=rs2, funct3=F3_BLT, mnemonic='BLT')
+
+
+class BgeInstr(BType):
+    """ Instruction instantiation """
+    def __init__(self, rs1 : int, rs2 : int, imm : int):
+        super().__init__(offset=imm, rs1=rs1, rs2=rs2, funct3=F3_BGE, mnemonic='BGE')
+
+
+class BltuInstr(BType):
+    """ Instruction instantiation """
+    def __init__(self, rs1 : int, rs2 : int, imm : int):
+        super().__init__(offset=imm, rs1=rs1, rs2=rs2, funct3=F3_BLTU, mnemonic='BLTU')
+
+
+class BgeuInstr(BType):
+    """ Instruction instantiation """
+    def __init__(self, rs1 : int, rs2 : int, imm : int):
+        super().__init__(offset=imm, rs1=rs1, rs2=rs2, funct3=F3_BGEU, mnemonic='BGEU')
     
     
 
@@ -209,8 +240,8 @@ class BeqInstr(BType):
 
 class LoadInstr(IType):
 
-    def __init__(self, offset : int, base_r, width : int, dest_r : int):
-        super().__init__(imm12=offset, rs1=base_r, funct3=width, rd=dest_r, opcode=OPC_LOAD)
+    def __init__(self, offset : int, base_r, width : int, dest_r : int, mnemonic : str = None):
+        super().__init__(imm12=offset, rs1=base_r, funct3=width, rd=dest_r, opcode=OPC_LOAD, mnemonic=mnemonic)
 
 
 
@@ -221,14 +252,15 @@ class SType(RVInstr):
         imm20 + rd + 7opcode
     """
         
-    def __init__(self, offset : int, rs2 : int, rs1 : int, funct3 : int):
+    def __init__(self, offset : int, rs2 : int, rs1 : int, funct3 : int, mnemonic : str = None):
         
-        self.higher = (offset >> 5) & 0b111_1111
-        self.lower  = offset & 0b1_1111
-        self.rs2    = rs2
-        self.rs1    = rs1
-        self.funct3 = funct3
-        super().__init__(opcode=S_TYPE)
+        self.offset     = offset
+        self.imm_higher = (offset >> 5) & 0b111_1111
+        self.imm_lower  = offset & 0b1_1111
+        self.rs2        = np.uint8(rs2)
+        self.rs1        = np.uint8(rs1)
+        self.funct3     = np.uint8(funct3)
+        super().__init__(opcode=S_TYPE, mnemonic=mnemonic)
 
     # def get_binary_string(self) -> np.int32:
     #     """ Generate a machine readable (binary) instrucion """
@@ -249,9 +281,9 @@ class SType(RVInstr):
         table = f"""
             rdx  imm[11:5]  rs2   rs1  funct3  imm[4:0]  opcode  
             ---------------------------------------------------
-            0b  {format(self.higher, '07b'):>7}    {format(self.rs2, '05b'):>5}  {format(self.rs1, '05b'):>5}  {format(self.funct3, '03b'):>3}    {format(self.lower, '05b'):>5}  {format(self.opcode, '07b'):>7}
-            0d  {self.higher:>7}  {self.rs2:>5}  {self.rs1:>5}   {self.funct3:>3}   {self.lower:>5}  {self.opcode:>7}
-            0x  {self.higher:>7x}  {self.rs2:>5x}  {self.rs1:>5x}   {self.funct3:>3x}   {self.lower:>5x}  {self.opcode:>7x}
+            0b  {format(self.imm_higher, '07b'):>7}    {format(self.rs2, '05b'):>5}  {format(self.rs1, '05b'):>5}  {format(self.funct3, '03b'):>3}    {format(self.imm_lower, '05b'):>5}  {format(self.opcode, '07b'):>7}
+            0d  {self.imm_higher:>7}  {self.rs2:>5}  {self.rs1:>5}   {self.funct3:>3}   {self.imm_lower:>5}  {self.opcode:>7}
+            0x  {self.imm_higher:>7x}  {self.rs2:>5x}  {self.rs1:>5x}   {self.funct3:>3x}   {self.imm_lower:>5x}  {self.opcode:>7x}
         """
 
         return table
@@ -319,6 +351,89 @@ class SrliInstr(IType):
         super().__init__(mnemonic='SRLI', imm12=shamt, rs1=rs1, funct3=F3_SRL_SRA, rd=rd, opcode=I_TYPE)
 
 
+class SraiInstr(IType):
+    """ RISCV instruction field definition, imm[11:5] carries funct7 """
+
+    def __init__(self, rd : int, rs1 : int, shamt : int):
+        super().__init__(mnemonic='SRAI', imm12=(F7_SUB_SRA << 5) | (shamt & 0x1F), rs1=rs1, funct3=F3_SRL_SRA, rd=rd, opcode=I_TYPE)
+
+
+#### U Types
+
+class LuiInstr(UType):
+    """ RISCV instruction field definition """
+
+    def __init__(self, rd : int, imm20 : int):
+        super().__init__(imm=imm20, rd=rd, opcode=OPC_LUI, mnemonic='LUI')
+
+
+class AuipcInstr(UType):
+    """ RISCV instruction field definition """
+
+    def __init__(self, rd : int, imm20 : int):
+        super().__init__(imm=imm20, rd=rd, opcode=OPC_AUIPC, mnemonic='AUIPC')
+
+
+#### Loads
+
+class LbInstr(LoadInstr):
+    """ RISCV instruction field definition """
+
+    def __init__(self, rd : int, rs1 : int, offset : int):
+        super().__init__(offset=offset, base_r=rs1, width=F3_LB, dest_r=rd, mnemonic='LB')
+
+
+class LhInstr(LoadInstr):
+    """ RISCV instruction field definition """
+
+    def __init__(self, rd : int, rs1 : int, offset : int):
+        super().__init__(offset=offset, base_r=rs1, width=F3_LH, dest_r=rd, mnemonic='LH')
+
+
+class LwInstr(LoadInstr):
+    """ RISCV instruction field definition """
+
+    def __init__(self, rd : int, rs1 : int, offset : int):
+        super().__init__(offset=offset, base_r=rs1, width=F3_LW, dest_r=rd, mnemonic='LW')
+
+
+class LbuInstr(LoadInstr):
+    """ RISCV instruction field definition """
+
+    def __init__(self, rd : int, rs1 : int, offset : int):
+        super().__init__(offset=offset, base_r=rs1, width=F3_LBU, dest_r=rd, mnemonic='LBU')
+
+
+class LhuInstr(LoadInstr):
+    """ RISCV instruction field definition """
+
+    def __init__(self, rd : int, rs1 : int, offset : int):
+        super().__init__(offset=offset, base_r=rs1, width=F3_LHU, dest_r=rd, mnemonic='LHU')
+
+
+#### Stores
+
+class SbInstr(SType):
+    """ RISCV instruction field definition """
+
+    def __init__(self, rs2 : int, rs1 : int, offset : int):
+        super().__init__(offset=offset, rs2=rs2, rs1=rs1, funct3=F3_SB, mnemonic='SB')
+
+
+class ShInstr(SType):
+    """ RISCV instruction field definition """
+
+    def __init__(self, rs2 : int, rs1 : int, offset : int):
+        super().__init__(offset=offset, rs2=rs2, rs1=rs1, funct3=F3_SH, mnemonic='SH')
+
+
+class SwInstr(SType):
+    """ RISCV instruction field definition """
+
+    def __init__(self, rs2 : int, rs1 : int, offset : int):
+        super().__init__(offset=offset, rs2=rs2, rs1=rs1, funct3=F3_SW, mnemonic='SW')
+
+
 #### R Types
 
 class AddInstr(RType):
@@ -328,6 +443,13 @@ class AddInstr(RType):
         super().__init__(rs2=rs2, rs1=rs1, funct3=F3_ADD_SUB, rd=rd, mnemonic='ADD')
 
 
+class SubInstr(RType):
+    """ RISCV instruction field definition """
+
+    def __init__(self, rd : int, rs1 : int, rs2 : int):
+        super().__init__(rs2=rs2, rs1=rs1, funct3=F3_ADD_SUB, rd=rd, mnemonic='SUB', funct7=F7_SUB_SRA)
+
+
 class SllInstr(RType):
     """ RISCV instruction field definition"""
 
@@ -335,6 +457,34 @@ class SllInstr(RType):
         super().__init__(rs2=rs2, rs1=rs1, funct3=F3_SLL, rd=rd, mnemonic='SLL')
 
 
+class SltInstr(RType):
+    """ RISCV instruction field definition"""
+
+    def __init__(self, rd : int, rs1 : int, rs2 : int):
+        super().__init__(rs2=rs2, rs1=rs1, funct3=F3_SLT, rd=rd, mnemonic='SLT')
+
+
+class SltuInstr(RType):
+    """ RISCV instruction field definition"""
+
+    def __init__(self, rd : int, rs1 : int, rs2 : int):
+        super().__init__(rs2=rs2, rs1=rs1, funct3=F3_SLTU, rd=rd, mnemonic='SLTU')
+
+
+class SrlInstr(RType):
+    """ RISCV instruction field definition"""
+
+    def __init__(self, rd : int, rs1 : int, rs2 : int):
+        super().__init__(rs2=rs2, rs1=rs1, funct3=F3_SRL_SRA, rd=rd, mnemonic='SRL')
+
+
+class SraInstr(RType):
+    """ RISCV instruction field definition"""
+
+    def __init__(self, rd : int, rs1 : int, rs2 : int):
+        super().__init__(rs2=rs2, rs1=rs1, funct3=F3_SRL_SRA, rd=rd, mnemonic='SRA', funct7=F7_SUB_SRA)
+
+
 class AndInstr(RType):
     """ RISCV instruction field definition"""
 
@@ -402,3 +552,129 @@ class JalInstr(RVInstr):
 
     ## B Type
 
+
+
+
+###########################################################################
+#### Batch encoding
+##########################################################################
+#
+# Vectorized counterpart of get_binary_string(): every field is given as a scalar or
+# NumPy array, fields are broadcast against each other and the machine words are
+# assembled with shifts and masks. Immediates use the same conventions as the classes
+# above: byte offsets for S, B and J, the upper 20 bits for U.
+
+
+class InstrSpec(typing.NamedTuple):
+    """ Static encoding of a single RV32I instruction """
+    fmt     : str           # R, I, S, B, U, J
+    opcode  : int
+    funct3  : int = 0
+    funct7  : int = None    # R types and immediate shifts only
+
+
+RV32I = {
+    'LUI'   : InstrSpec('U', OPC_LUI),
+    'AUIPC' : InstrSpec('U', OPC_AUIPC),
+    'JAL'   : InstrSpec('J', OPC_JAL),
+    'JALR'  : InstrSpec('I', OPC_JALR,  0),
+
+    'BEQ'   : InstrSpec('B', B_TYPE,    F3_BEQ),
+    'BNE'   : InstrSpec('B', B_TYPE,    F3_BNE),
+    'BLT'   : InstrSpec('B', B_TYPE,    F3_BLT),
+    'BGE'   : InstrSpec('B', B_TYPE,    F3_BGE),
+    'BLTU'  : InstrSpec('B', B_TYPE,    F3_BLTU),
+    'BGEU'  : InstrSpec('B', B_TYPE,    F3_BGEU),
+
+    'LB'    : InstrSpec('I', OPC_LOAD,  F3_LB),
+    'LH'    : InstrSpec('I', OPC_LOAD,  F3_LH),
+    'LW'    : InstrSpec('I', OPC_LOAD,  F3_LW),
+    'LBU'   : InstrSpec('I', OPC_LOAD,  F3_LBU),
+    'LHU'   : InstrSpec('I', OPC_LOAD,  F3_LHU),
+
+    'SB'    : InstrSpec('S', OPC_STORE, F3_SB),
+    'SH'    : InstrSpec('S', OPC_STORE, F3_SH),
+    'SW'    : InstrSpec('S', OPC_STORE, F3_SW),
+
+    'ADDI'  : InstrSpec('I', I_TYPE,    F3_ADD_SUB),
+    'SLTI'  : InstrSpec('I', I_TYPE,    F3_SLT),
+    'SLTIU' : InstrSpec('I', I_TYPE,    F3_SLTU),
+    'XORI'  : InstrSpec('I', I_TYPE,    F3_XOR),
+    'ORI'   : InstrSpec('I', I_TYPE,    F3_OR),
+    'ANDI'  : InstrSpec('I', I_TYPE,    F3_AND),
+    'SLLI'  : InstrSpec('I', I_TYPE,    F3_SLL,     F7_DEFAULT),
+    'SRLI'  : InstrSpec('I', I_TYPE,    F3_SRL_SRA, F7_DEFAULT),
+    'SRAI'  : InstrSpec('I', I_TYPE,    F3_SRL_SRA, F7_SUB_SRA),
+
+    'ADD'   : InstrSpec('R', R_TYPE,    F3_ADD_SUB, F7_DEFAULT),
+    'SUB'   : InstrSpec('R', R_TYPE,    F3_ADD_SUB, F7_SUB_SRA),
+    'SLL'   : InstrSpec('R', R_TYPE,    F3_SLL,     F7_DEFAULT),
+    'SLT'   : InstrSpec('R', R_TYPE,    F3_SLT,     F7_DEFAULT),
+    'SLTU'  : InstrSpec('R', R_TYPE,    F3_SLTU,    F7_DEFAULT),
+    'XOR'   : InstrSpec('R', R_TYPE,    F3_XOR,     F7_DEFAULT),
+    'SRL'   : InstrSpec('R', R_TYPE,    F3_SRL_SRA, F7_DEFAULT),
+    'SRA'   : InstrSpec('R', R_TYPE,    F3_SRL_SRA, F7_SUB_SRA),
+    'OR'    : InstrSpec('R', R_TYPE,    F3_OR,      F7_DEFAULT),
+    'AND'   : InstrSpec('R', R_TYPE,    F3_AND,     F7_DEFAULT),
+}
+
+
+def _bits(value, hi : int, lo : int, pos : int) -> np.ndarray:
+    """ Extract value[hi:lo] and move it to bit position pos of the instruction word """
+    value = np.asarray(value, dtype=np.int64)              # signed, so negative immediates mask correctly
+    return (((value >> lo) & ((1 << (hi - lo + 1)) - 1)) << pos).astype(np.uint32)
+
+
+def encode_r_type(rd, rs1, rs2, funct3, funct7=F7_DEFAULT, opcode=R_TYPE) -> np.ndarray:
+    """ funct7 + rs2 + rs1 + funct3 + rd + opcode """
+    return _bits(funct7, 6, 0, 25) | _bits(rs2, 4, 0, 20) | _bits(rs1, 4, 0, 15) \
+         | _bits(funct3, 2, 0, 12) | _bits(rd, 4, 0, 7)   | _bits(opcode, 6, 0, 0)
+
+
+def encode_i_type(rd, rs1, imm, funct3, opcode=I_TYPE) -> np.ndarray:
+    """ imm[11:0] + rs1 + funct3 + rd + opcode """
+    return _bits(imm, 11, 0, 20) | _bits(rs1, 4, 0, 15) | _bits(funct3, 2, 0, 12) \
+         | _bits(rd, 4, 0, 7)    | _bits(opcode, 6, 0, 0)
+
+
+def encode_s_type(rs1, rs2, imm, funct3, opcode=OPC_STORE) -> np.ndarray:
+    """ imm[11:5] + rs2 + rs1 + funct3 + imm[4:0] + opcode """
+    return _bits(imm, 11, 5, 25) | _bits(rs2, 4, 0, 20) | _bits(rs1, 4, 0, 15) \
+         | _bits(funct3, 2, 0, 12) | _bits(imm, 4, 0, 7) | _bits(opcode, 6, 0, 0)
+
+
+def encode_b_type(rs1, rs2, imm, funct3, opcode=B_TYPE) -> np.ndarray:
+    """ imm[12|10:5] + rs2 + rs1 + funct3 + imm[4:1|11] + opcode, bit 0 of the offset is dropped """
+    return _bits(imm, 12, 12, 31) | _bits(imm, 10, 5, 25) | _bits(rs2, 4, 0, 20) | _bits(rs1, 4, 0, 15) \
+         | _bits(funct3, 2, 0, 12) | _bits(imm, 4, 1, 8) | _bits(imm, 11, 11, 7) | _bits(opcode, 6, 0, 0)
+
+
+def encode_u_type(rd, imm, opcode) -> np.ndarray:
+    """ imm[31:12] + rd + opcode, imm is given as the upper 20 bit value like in UType """
+    return _bits(imm, 19, 0, 12) | _bits(rd, 4, 0, 7) | _bits(opcode, 6, 0, 0)
+
+
+def encode_j_type(rd, imm, opcode=OPC_JAL) -> np.ndarray:
+    """ imm[20|10:1|11|19:12] + rd + opcode, bit 0 of the offset is dropped """
+    return _bits(imm, 20, 20, 31) | _bits(imm, 10, 1, 21) | _bits(imm, 11, 11, 20) \
+         | _bits(imm, 19, 12, 12) | _bits(rd, 4, 0, 7)    | _bits(opcode, 6, 0, 0)
+
+
+def encode(mnemonic : str, rd=0, rs1=0, rs2=0, imm=0) -> np.ndarray:
+    """ Encode a batch of one RV32I instruction, e.g. encode('ADDI', rd=rds, rs1=rs1s, imm=imms) """
+
+    spec = RV32I[mnemonic.upper()]
+
+    if spec.fmt == 'R':
+        return encode_r_type(rd, rs1, rs2, spec.funct3, spec.funct7, spec.opcode)
+    if spec.fmt == 'I':
+        if spec.funct7 is not None:                 # immediate shifts: imm[11:5] holds funct7
+            imm = (np.asarray(imm, dtype=np.int64) & 0x1F) | (spec.funct7 << 5)
+        return encode_i_type(rd, rs1, imm, spec.funct3, spec.opcode)
+    if spec.fmt == 'S':
+        return encode_s_type(rs1, rs2, imm, spec.funct3, spec.opcode)
+    if spec.fmt == 'B':
+        return encode_b_type(rs1, rs2, imm, spec.funct3, spec.opcode)
+    if spec.fmt == 'U':
+        return encode_u_type(rd, imm, spec.opcode)
+    return encode_j_type(rd, imm, spec.opcode)
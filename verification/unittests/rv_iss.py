@@ -0,0 +1,504 @@
+"""
+RV32I instruction set simulator, golden model for the programs in verification/system.
+
+Executes the same test_program.hex image the icache loads. Every instruction is decoded
+once into a handler closure with its operands, immediates and pc-relative targets bound,
+handlers are cached by pc. Memories follow the SoC: instructions come from the icache
+image, loads and stores go to a separate byte addressed, little endian data memory like
+the dcache, accesses outside of it read zero and are dropped on write.
+
+    iss = ISS.from_hex("verification/system/build/test_program.hex")
+    iss.run()
+    assert iss.x[31] == 0xBEEF
+
+"""
+
+import argparse
+import time
+import memory_image
+import rv_disasm
+
+
+RESET_PC    = 0x10074           # program_counter.sv reset address (SIMULATION)
+IMEM_SIZE   = 1 << 20           # icache RAM_DEPTH
+DMEM_SIZE   = 1025              # dcache mem [0:SIZE_LAU]
+
+MASK        = 0xFFFF_FFFF
+SIGN        = 0x8000_0000       # a ^ SIGN < b ^ SIGN compares two's complement values
+
+
+# halt reasons
+HALT_INVALID    = 'invalid'     # instruction not part of RV32I
+HALT_SELF_LOOP  = 'self_loop'   # jump to itself, e.g. 'end: j end'
+HALT_LIMIT      = 'limit'       # instruction budget exhausted
+
+
+###########################################################################
+#### Handler factories
+##########################################################################
+#
+# f(iss, rd, rs1, rs2, imm, pc) -> handler() -> next pc
+# Writes to x0 are removed at decode time, handlers never check rd.
+
+
+def _nop(iss, rd, rs1, rs2, imm, pc):
+    nxt = pc + 4
+    return lambda: nxt
+
+
+class _Halt(Exception):
+    """ Raised by the handler of an invalid instruction """
+
+
+def _invalid(iss, rd, rs1, rs2, imm, pc):
+    def handler():
+        raise _Halt
+    return handler
+
+
+def _writes_rd(factory):
+    """ Instructions without side effects besides rd turn into a nop for x0 """
+    return lambda iss, rd, rs1, rs2, imm, pc: factory(iss, rd, rs1, rs2, imm, pc) if rd else _nop(iss, rd, rs1, rs2, imm, pc)
+
+
+#### R types
+
+@_writes_rd
+def _add(iss, rd, rs1, rs2, imm, pc):
+    x, nxt = iss.x, pc + 4
+    def handler():
+        x[rd] = (x[rs1] + x[rs2]) & MASK
+        return nxt
+    return handler
+
+@_writes_rd
+def _sub(iss, rd, rs1, rs2, imm, pc):
+    x, nxt = iss.x, pc + 4
+    def handler():
+        x[rd] = (x[rs1] - x[rs2]) & MASK
+        return nxt
+    return handler
+
+@_writes_rd
+def _sll(iss, rd, rs1, rs2, imm, pc):
+    x, nxt = iss.x, pc + 4
+    def handler():
+        x[rd] = (x[rs1] << (x[rs2] & 0x1F)) & MASK
+        return nxt
+    return handler
+
+@_writes_rd
+def _slt(iss, rd, rs1, rs2, imm, pc):
+    x, nxt = iss.x, pc + 4
+    def handler():
+        x[rd] = int((x[rs1] ^ SIGN) < (x[rs2] ^ SIGN))
+        return nxt
+    return handler
+
+@_writes_rd
+def _sltu(iss, rd, rs1, rs2, imm, pc):
+    x, nxt = iss.x, pc + 4
+    def handler():
+        x[rd] = int(x[rs1] < x[rs2])
+        return nxt
+    return handler
+
+@_writes_rd
+def _xor(iss, rd, rs1, rs2, imm, pc):
+    x, nxt = iss.x, pc + 4
+    def handler():
+        x[rd] = x[rs1] ^ x[rs2]
+        return nxt
+    return handler
+
+@_writes_rd
+def _srl(iss, rd, rs1, rs2, imm, pc):
+    x, nxt = iss.x, pc + 4
+    def handler():
+        x[rd] = x[rs1] >> (x[rs2] & 0x1F)
+        return nxt
+    return handler
+
+@_writes_rd
+def _sra(iss, rd, rs1, rs2, imm, pc):
+    x, nxt = iss.x, pc + 4
+    def handler():
+        x[rd] = (((x[rs1] ^ SIGN) - SIGN) >> (x[rs2] & 0x1F)) & MASK
+        return nxt
+    return handler
+
+@_writes_rd
+def _or(iss, rd, rs1, rs2, imm, pc):
+    x, nxt = iss.x, pc + 4
+    def handler():
+        x[rd] = x[rs1] | x[rs2]
+        return nxt
+    return handler
+
+@_writes_rd
+def _and(iss, rd, rs1, rs2, imm, pc):
+    x, nxt = iss.x, pc + 4
+    def handler():
+        x[rd] = x[rs1] & x[rs2]
+        return nxt
+    return handler
+
+
+#### I types
+
+@_writes_rd
+def _addi(iss, rd, rs1, rs2, imm, pc):
+    x, nxt = iss.x, pc + 4
+    if rs1 == 0:                                    # li
+        value = imm & MASK
+        def handler():
+            x[rd] = value
+            return nxt
+        return handler
+    def handler():
+        x[rd] = (x[rs1] + imm) & MASK
+        return nxt
+    return handler
+
+@_writes_rd
+def _slti(iss, rd, rs1, rs2, imm, pc):
+    x, nxt, cmp = iss.x, pc + 4, (imm & MASK) ^ SIGN
+    def handler():
+        x[rd] = int((x[rs1] ^ SIGN) < cmp)
+        return nxt
+    return handler
+
+@_writes_rd
+def _sltiu(iss, rd, rs1, rs2, imm, pc):
+    x, nxt, cmp = iss.x, pc + 4, imm & MASK
+    def handler():
+        x[rd] = int(x[rs1] < cmp)
+        return nxt
+    return handler
+
+@_writes_rd
+def _xori(iss, rd, rs1, rs2, imm, pc):
+    x, nxt, imm = iss.x, pc + 4, imm & MASK
+    def handler():
+        x[rd] = x[rs1] ^ imm
+        return nxt
+    return handler
+
+@_writes_rd
+def _ori(iss, rd, rs1, rs2, imm, pc):
+    x, nxt, imm = iss.x, pc + 4, imm & MASK
+    def handler():
+        x[rd] = x[rs1] | imm
+        return nxt
+    return handler
+
+@_writes_rd
+def _andi(iss, rd, rs1, rs2, imm, pc):
+    x, nxt, imm = iss.x, pc + 4, imm & MASK
+    def handler():
+        x[rd] = x[rs1] & imm
+        return nxt
+    return handler
+
+@_writes_rd
+def _slli(iss, rd, rs1, rs2, imm, pc):
+    x, nxt = iss.x, pc + 4
+    def handler():
+        x[rd] = (x[rs1] << imm) & MASK
+        return nxt
+    return handler
+
+@_writes_rd
+def _srli(iss, rd, rs1, rs2, imm, pc):
+    x, nxt = iss.x, pc + 4
+    def handler():
+        x[rd] = x[rs1] >> imm
+        return nxt
+    return handler
+
+@_writes_rd
+def _srai(iss, rd, rs1, rs2, imm, pc):
+    x, nxt = iss.x, pc + 4
+    def handler():
+        x[rd] = (((x[rs1] ^ SIGN) - SIGN) >> imm) & MASK
+        return nxt
+    return handler
+
+
+#### U types
+
+@_writes_rd
+def _lui(iss, rd, rs1, rs2, imm, pc):
+    x, nxt, value = iss.x, pc + 4, imm & MASK
+    def handler():
+        x[rd] = value
+        return nxt
+    return handler
+
+@_writes_rd
+def _auipc(iss, rd, rs1, rs2, imm, pc):
+    x, nxt, value = iss.x, pc + 4, (pc + imm) & MASK
+    def handler():
+        x[rd] = value
+        return nxt
+    return handler
+
+
+#### jumps and branches
+
+def _jal(iss, rd, rs1, rs2, imm, pc):
+    x, nxt, tgt = iss.x, pc + 4, (pc + imm) & MASK
+    if rd == 0:
+        return lambda: tgt
+    def handler():
+        x[rd] = nxt
+        return tgt
+    return handler
+
+def _jalr(iss, rd, rs1, rs2, imm, pc):
+    x, nxt = iss.x, pc + 4
+    if rd == 0:
+        return lambda: ((x[rs1] + imm) & MASK) & ~1
+    def handler():
+        tgt = ((x[rs1] + imm) & MASK) & ~1         # read rs1 before rd is written, rd may equal rs1
+        x[rd] = nxt
+        return tgt
+    return handler
+
+def _beq(iss, rd, rs1, rs2, imm, pc):
+    x, nxt, tgt = iss.x, pc + 4, (pc + imm) & MASK
+    return lambda: tgt if x[rs1] == x[rs2] else nxt
+
+def _bne(iss, rd, rs1, rs2, imm, pc):
+    x, nxt, tgt = iss.x, pc + 4, (pc + imm) & MASK
+    return lambda: tgt if x[rs1] != x[rs2] else nxt
+
+def _blt(iss, rd, rs1, rs2, imm, pc):
+    x, nxt, tgt = iss.x, pc + 4, (pc + imm) & MASK
+    return lambda: tgt if (x[rs1] ^ SIGN) < (x[rs2] ^ SIGN) else nxt
+
+def _bge(iss, rd, rs1, rs2, imm, pc):
+    x, nxt, tgt = iss.x, pc + 4, (pc + imm) & MASK
+    return lambda: tgt if (x[rs1] ^ SIGN) >= (x[rs2] ^ SIGN) else nxt
+
+def _bltu(iss, rd, rs1, rs2, imm, pc):
+    x, nxt, tgt = iss.x, pc + 4, (pc + imm) & MASK
+    return lambda: tgt if x[rs1] < x[rs2] else nxt
+
+def _bgeu(iss, rd, rs1, rs2, imm, pc):
+    x, nxt, tgt = iss.x, pc + 4, (pc + imm) & MASK
+    return lambda: tgt if x[rs1] >= x[rs2] else nxt
+
+
+#### loads and stores, dcache semantics: little endian, byte addressed, unaligned allowed
+
+def _load(n_bytes : int, signed : bool):
+    sign = 1 << (8*n_bytes - 1)
+
+    @_writes_rd
+    def factory(iss, rd, rs1, rs2, imm, pc):
+        x, m, nxt = iss.x, iss.dmem, pc + 4
+        if signed:
+            def handler():
+                a = (x[rs1] + imm) & MASK
+                x[rd] = ((int.from_bytes(m[a:a + n_bytes], 'little') ^ sign) - sign) & MASK
+                return nxt
+        else:
+            def handler():
+                a = (x[rs1] + imm) & MASK
+                x[rd] = int.from_bytes(m[a:a + n_bytes], 'little')     # slices past the end read as zero
+                return nxt
+        return handler
+    return factory
+
+
+def _store(n_bytes : int):
+    value_mask = (1 << (8*n_bytes)) - 1
+
+    def factory(iss, rd, rs1, rs2, imm, pc):
+        x, m, nxt, size = iss.x, iss.dmem, pc + 4, len(iss.dmem)
+        def handler():
+            a = (x[rs1] + imm) & MASK
+            if a + n_bytes <= size:
+                m[a:a + n_bytes] = (x[rs2] & value_mask).to_bytes(n_bytes, 'little')
+            else:
+                iss._store_partial(a, x[rs2], n_bytes)
+            return nxt
+        return handler
+    return factory
+
+
+_FACTORIES = {
+    'LUI': _lui,    'AUIPC': _auipc,    'JAL': _jal,    'JALR': _jalr,
+    'BEQ': _beq,    'BNE': _bne,        'BLT': _blt,    'BGE': _bge,    'BLTU': _bltu,  'BGEU': _bgeu,
+    'LB': _load(1, True),   'LH': _load(2, True),   'LW': _load(4, False),
+    'LBU': _load(1, False), 'LHU': _load(2, False),
+    'SB': _store(1),        'SH': _store(2),        'SW': _store(4),
+    'ADDI': _addi,  'SLTI': _slti,      'SLTIU': _sltiu,    'XORI': _xori,  'ORI': _ori,    'ANDI': _andi,
+    'SLLI': _slli,  'SRLI': _srli,      'SRAI': _srai,
+    'ADD': _add,    'SUB': _sub,        'SLL': _sll,    'SLT': _slt,    'SLTU': _sltu,
+    'XOR': _xor,    'SRL': _srl,        'SRA': _sra,    'OR': _or,      'AND': _and,
+}
+
+assert set(_FACTORIES) == set(rv_disasm.MNEMONICS)
+
+
+
+###########################################################################
+#### Simulator
+##########################################################################
+
+
+class _Predecoded(dict):
+    """ pc -> handler, decodes on first access """
+
+    def __init__(self, iss : "ISS"):
+        super().__init__()
+        self.iss = iss
+
+    def __missing__(self, pc : int):
+        handler = self[pc] = self.iss._decode(pc)
+        return handler
+
+
+class ISS:
+    """ RV32I golden model with predecoded instruction cache """
+
+    def __init__(self, entry : int = RESET_PC, imem_size : int = IMEM_SIZE, dmem_size : int = DMEM_SIZE):
+
+        self.x          = [0] * 32      # register file, x[0] is never written, fixed size list of unsigned ints
+        self.pc         = entry
+        self.imem       = bytearray(imem_size)
+        self.dmem       = bytearray(dmem_size)
+
+        self.retired    = 0
+        self.halt_reason = None
+
+        self._handlers  = _Predecoded(self)
+
+
+    @classmethod
+    def from_hex(cls, path : str, **kwargs) -> "ISS":
+        """ Simulator with the Verilog hex image loaded into instruction memory """
+        iss = cls(**kwargs)
+        iss.load(memory_image.read_hex(path))
+        return iss
+
+
+    @classmethod
+    def from_image(cls, path : str, **kwargs) -> "ISS":
+        """ Simulator with a hex, binary or ELF image loaded, starting at its entry point """
+        iss = cls(**kwargs)
+        iss.load_image(memory_image.read_image(path))
+        return iss
+
+
+    def load(self, segments):
+        """ Place image segments in instruction memory, drops predecoded instructions """
+
+        for addr, data in segments:
+            self.imem[addr:addr + len(data)] = data[:max(len(self.imem) - addr, 0)]
+        self._handlers.clear()
+
+
+    def load_image(self, image : memory_image.Image):
+        """ Code segments to instruction memory, data segments to data memory as far as it reaches, pc to the entry point """
+
+        self.load(image.code)
+        for addr, data in image.data:
+            if addr < len(self.dmem):
+                self.dmem[addr:addr + len(data)] = data[:len(self.dmem) - addr]
+        self.pc = image.entry
+
+
+    def fetch(self, pc : int) -> int:
+        return int.from_bytes(self.imem[pc:pc + 4], 'little')
+
+
+    def _decode(self, pc : int):
+        """ Build the handler of the instruction at pc """
+
+        word    = self.fetch(pc)
+        fields  = rv_disasm.decode(word)[0]
+
+        if fields['mnemonic'] < 0 or pc & 0x3:
+            factory = _invalid
+        else:
+            factory = _FACTORIES[rv_disasm.MNEMONICS[fields['mnemonic']]]
+
+        return factory(self, int(fields['rd']), int(fields['rs1']), int(fields['rs2']), int(fields['imm']), pc)
+
+
+    def _store_partial(self, addr : int, value : int, n_bytes : int):
+        """ Store crossing the end of data memory, bytes outside are dropped like in the dcache """
+
+        for i in range(n_bytes):
+            if addr + i < len(self.dmem):
+                self.dmem[addr + i] = (value >> (8*i)) & 0xFF
+
+
+    def step(self) -> bool:
+        """ Execute a single instruction, returns False if the simulator halted """
+
+        try:
+            nxt = self._handlers[self.pc]()
+        except _Halt:
+            self.halt_reason = HALT_INVALID
+            return False
+
+        self.retired += 1
+        if nxt == self.pc:
+            self.halt_reason = HALT_SELF_LOOP
+            return False
+
+        self.pc = nxt
+        return True
+
+
+    def run(self, max_instr : int = 10_000_000) -> str:
+        """ Execute until an invalid instruction, a self loop or max_instr, returns the halt reason """
+
+        handlers    = self._handlers
+        pc          = self.pc
+        n           = 0
+        reason      = HALT_LIMIT
+
+        try:
+            for n in range(1, max_instr + 1):       # n: instructions executed so far
+                nxt = handlers[pc]()
+                if nxt == pc:
+                    reason = HALT_SELF_LOOP
+                    break
+                pc = nxt
+        except _Halt:
+            n     -= 1                              # the invalid instruction does not retire
+            reason = HALT_INVALID
+
+        self.pc             = pc
+        self.retired       += n
+        self.halt_reason    = reason
+        return reason
+
+
+    def signed(self, reg : int) -> int:
+        """ Register value as two's complement """
+        return (self.x[reg] ^ SIGN) - SIGN
+
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Run a program image on the RV32I reference model")
+    parser.add_argument("hex", nargs='?', default="verification/system/build/test_program.hex")
+    parser.add_argument("--max-instr", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    iss     = ISS.from_hex(args.hex)
+    start   = time.perf_counter()
+    reason  = iss.run(args.max_instr)
+    elapsed = time.perf_counter() - start
+
+    print(f"halted: {reason} at pc={iss.pc:#x} after {iss.retired} instructions "
+          f"({iss.retired / elapsed / 1e6:.2f} MIPS)")
+    for reg in range(32):
+        print(f"x{reg:<2} = {iss.x[reg]:#010x}", end="\n" if reg % 4 == 3 else "    ")
@@ -0,0 +1,209 @@
+"""
+Tests of a program running on the whole core, shared by the testbenches of the soc and top
+toplevels. They only differ in where the soc sits below the DUT, every function takes its handle:
+
+    @cocotb.test(skip=COSIM or bool(PROGRAMS))
+    async def test_top(dut):
+        await system_tests.single_program(dut, dut.soc_i)
+
+The environment variables below are set by the Makefile (PROGRAM, PROGRAMS, COMMIT_TRACE, TRACE,
+PERF_COUNTERS, PROFILE, ASM_FILE) or on the command line (COSIM=1, MAX_CYCLES, TOHOST).
+
+"""
+
+import os
+import time
+from cocotb.triggers import RisingEdge, ReadOnly
+from harness import start_clock, reset, wait_cycles, Core
+import rv_iss
+from core_monitor import CoreMonitor, Scoreboard, Termination
+from program_loader import ProgramLoader
+from commit_trace import CommitTrace, trace_file
+from trace_window import TraceWindow
+from perf_counters import PerfCounters, write_json
+from profiler import Profiler, Symbols, load_symbols
+
+
+MAX_CYCLES = int(os.environ.get("MAX_CYCLES", 100_000))      # hard timeout, programs normally end earlier
+
+RESET_CYCLES = 3
+
+HEX_FILE = "verification/system/build/test_program.hex"     # image loaded by icache
+
+PROGRAM = os.environ.get("PROGRAM")                         # make PROGRAM=... loads this image through the backdoor instead
+
+PROGRAMS = os.environ.get("PROGRAM_IMAGES", "").split()     # make PROGRAMS="alu count ..." runs them all in one simulation
+
+COSIM = os.environ.get("COSIM", "0") != "0"                # COSIM=1 make ... runs the lockstep test instead
+
+TOHOST = int(os.environ["TOHOST"], 0) if "TOHOST" in os.environ else None     # a store to this address ends the program
+
+COMMIT_TRACE = os.environ.get("COMMIT_TRACE")               # make COMMIT_TRACE=commit.trace records every retired instruction
+
+TRACE = os.environ.get("TRACE", "none")                     # make TRACE=window keeps the last TRACE_WINDOW cycles for failing programs
+
+TRACE_FILE = os.environ.get("TRACE_FILE", "window.vcd")
+
+WINDOW = TraceWindow(int(os.environ.get("TRACE_WINDOW", 1000))) if TRACE == 'window' else None
+
+PERF_COUNTERS = os.environ.get("PERF_COUNTERS")             # make PERF_COUNTERS=perf.json writes CPI and instruction mix per program
+
+PERF_REPORTS = []
+
+PROFILE = os.environ.get("PROFILE")                         # make PROFILE=profile writes profile.txt and profile.folded (flame graph)
+
+PROFILE_PERIOD = int(os.environ.get("PROFILE_PERIOD", 1))   # sample pc every PROFILE_PERIOD cycles
+
+ASM_FILE = os.environ.get("ASM_FILE")                       # source of test_program.hex, labels of its profile
+
+
+async def run_program(dut, soc, *listeners, program : str = None) -> Termination:
+    """ Load program if given, reset the core and run until the program ends or MAX_CYCLES elapsed """
+
+    if program:
+        image = ProgramLoader.of(soc).load(program)       # written during reset, before the next clock edge
+        assert image.entry == rv_iss.RESET_PC, f"{program}: entry point {image.entry:#x}, the core starts at {rv_iss.RESET_PC:#x}"
+    await reset(dut.clk, dut.rst_n, RESET_CYCLES)           # also clears the register file
+
+    termination = Termination(TOHOST)
+    monitor     = CoreMonitor(soc.core_i, dut.clk, dut.rst_n)
+    monitor.listeners.extend(listeners)
+    monitor.listeners.append(termination)
+
+    recorder    = None
+    if COMMIT_TRACE:
+        recorder = CommitTrace(trace_file(COMMIT_TRACE, program if PROGRAMS else None))
+        monitor.listeners.insert(0, recorder)             # also records the instruction that stops the run
+    if WINDOW:
+        WINDOW.clear()
+        monitor.listeners.insert(0, WINDOW)
+    counters    = PerfCounters(soc.core_i) if PERF_COUNTERS else None
+    if counters:
+        monitor.listeners.insert(0, counters)
+    profiler    = Profiler(PROFILE_PERIOD) if PROFILE else None
+    if profiler:
+        monitor.listeners.insert(0, profiler)
+
+    print("Beginning instruction execution")
+    try:
+        reason = await monitor.run(max_cycles=MAX_CYCLES)
+    finally:
+        if recorder:
+            recorder.close()
+            print(f"Commit trace: {recorder.records} instructions in {recorder.path}")
+        if counters:
+            PERF_REPORTS.append(counters.report(program or HEX_FILE))
+            write_json(PERF_COUNTERS, PERF_REPORTS)
+        if profiler:
+            write_profile(profiler, program)
+
+    # let the terminating instruction commit
+    await RisingEdge(dut.clk)
+    await ReadOnly()
+
+    print(f"Program ended: {termination.summary() if termination.reason else reason}")
+    return termination
+
+
+def write_profile(profiler : Profiler, program : str = None):
+    """ Flat profile and folded stacks of a program, one pair of files per program of PROGRAMS """
+
+    symbols = load_symbols(program or HEX_FILE, None if program else ASM_FILE)
+    if not symbols:
+        print(f"Profile: no ELF file or assembly source matches {program or HEX_FILE}, addresses are not labeled")
+    symbols = Symbols(symbols)
+    for ext, text in (('.txt', profiler.flat(symbols)), ('.folded', profiler.folded(symbols))):
+        path = trace_file(PROFILE + ext, program if PROGRAMS else None)
+        with open(path, 'w') as f:
+            f.write(text)
+        print(f"Profile: {path}")
+
+
+def program_error(soc, termination : Termination, iss : rv_iss.ISS = None) -> str:
+    """ Why the program failed, None if it stored 1 to tohost or wrote 0xBEEF to x31 and matches the reference model """
+
+    reg_file = Core.of(soc.core_i).reg_file
+
+    if termination.reason is None:
+        return f"Timeout, no end of program after {MAX_CYCLES} cycles"
+    if termination.reason == 'tohost':
+        if termination.value != 1:
+            return f"Test failed! tohost = {termination.value:#x}"
+    elif reg_file[31].value != 0xBEEF:
+        return "Test failed!"
+
+    if iss is not None:
+        iss.run(max_instr=termination.retired)
+        print(f"Reference model halted: {iss.halt_reason} after {iss.retired} instructions")
+        for reg in range(1, 32):
+            value = reg_file[reg].value
+            if value != iss.x[reg]:
+                return f"x{reg}: core {int(value):#010x}, reference model {iss.x[reg]:#010x}"
+    return None
+
+
+def dump_window(error : str, program : str = None):
+    """ Write the cycles before the end of a failed program as VCD, TRACE=window only """
+
+    if error and WINDOW:
+        path = trace_file(TRACE_FILE, program)
+        WINDOW.write_vcd(path)
+        print(f"Last {len(WINDOW.samples)} cycles written to {path}")
+
+
+
+###########################################################################
+#### Tests
+##########################################################################
+
+
+async def single_program(dut, soc):
+    """ Run test_program.hex or PROGRAM, compare the final architectural state against the reference model """
+
+    dut._log.info("Starting RISC-V CPU test")
+
+    start_clock(dut.clk)
+    termination = await run_program(dut, soc, program=PROGRAM)
+
+    error = program_error(soc, termination, rv_iss.ISS.from_image(PROGRAM or HEX_FILE))
+    dump_window(error)
+    assert error is None, error
+
+
+async def cosim(dut, soc):
+    """ Compare every retired instruction against the reference model, stop at the first mismatch """
+
+    start_clock(dut.clk)
+    scoreboard  = Scoreboard(rv_iss.ISS.from_image(PROGRAM or HEX_FILE))
+    termination = await run_program(dut, soc, scoreboard, program=PROGRAM)
+
+    error = scoreboard.report or program_error(soc, termination)
+    dump_window(error)
+    assert error is None, error
+
+
+async def programs(dut, soc):
+    """ Run every program of PROGRAMS back to back, reloading memory and resetting the core in between """
+
+    start_clock(dut.clk)
+
+    results = []
+    for program in PROGRAMS:
+        print(f"#### {program}")
+        start       = time.perf_counter()
+        scoreboard  = Scoreboard(rv_iss.ISS.from_image(program))
+        listeners   = [scoreboard] if COSIM else []
+        termination = await run_program(dut, soc, *listeners, program=program)
+
+        error = scoreboard.report or program_error(soc, termination, None if COSIM else scoreboard.iss)
+        dump_window(error, program)
+        results.append((program, error, termination, time.perf_counter() - start))
+        await wait_cycles(dut.clk)                          # leave the read only phase before the next reset
+
+    print(f"{'program':<48}{'result':<8}{'end':<12}{'instr':>9}{'cycles':>9}{'time/s':>9}")
+    for program, error, termination, wall_time in results:
+        print(f"{program:<48}{'FAIL' if error else 'pass':<8}{termination.reason or 'timeout':<12}"
+              f"{termination.retired:>9}{termination.cycles:>9}{wall_time:>9.2f}")
+
+    failed = [f"{program}: {error}" for program, error, _, _ in results if error]
+    assert not failed, "\n".join(failed)
@@ -1,14 +1,46 @@
 import operator
+import os
 import cocotb
 from cocotb.triggers import Timer
-from cocotb.binary import BinaryRepresentation, BinaryValue
+from harness import settle
+from cocotb.binary import BinaryValue
 from constants_pkg import *
 import numpy as np
+import alu_model
 
-CLK_PRD = 10
 
+DATA_WIDTH  = int(os.environ.get("DATA_WIDTH", 32))         # set by make DATA_WIDTH=8, parameter of the built ALU
+N_VECTORS   = int(os.environ.get("N_VECTORS", 1000))        # random vectors per operator, N_VECTORS=100000 for long sweeps
+EXHAUSTIVE_MAX_WIDTH = 10                                   # 2**20 operand pairs per operator
+SEED        = int(os.environ.get("SEED", np.random.SeedSequence().entropy % 2**32))
 
-@cocotb.test()
+
+async def drive_vectors(dut, operator : int, a : np.ndarray, b : np.ndarray, coverage : alu_model.CoverageBitmap = None) -> np.ndarray:
+    """ Apply operand pairs one simulator step apart, returns result_o of every pair """
+
+    op_a, op_b, result  = dut.operand_a_i, dut.operand_b_i, dut.result_o
+    step                = Timer(1, 'step')                  # reused, combinational logic settles within a step
+    actual              = np.empty(len(a), dtype=np.uint64)
+    applied             = np.empty((2, len(a)), dtype=np.uint64)
+
+    dut.operator_i.value = operator
+    prev_x = None
+    for k, (x, y) in enumerate(zip(a.tolist(), b.tolist())):
+        if x != prev_x:                                     # exhaustive sweeps keep a for 2**DATA_WIDTH vectors
+            op_a.value = prev_x = x
+        op_b.value = y
+        await step
+        actual[k] = int(result.value)
+        if coverage is not None:                            # what reached the DUT, not what was generated
+            applied[:, k] = int(op_a.value), int(op_b.value)
+
+    if coverage is not None:
+        names = {value : name for name, value in alu_model.OPERATORS.items()}
+        coverage.sample(names[int(dut.operator_i.value)], applied[0], applied[1])
+    return actual
+
+
+@cocotb.test(skip=DATA_WIDTH != 32)
 async def test_alu(dut):
     """ ALU test cases """
 
@@ -36,7 +68,7 @@ async def test_alu(dut):
         dut.operand_a_i.value = operand_a
         dut.operand_b_i.value = operand_b
 
-        await Timer(CLK_PRD, units='ns')
+        await settle()
 
         expected_result = operand_a + operand_b
         actual_result = int(dut.result_o.value)
@@ -49,23 +81,23 @@ async def test_alu(dut):
     dut.operator_i.value    = ALU_ADDU
     dut.operand_a_i.value   = BinaryValue(0, 32, bigEndian=False)
     dut.operand_b_i.value   = BinaryValue(1, 32, bigEndian=False)
-    await Timer(CLK_PRD, units='ns')
+    await settle()
     assert dut.result_o.value == 0x1, f"Expected result_o=0, got {hex(dut.result_o.value)}"
 
     dut.operand_a_i.value   = BinaryValue(0xffff_fffe, 32, bigEndian=False)
     dut.operand_b_i.value   = BinaryValue(1, 32, bigEndian=False)
-    await Timer(CLK_PRD, units='ns')
+    await settle()
     assert dut.result_o.value == 0xffff_ffff, f"Expected result_o=0, got {hex(dut.result_o.value)}"
 
     dut.operand_a_i.value   = BinaryValue(0xffff_fffe, 32, bigEndian=False)
     dut.operand_b_i.value   = BinaryValue(1, 32, bigEndian=False)
-    await Timer(CLK_PRD, units='ns')
+    await settle()
     assert dut.result_o.value == 0xffff_ffff, f"Expected result_o=0, got {hex(dut.result_o.value)}"
 
     print("Testing unsigned addition overflow handling")
     dut.operand_a_i.value   = BinaryValue(1, 32, bigEndian=False)
     dut.operand_b_i.value   = BinaryValue(0xffff_ffff, 32, bigEndian=False)
-    await Timer(CLK_PRD, units='ns')
+    await settle()
     assert dut.result_o.value == 0x0, f"Expected result_o=0, got {hex(dut.result_o.value)}"
 
     # signed
@@ -82,7 +114,7 @@ async def test_alu(dut):
         dut.operand_a_i.value = operand_a
         dut.operand_b_i.value = operand_b
 
-        await Timer(CLK_PRD, units='ns')
+        await settle()
 
         expected_result = operand_a + operand_b
         actual_result = np.int32(int(dut.result_o.value))
@@ -104,7 +136,7 @@ async def test_alu(dut):
         dut.operand_a_i.value = operand_a
         dut.operand_b_i.value = operand_b
 
-        await Timer(CLK_PRD, units='ns')
+        await settle()
 
         expected_result = operand_a - operand_b
         actual_result = np.int32(int(dut.result_o.value))
@@ -129,7 +161,7 @@ async def test_alu(dut):
                 dut.operand_a_i.value   = operand_a
                 dut.operand_b_i.value   = operand_b
                 
-                await Timer(CLK_PRD, units='ns')
+                await settle()
 
                 expected_result = py_operator(operand_a,  operand_b)
                 actual_result   = int(dut.result_o.value)
@@ -149,7 +181,7 @@ async def test_alu(dut):
             dut.operand_a_i.value   = operand_a
             dut.operand_b_i.value   = shift_amount
             
-            await Timer(CLK_PRD, units='ns')
+            await settle()
 
             expected_result = expected_result
             actual_result   = int(dut.result_o.value)
@@ -167,7 +199,7 @@ async def test_alu(dut):
             dut.operand_a_i.value   = operand_a
             dut.operand_b_i.value   = shift_amount
             
-            await Timer(CLK_PRD, units='ns')
+            await settle()
 
             expected_result = operand_a >> shift_amount
             actual_result   = dut.result_o.value.signed_integer
@@ -186,7 +218,7 @@ async def test_alu(dut):
             dut.operand_a_i.value   = operand_a
             dut.operand_b_i.value   = shift_amount
             
-            await Timer(CLK_PRD, units='ns')
+            await settle()
 
             expected_result = operand_a << shift_amount
             actual_result   = dut.result_o.value.signed_integer
@@ -195,6 +227,26 @@ async def test_alu(dut):
                 f"Shift {hex(operand_a)} >> {hex(shift_amount)} = {hex(expected_result)}, got {hex(actual_result)}"
 
 
+    # only operand_b[4:0] is the shift amount, srai carries funct7 in imm[11:5]
+    print("Testing shift amounts with upper bits set")
+    alu_opcodes     = [ALU_SLL,     ALU_SRL,     ALU_SRA,     ALU_SRA,     ALU_SRL]
+    operands_a      = [0x1,         0x8000_0000, 0x8000_0000, 0x4000_0000, 0xffff_ffff]
+    shift_amounts   = [0x21,        0xffff_ffff, 0x404,       0x41f,       0x20]
+    expected_results= [0x2,         0x1,         0xf800_0000, 0x0,         0xffff_ffff]
+
+    for alu_opcode, operand_a, shift_amount, expected_result in zip(alu_opcodes, operands_a, shift_amounts, expected_results):
+            dut.operator_i.value    = alu_opcode
+            dut.operand_a_i.value   = operand_a
+            dut.operand_b_i.value   = shift_amount
+
+            await settle()
+
+            actual_result   = int(dut.result_o.value)
+
+            assert expected_result == actual_result, \
+                f"ALU opcode {alu_opcode}: {hex(operand_a)} shifted by {hex(shift_amount)} = {hex(expected_result)}, got {hex(actual_result)}"
+
+
     # signed comparison
     print("Testing signed comparisons")
     operands_a = [0,1,-1]
@@ -210,7 +262,7 @@ async def test_alu(dut):
                 dut.operand_a_i.value = operand_a
                 dut.operand_b_i.value = operand_b
 
-                await Timer(CLK_PRD, units='ns')
+                await settle()
                 
                 expected_result = int(py_operator(operand_a, operand_b))
                 actual_result   = int(dut.result_o.value)
@@ -218,10 +270,10 @@ async def test_alu(dut):
                 assert expected_result == actual_result, \
                     f"Comparison {hex(alu_opcode)}: {operand_a:x} {py_operator.__name__} {operand_b:x} = {bool(expected_result)}, got {bool(actual_result)}"
 
-    # unsigned comparisons
+    # unsigned comparisons, operands with the msb set are large, not negative
     print("Testing unsigned comparisons")
-    operands_a = [0,1]
-    operands_b = [0,1]
+    operands_a = [0, 1, 0x7fff_ffff, 0x8000_0000, 0xffff_ffff]
+    operands_b = [0, 1, 0x7fff_ffff, 0x8000_0000, 0xffff_ffff]
 
     alu_opcodes = [ALU_SLTU, ALU_LEU, ALU_GTU, ALU_GEU]
     py_operators = [operator.lt, operator.le, operator.gt, operator.ge]
@@ -234,11 +286,62 @@ async def test_alu(dut):
                 dut.operand_a_i.value = operand_a
                 dut.operand_b_i.value = operand_b
 
-                await Timer(CLK_PRD, units='ns')
+                await settle()
                 
                 expected_result = bool(py_operator(operand_a, operand_b))
                 actual_result   = bool(dut.result_o.value)
 
                 assert expected_result == actual_result, \
                     f"Comparison {hex(alu_opcode)}: {operand_a} {py_operator.__name__} {operand_b} = {expected_result}, got {actual_result}"
-                
\ No newline at end of file
+
+
+
+@cocotb.test()
+async def test_alu_random(dut):
+    """ N_VECTORS random operand pairs per operator against the NumPy reference model """
+
+    width   = len(dut.result_o)
+    rng     = np.random.default_rng(SEED)
+    print(f"Testing {N_VECTORS} random vectors per operator, DATA_WIDTH={width}, SEED={SEED}")
+
+    failures = []
+    for name, operator in alu_model.OPERATORS.items():
+        a, b        = alu_model.random_operands(operator, N_VECTORS, width, rng)
+        expected    = alu_model.alu(operator, a, b, width)
+        actual      = await drive_vectors(dut, operator, a, b)
+
+        report = alu_model.mismatch_report(name, a, b, expected, actual)
+        print(report or f"{name}: {len(a)} vectors passed")
+        if report:
+            failures.append(report)
+
+    assert not failures, "\n".join(failures)
+
+
+
+@cocotb.test(skip=DATA_WIDTH > EXHAUSTIVE_MAX_WIDTH)
+async def test_alu_exhaustive(dut):
+    """ Every operand pair for every operator of a reduced width ALU, make TOP=alu DATA_WIDTH=8 """
+
+    width       = len(dut.result_o)
+    a, b        = alu_model.exhaustive_operands(width)
+    coverage    = alu_model.CoverageBitmap(width)
+    print(f"Sweeping {len(a)} operand pairs per operator, DATA_WIDTH={width}")
+
+    failures = []
+    summary  = []
+    for name, operator in alu_model.OPERATORS.items():
+        expected    = alu_model.alu(operator, a, b, width)
+        actual      = await drive_vectors(dut, operator, a, b, coverage)
+
+        report = alu_model.mismatch_report(name, a, b, expected, actual, limit=3)
+        if report:
+            failures.append(report)
+        summary.append(f"  {name:<6}{int((expected != actual).sum()):>10}{coverage.covered(name):>10.1%}")
+
+    print(f"  {'op':<6}{'failed':>10}{'covered':>10}")
+    print("\n".join(summary))
+    print(f"operand pair coverage {coverage.covered():.1%}")
+
+    assert coverage.covered() == 1.0, f"coverage holes, e.g. ADD {coverage.holes('ADD')}"
+    assert not failures, "\n".join(failures)
@@ -1,25 +1,13 @@
 import cocotb
-from utils import assert_response, set_current_instr, print_signal
-from cocotb.triggers import Timer
-
-CLK_PRD = 10
-
-
-async def generate_clock(dut):
-    """ Generate clock signal """
-    
-    for cycle in range(100):
-        dut.clk.value = 0
-        await Timer(0.5*CLK_PRD, units='ns')  # suspend execution
-        dut.clk.value = 1
-        await Timer(0.5*CLK_PRD, units='ns')
+from utils import print_signal
+from harness import start_clock, wait_cycles
 
 
 
 @cocotb.test()
 async def test_data_cache(dut):
 
-    await cocotb.start(generate_clock(dut))     # run in background/parallel
+    start_clock(dut.clk)
 
     values = [1, 2, 512, 65536]
     bes = [0b0001, 0b0001, 0b0011, 0b1111]
@@ -34,7 +22,7 @@ async def test_data_cache(dut):
         dut.we_i.value          = 1
         dut.be_i.value          = be
 
-        await Timer(CLK_PRD, units='ns')
+        await wait_cycles(dut.clk)
 
 
     # read    
@@ -44,7 +32,7 @@ async def test_data_cache(dut):
     for value, addr in zip(values, addrs):
         dut.addr_i.value    = addr
 
-        await Timer(CLK_PRD, units='ns')
+        await wait_cycles(dut.clk)
         print_signal(dut.data_o)
         # assert_response(dut.data_o , value)
 
@@ -1,21 +1,17 @@
+import os
 import cocotb
 import numpy as np
 import rv_instructions as rv
+import rv_disasm
+import rv_compact
+import decoder_model
 from utils import assert_response, set_current_instr
 from constants_pkg import *
 from cocotb.triggers import Timer
+from harness import start_clock, reset, wait_cycles, Decoder
 
-CLK_PRD = 10
-
-async def generate_clock(dut):
-    """ Generate clock signal """
-    
-    for cycle in range(100):
-        dut.clk.value = 0
-        await Timer(0.5*CLK_PRD, units='ns')  # suspend execution
-        dut.clk.value = 1
-        await Timer(0.5*CLK_PRD, units='ns')
 
+SEED = int(os.environ.get("SEED", np.random.SeedSequence().entropy % 2**32))
 
 
 async def test_decoding_stores(dut):
@@ -31,7 +27,7 @@ async def test_decoding_stores(dut):
         dut.instr_i.value = instr.get_binary_string()
         set_current_instr(instr)
 
-        await Timer(CLK_PRD, units='ns')
+        await wait_cycles(dut.clk)
 
         if width >= 3:
             assert_response(dut.instr_invalid_o, True)
@@ -66,7 +62,7 @@ async def test_decoding_invalid_instructions(dut):
 
     dut.instr_i.value = 0
 
-    await Timer(CLK_PRD, units='ns')
+    await wait_cycles(dut.clk)
 
     assert_response(dut.instr_invalid_o, True)
     assert_response(dut.rs1_used_o, False)  
@@ -89,7 +85,7 @@ async def test_decoding_itypes(dut):
     dut.instr_i.value = instr.get_binary_string()
     set_current_instr(instr)
 
-    await Timer(CLK_PRD, units='ns')
+    await wait_cycles(dut.clk)
 
     assert_response(dut.alu_operator_o, ALU_ADD)
     assert_response(dut.rs1_used_o, True) 
@@ -111,7 +107,7 @@ async def test_decoding_itypes(dut):
     instr = rv.AddiInstr(rd, rs1, imm12)
     dut.instr_i.value = instr.get_binary_string()
 
-    await Timer(CLK_PRD, units='ns')
+    await wait_cycles(dut.clk)
 
     assert_response(dut.alu_operator_o, ALU_ADD)
     assert_response(dut.rs1_used_o, True)  
@@ -133,7 +129,7 @@ async def test_decoding_itypes(dut):
     instr = rv.SlliInstr(rd, rs1, imm12)
     dut.instr_i.value = instr.get_binary_string()
 
-    await Timer(CLK_PRD, units='ns')
+    await wait_cycles(dut.clk)
 
     assert_response(dut.alu_operator_o, ALU_SLL)
     assert_response(dut.rs1_used_o, True)  
@@ -164,7 +160,7 @@ async def test_decoding_rtypes(dut):
     dut.instr_i.value = instr.get_binary_string()
     # set_current_instr(instr)
 
-    await Timer(CLK_PRD, units='ns')
+    await wait_cycles(dut.clk)
 
     assert_response(dut.alu_operator_o, ALU_ADD)
     assert_response(dut.rs1_used_o, True)  
@@ -190,7 +186,7 @@ async def test_decoding_lui_auipc(dut):
     dut.instr_i.value = instr.get_binary_string()
     set_current_instr(instr)
 
-    await Timer(CLK_PRD, units='ns')
+    await wait_cycles(dut.clk)
 
     assert_response(dut.instr_invalid_o, False)
 
@@ -209,7 +205,7 @@ async def test_decoding_lui_auipc(dut):
     lui = rv.UType(imm20, rd, OPC_AUIPC)
     dut.instr_i.value = lui.get_binary_string()
 
-    await Timer(CLK_PRD, units='ns')
+    await wait_cycles(dut.clk)
 
     assert_response(dut.instr_invalid_o, False)
 
@@ -244,7 +240,7 @@ async def test_decoding_branches(dut):
 
         print("Branch %x" %(b_type) )
 
-        await Timer(CLK_PRD, units='ns')
+        await wait_cycles(dut.clk)
 
         assert_response(dut.instr_invalid_o, False)
 
@@ -262,7 +258,7 @@ async def test_decoding_branches(dut):
     b_instr = rv.BType(offset, rs2, rs1, F3_BLT)
     dut.instr_i.value = b_instr.get_binary_string()
 
-    await Timer(CLK_PRD, units='ns')
+    await wait_cycles(dut.clk)
 
     assert_response(dut.instr_invalid_o, False)
 
@@ -290,7 +286,7 @@ async def test_decoding_jal_jalr(dut):
         dut.instr_i.value = instr.get_binary_string()
         set_current_instr(instr)
 
-        await Timer(CLK_PRD, units='ns')
+        await wait_cycles(dut.clk)
 
         assert_response(dut.instr_invalid_o, False)
 
@@ -318,7 +314,7 @@ async def test_decoding_jal_jalr(dut):
         set_current_instr(instr)
 
 
-        await Timer(CLK_PRD, units='ns')
+        await wait_cycles(dut.clk)
 
         assert_response(dut.instr_invalid_o, False)
 
@@ -338,22 +334,23 @@ async def test_decoding_jal_jalr(dut):
 async def test_decoding_loads(dut):
     print("Testing decoding of loads")
 
-    offset = 4
+    offset = -4                 # sign extended for lbu and lhu too, only the loaded data is zero extended
     rs1     = 1
     rd      = 2
 
-    for width in range(4):
+    for width in range(8):
         instr = rv.LoadInstr(offset, rs1, width, rd)
         dut.instr_i.value = instr.get_binary_string()
         set_current_instr(instr)
 
-        await Timer(CLK_PRD, units='ns')
+        await wait_cycles(dut.clk)
 
-        if width >= 3:
+        if width in (0b011, 0b110, 0b111):              # reserved
             assert_response(dut.instr_invalid_o, True)
         else:
             assert_response(dut.instr_invalid_o, False)
-            assert_response(dut.data_type_o, width)
+            assert_response(dut.data_type_o, width & 0b11)
+            assert_response(dut.data_sign_ext_o, width not in (F3_LBU, F3_LHU))
             
         # RF
         assert_response(dut.rs1_used_o, True)  
@@ -376,19 +373,138 @@ async def test_decoding_loads(dut):
 
 
 
+async def test_decoding_invalid_encodings(dut):
+    print("Testing decoding of reserved funct7 and funct3 values")
+
+    rs1 = 1
+    rs2 = 2
+    rd  = 3
+
+    instrs = [
+        rv.RType(rs2, rs1, F3_ADD_SUB, rd, funct7=0b000_0001),           # funct7 other than 0 and 0x20
+        rv.RType(rs2, rs1, F3_XOR, rd, funct7=F7_SUB_SRA),               # only sub and sra set bit 30
+        rv.IType(F7_SUB_SRA << 5 | 1, rs1, F3_SLL, rd),                  # slli with funct7 of srai
+        rv.IType(0b000_0001 << 5 | 1, rs1, F3_SRL_SRA, rd),              # srli/srai with an unknown funct7
+        rv.IType(4, rs1, 0b001, rd, opcode=OPC_JALR),                    # jalr funct3 other than 0
+    ]
+
+    for instr in instrs:
+        dut.instr_i.value = instr.get_binary_string()
+        set_current_instr(instr)
+
+        await wait_cycles(dut.clk)
+
+        assert_response(dut.instr_invalid_o, True)
+
+    print("Testing the valid neighbours of the reserved encodings")
+
+    instrs = [rv.SubInstr(rd, rs1, rs2), rv.SraInstr(rd, rs1, rs2), rv.SraiInstr(rd, rs1, 1), rv.SlliInstr(rd, rs1, 31)]
+
+    for instr in instrs:
+        dut.instr_i.value = instr.get_binary_string()
+        set_current_instr(instr)
+
+        await wait_cycles(dut.clk)
+
+        assert_response(dut.instr_invalid_o, False)
+
+
+
+async def test_batch_encoding(dut):
+    print("Testing batch encoder against the instruction classes and their compact variants")
+
+    rng = np.random.default_rng()
+    n   = 64
+
+    rd      = rng.integers(0, 32, n)
+    rs1     = rng.integers(0, 32, n)
+    rs2     = rng.integers(0, 32, n)
+    imm12   = rng.integers(-2**11, 2**11, n)
+    shamt   = rng.integers(0, 32, n)
+    imm20   = rng.integers(0, 2**20, n)
+    b_off   = rng.integers(-2**11, 2**11, n) << 1
+    j_off   = rng.integers(-2**19, 2**19, n) << 1
+
+    # mnemonic: (batch fields, per object constructor, expected alu operator)
+    cases = {
+        'ADD'   : (dict(rd=rd, rs1=rs1, rs2=rs2),   lambda m, k: m.AddInstr(rd[k], rs1[k], rs2[k]),           ALU_ADD),
+        'SUB'   : (dict(rd=rd, rs1=rs1, rs2=rs2),   lambda m, k: m.SubInstr(rd[k], rs1[k], rs2[k]),           ALU_SUB),
+        'SLT'   : (dict(rd=rd, rs1=rs1, rs2=rs2),   lambda m, k: m.SltInstr(rd[k], rs1[k], rs2[k]),           ALU_SLT),
+        'SLTU'  : (dict(rd=rd, rs1=rs1, rs2=rs2),   lambda m, k: m.SltuInstr(rd[k], rs1[k], rs2[k]),          ALU_SLTU),
+        'SLL'   : (dict(rd=rd, rs1=rs1, rs2=rs2),   lambda m, k: m.SllInstr(rd[k], rs1[k], rs2[k]),           ALU_SLL),
+        'SRL'   : (dict(rd=rd, rs1=rs1, rs2=rs2),   lambda m, k: m.SrlInstr(rd[k], rs1[k], rs2[k]),           ALU_SRL),
+        'SRA'   : (dict(rd=rd, rs1=rs1, rs2=rs2),   lambda m, k: m.SraInstr(rd[k], rs1[k], rs2[k]),           ALU_SRA),
+        'ADDI'  : (dict(rd=rd, rs1=rs1, imm=imm12), lambda m, k: m.AddiInstr(rd[k], rs1[k], int(imm12[k])),   ALU_ADD),
+        'SLTIU' : (dict(rd=rd, rs1=rs1, imm=imm12), lambda m, k: m.SltiuInstr(rd[k], rs1[k], int(imm12[k])),  ALU_SLTU),
+        'SRLI'  : (dict(rd=rd, rs1=rs1, imm=shamt), lambda m, k: m.SrliInstr(rd[k], rs1[k], int(shamt[k])),   ALU_SRL),
+        'SRAI'  : (dict(rd=rd, rs1=rs1, imm=shamt), lambda m, k: m.SraiInstr(rd[k], rs1[k], int(shamt[k])),   ALU_SRA),
+        'LB'    : (dict(rd=rd, rs1=rs1, imm=imm12), lambda m, k: m.LbInstr(rd[k], rs1[k], int(imm12[k])),     ALU_ADD),
+        'LH'    : (dict(rd=rd, rs1=rs1, imm=imm12), lambda m, k: m.LhInstr(rd[k], rs1[k], int(imm12[k])),     ALU_ADD),
+        'LW'    : (dict(rd=rd, rs1=rs1, imm=imm12), lambda m, k: m.LwInstr(rd[k], rs1[k], int(imm12[k])),     ALU_ADD),
+        'LBU'   : (dict(rd=rd, rs1=rs1, imm=imm12), lambda m, k: m.LbuInstr(rd[k], rs1[k], int(imm12[k])),    ALU_ADD),
+        'LHU'   : (dict(rd=rd, rs1=rs1, imm=imm12), lambda m, k: m.LhuInstr(rd[k], rs1[k], int(imm12[k])),    ALU_ADD),
+        'SB'    : (dict(rs1=rs1, rs2=rs2, imm=imm12), lambda m, k: m.SbInstr(rs2[k], rs1[k], int(imm12[k])),  ALU_ADD),
+        'SH'    : (dict(rs1=rs1, rs2=rs2, imm=imm12), lambda m, k: m.ShInstr(rs2[k], rs1[k], int(imm12[k])),  ALU_ADD),
+        'SW'    : (dict(rs1=rs1, rs2=rs2, imm=imm12), lambda m, k: m.SwInstr(rs2[k], rs1[k], int(imm12[k])),  ALU_ADD),
+        'BEQ'   : (dict(rs1=rs1, rs2=rs2, imm=b_off), lambda m, k: m.BeqInstr(rs1[k], rs2[k], int(b_off[k])), ALU_EQ),
+        'BNE'   : (dict(rs1=rs1, rs2=rs2, imm=b_off), lambda m, k: m.BneInstr(rs1[k], rs2[k], int(b_off[k])), ALU_NE),
+        'BLT'   : (dict(rs1=rs1, rs2=rs2, imm=b_off), lambda m, k: m.BltInstr(rs1[k], rs2[k], int(b_off[k])), ALU_SLT),
+        'BGE'   : (dict(rs1=rs1, rs2=rs2, imm=b_off), lambda m, k: m.BgeInstr(rs1[k], rs2[k], int(b_off[k])), ALU_GES),
+        'BLTU'  : (dict(rs1=rs1, rs2=rs2, imm=b_off), lambda m, k: m.BltuInstr(rs1[k], rs2[k], int(b_off[k])), ALU_SLTU),
+        'BGEU'  : (dict(rs1=rs1, rs2=rs2, imm=b_off), lambda m, k: m.BgeuInstr(rs1[k], rs2[k], int(b_off[k])), ALU_GEU),
+        'LUI'   : (dict(rd=rd, imm=imm20),          lambda m, k: m.LuiInstr(rd[k], int(imm20[k])),            ALU_ADD),
+        'AUIPC' : (dict(rd=rd, imm=imm20),          lambda m, k: m.AuipcInstr(rd[k], int(imm20[k])),          ALU_ADD),
+        'JAL'   : (dict(rd=rd, imm=j_off),          lambda m, k: m.JalInstr(int(rd[k]), int(j_off[k])),       ALU_ADD),
+        'JALR'  : (dict(rd=rd, rs1=rs1, imm=imm12), lambda m, k: m.JalrInstr(rd[k], rs1[k], int(imm12[k])),   ALU_ADD),
+    }
+
+    for mnemonic, (fields, make_instr, alu_op) in cases.items():
+        words = rv.encode(mnemonic, **fields)
+
+        decoded = rv_disasm.decode(words)
+        assert (decoded['mnemonic'] == rv_disasm.MNEMONICS.index(mnemonic)).all(), \
+            f"{mnemonic}: disassembled as {set(rv_disasm.disassemble(words))}"
+
+        for name, values in fields.items():
+            expected = np.asarray(values, dtype=np.int64)
+            if name == 'imm' and mnemonic in ('LUI', 'AUIPC'):          # decoded as the shifted upper immediate
+                expected = ((expected << 12) & 0xFFFF_FFFF).astype(np.uint32).view(np.int32)
+            mismatch = np.flatnonzero(decoded[name] != expected)
+            assert len(mismatch) == 0, \
+                f"{mnemonic}: {name} decoded as {int(decoded[name][mismatch[0]])}, encoded {int(expected[mismatch[0]])}"
+
+        for k, word in enumerate(words):
+            instr = make_instr(rv, k)
+            set_current_instr(instr)
+            assert int(word) == instr.get_binary_string(), \
+                f"{mnemonic}: batch encoded {int(word):#010x}, {type(instr).__name__} encoded {instr.get_binary_string():#010x}"
+
+            compact = make_instr(rv_compact, k)
+            assert compact.get_binary_string(True) == instr.get_binary_string(True), \
+                f"{mnemonic}: compact object encoded {compact.get_binary_string(True)}, expected {instr.get_binary_string(True)}"
+
+            dut.instr_i.value = int(word)
+
+            await wait_cycles(dut.clk)
+
+            assert_response(dut.instr_invalid_o, False)
+            assert_response(dut.alu_operator_o, alu_op)
+
+
+
 ####################### TESTBENCH #####################################
 
 @cocotb.test()
 async def test_decoder(dut):
 
-    await cocotb.start(generate_clock(dut))     # run in background/parallel
+    dut = Decoder.of(dut)                      # cached signal handles
+    start_clock(dut.clk)
 
     
     dut.instr_i.value         = 0
 
-    await Timer(3*CLK_PRD, units='ns')
     print("Test Reset")
-    dut.rst_n.value = 1                              # release reset
+    await reset(dut.clk, dut.rst_n)
 
     await test_decoding_invalid_instructions(dut)
     await test_decoding_itypes(dut)
@@ -397,4 +513,35 @@ async def test_decoder(dut):
     await test_decoding_branches(dut)
     await test_decoding_jal_jalr(dut)
     await test_decoding_stores(dut)
-    await test_decoding_loads(dut)
\ No newline at end of file
+    await test_decoding_loads(dut)
+    await test_decoding_invalid_encodings(dut)
+    await test_batch_encoding(dut)
+
+
+
+@cocotb.test()
+async def test_decoder_exhaustive(dut):
+    """ Every opcode/funct3/funct7 combination with random register fields against decoder_model """
+
+    dut     = Decoder.of(dut)
+    ports   = [getattr(dut, port) for port in decoder_model.PORTS]
+    step    = Timer(1, 'step')                  # the decoder is combinational
+    rng     = np.random.default_rng(SEED)
+
+    failures = []
+    n_words  = 0
+    for words in decoder_model.sweep_words(rng):
+        actual = np.empty(len(words), dtype=decoder_model.EXPECTED_DTYPE)
+
+        for k, word in enumerate(words.tolist()):
+            dut.instr_i.value = word
+            await step
+            actual[k] = tuple(int(port.value) for port in ports)
+
+        report = decoder_model.compare(words, actual, limit=2)
+        if report:
+            failures.append(report)
+        n_words += len(words)
+
+    print(f"Swept {n_words} instruction words, SEED={SEED}, {len(failures)} chunks with mismatches")
+    assert not failures, "\n".join(failures[:8])
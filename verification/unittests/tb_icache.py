@@ -1,35 +1,23 @@
 import cocotb
-from utils import assert_response, set_current_instr, print_signal
-from cocotb.triggers import Timer
+import memory_image
+from harness import start_clock, wait_cycles
 
-CLK_PRD = 10
-N_CYCLES = 1000
 
-
-async def generate_clock(dut):
-    """ Generate clock signal """
-    
-    for cycle in range(100):
-        dut.clk.value = 0
-        await Timer(0.5*CLK_PRD, units='ns')  # suspend execution
-        dut.clk.value = 1
-        await Timer(0.5*CLK_PRD, units='ns')
+HEX_FILE = "verification/system/build/test_program.hex"     # image loaded by icache
 
 
 
 @cocotb.test()
 async def test_instruction_rom(dut):
 
-    await cocotb.start(generate_clock(dut))     # run in background/parallel
-
-    for addr in range (0x10074, 0x10090):
-        dut.addr_i.value = addr
-
-        print(hex(dut.data_o.value))
-
-        await Timer(CLK_PRD, units='ns')
-
-
-
+    start_clock(dut.clk)
 
+    # every word of the image at the addresses objcopy placed it
+    for segment in memory_image.read_image(HEX_FILE).code:
+        for offset, word in enumerate(memory_image.segment_words(segment)):
+            addr = segment.addr + 4*offset
+            dut.addr_i.value = addr
 
+            await wait_cycles(dut.clk)
+            print(f"{addr:#x}: {int(dut.data_o.value):#010x}")
+            assert dut.data_o.value == int(word), f"{addr:#x}: expected {int(word):#010x}, got {int(dut.data_o.value):#010x}"
@@ -1,25 +1,14 @@
 import cocotb
-from utils import assert_response, set_current_instr, print_signal
-from cocotb.triggers import Timer
-
-CLK_PRD = 10
-
-
-async def generate_clock(dut):
-    """ Generate clock signal """
-    
-    for cycle in range(100):
-        dut.clk.value = 0
-        await Timer(0.5*CLK_PRD, units='ns')  # suspend execution
-        dut.clk.value = 1
-        await Timer(0.5*CLK_PRD, units='ns')
+from utils import print_signal, assert_response
+from harness import start_clock, wait_cycles, LoadStoreUnit
 
 
 
 @cocotb.test()
 async def test_load_store_unit(dut):
 
-    await cocotb.start(generate_clock(dut))     # run in background/parallel
+    dut = LoadStoreUnit.of(dut)                      # cached signal handles
+    start_clock(dut.clk)
 
     values = [1, 2, 512, 65536, 2, 512]
     data_types = [0, 0, 1, 2, 0, 1]
@@ -37,7 +26,7 @@ async def test_load_store_unit(dut):
         print_signal(dut.wdata_i)
         dut.we_i.value          = 1
         dut.data_type_i.value   = data_type
-        await Timer(CLK_PRD, units='ns')
+        await wait_cycles(dut.clk)
          
         addr = addr + 2^data_type           # use data type as offset 
 
@@ -52,7 +41,7 @@ async def test_load_store_unit(dut):
         dut.addr_i.value        = addr
         dut.data_type_i.value   = data_type
 
-        await Timer(CLK_PRD, units='ns')
+        await wait_cycles(dut.clk)
         print_signal(dut.rdata_ext_o)
 
         addr = addr + 2^data_type
@@ -79,7 +68,7 @@ async def test_load_store_unit(dut):
         print()
         dut.we_i.value          = 1
         dut.data_type_i.value   = data_type
-        await Timer(CLK_PRD, units='ns')
+        await wait_cycles(dut.clk)
          
         addr = addr + 2^data_type
 
@@ -94,7 +83,7 @@ async def test_load_store_unit(dut):
         dut.addr_i.value        = addr
         dut.data_type_i.value   = data_type
 
-        await Timer(CLK_PRD, units='ns')
+        await wait_cycles(dut.clk)
         print_signal(dut.rdata_ext_o)
 
         addr = addr + 2^data_type
@@ -1,23 +1,12 @@
 import cocotb
-from cocotb.triggers import Timer
+from harness import start_clock, reset, wait_cycles
 
-CLK_PRD = 10
-
-
-async def generate_clock(dut):
-    """ Generate clock signal """
-    
-    for cycle in range(100):
-        dut.clk.value = 0
-        await Timer(0.5*CLK_PRD, units='ns')  # suspend execution
-        dut.clk.value = 1
-        await Timer(0.5*CLK_PRD, units='ns')
 
 
 @cocotb.test()
 async def test_program_counter(dut):
 
-    await cocotb.start(generate_clock(dut))     # run in background/parallel
+    start_clock(dut.clk)
 
     
     dut.rst_n.value        = 0
@@ -25,24 +14,23 @@ async def test_program_counter(dut):
     dut.is_jalr_i.value     = 0
     dut.tgt_addr_i.value    = 0
 
-    await Timer(3*CLK_PRD, units='ns')
     print("Test Reset")
-    dut.rst_n.value = 1                              # release reset
+    await reset(dut.clk, dut.rst_n)
     assert dut.pc_o.value == 0x0, f"Expected pc_o=0x0, but got {hex(dut.pc_o.value)}"
 
     print("Test Sequential Code execution")
-    await Timer(3*CLK_PRD, units='ns')       
+    await wait_cycles(dut.clk, 3)       
     assert dut.pc_o.value == 3*4, f"Expected pc_o={hex(3*4)}, but got {hex(dut.pc_o.value)}"       
 
     print("Test Branch Taken")
     dut.branch_tkn_i.value  = 1
     dut.tgt_addr_i.value    = 0x100
-    await Timer(CLK_PRD, units='ns')
+    await wait_cycles(dut.clk)
     assert dut.pc_o.value == 0x100, f"Expected pc_o=0x100, but got {hex(dut.pc_o.value)}"
 
     print("Test continue sequential execution after branch")
     dut.branch_tkn_i.value  = 0
-    await Timer(2*CLK_PRD, units='ns')       
+    await wait_cycles(dut.clk, 2)       
     assert dut.pc_o.value == (0x100 + 2*4), f"Expected pc_o={hex(0x100 + 2*4)}, but got {hex(dut.pc_o.value)}" 
 
     print("Test Jump and link register")
@@ -1,42 +1,24 @@
 import cocotb
-from cocotb.triggers import Timer
+import system_tests
+from system_tests import COSIM, PROGRAMS
 
 
-CLK_PRD = 10
+# the tests are shared with tb_soc.py, see system_tests.py
 
-N_CYCLES = 1000
-
-
-async def generate_clock(dut):
-    """ Generate clock signal """
-    
-    for cycle in range(N_CYCLES):
-        dut.clk.value = 1
-        await Timer(0.5*CLK_PRD, units='ns')  # suspend execution
-        dut.clk.value = 0
-        await Timer(0.5*CLK_PRD, units='ns')
-
-
-@cocotb.test()
+@cocotb.test(skip=COSIM or bool(PROGRAMS))
 async def test_top(dut):
-    dut._log.info("Starting RISC-V CPU test")
-
-    await cocotb.start(generate_clock(dut))     # run in background/parallel
-
+    await system_tests.single_program(dut, dut.soc_i)
 
-    # Reset
-    dut.rst_n.value = 0                             # active low reset                     
 
-    await Timer(3*CLK_PRD, units='ns')
-    print("Test Reset")
-    dut.rst_n.value = 1                              # release reset
 
+@cocotb.test(skip=not COSIM or bool(PROGRAMS))
+async def test_cosim(dut):
+    """ Compare every retired instruction against the reference model, stop at the first mismatch """
+    await system_tests.cosim(dut, dut.soc_i)
 
 
-    # wait for some amount of clock cycles
-    print("Beginning instruction execution")
-    for cycle in range(N_CYCLES):  
-        await Timer(CLK_PRD, units="ns")
 
-    # Check the result in register x31 (success or fail)
-    assert dut.soc_i.core_i.if_id_ex_stage_i.register_file_i.reg_file[31].value == 0xBEEF, "Test failed!"
+@cocotb.test(skip=not PROGRAMS)
+async def test_programs(dut):
+    """ Run every program of PROGRAMS back to back, reloading memory and resetting the core in between """
+    await system_tests.programs(dut, dut.soc_i)
@@ -0,0 +1,102 @@
+"""
+branch_predictor.py against sequential references on random branch streams:
+
+    python -m pytest verification/unittests/test_branch_predictor.py
+
+The references update counters, global history and BTB one transfer after the other, the way
+the hardware would.
+
+"""
+
+import numpy as np
+import branch_predictor as bp
+
+
+def counter_reference(index : np.ndarray, taken : np.ndarray) -> np.ndarray:
+    """ Table of 2 bit saturating counters starting weakly not taken """
+
+    table     = {}
+    predicted = []
+    for k, outcome in zip(index.tolist(), taken.tolist()):
+        state = table.get(k, bp.WEAKLY_NOT_TAKEN)
+        predicted.append(state >= 2)
+        table[k] = min(state + 1, 3) if outcome else max(state - 1, 0)
+    return np.array(predicted, dtype=bool)
+
+
+def gshare_reference(s : bp.Stream, entries : int, history : int) -> np.ndarray:
+    """ pc xor a shift register of the outcomes of the last history conditional branches """
+
+    ghr, index = 0, []
+    for pc, taken in zip(s.pc[s.branch].tolist(), s.taken[s.branch].tolist()):
+        index.append(((pc >> 2) ^ ghr) & (entries - 1))
+        ghr = ((ghr << 1) | int(taken)) & ((1 << history) - 1)
+    return np.array(index, dtype=np.int64)
+
+
+def btb_reference(s : bp.Stream, entries : int) -> np.ndarray:
+    """ Direct mapped table of (pc, target), written by every taken transfer """
+
+    table, hits = {}, []
+    for pc, target, taken in zip(s.pc.tolist(), s.target.tolist(), s.taken.tolist()):
+        entry = (pc >> 2) % entries
+        hits.append(table.get(entry) == (pc, target))
+        if taken:
+            table[entry] = (pc, target)
+    return np.array(hits, dtype=bool)
+
+
+def random_stream(n : int, rng) -> bp.Stream:
+    """ Transfers of a few dozen static branches and jumps, biased directions, jalr with changing targets """
+
+    sites   = 0x10074 + 4 * rng.permutation(256)[:40]
+    kinds   = rng.integers(0, 3, len(sites))                    # branch, jal, jalr
+    bias    = rng.random(len(sites))
+    offset  = rng.integers(-64, 64, len(sites)) * 4
+
+    site    = rng.integers(0, len(sites), n)
+    pc      = sites[site]
+    branch  = kinds[site] == 0
+    jalr    = kinds[site] == 2
+    taken   = ~branch | (rng.random(n) < bias[site])
+    target  = pc + np.where(jalr, rng.integers(0, 3, n) * 4 + offset[site], offset[site])
+    return bp.Stream(pc.astype(np.int64), target.astype(np.int64), taken, branch, jalr)
+
+
+def test_counter_predictions():
+
+    rng = np.random.default_rng(1)
+    for n in (0, 1, 2, 3, 100, 5000):
+        index = rng.integers(0, 8, n)
+        taken = rng.random(n) < rng.random(8)[index]
+        assert np.array_equal(bp.counter_predictions(index, taken), counter_reference(index, taken)), n
+
+
+def test_gshare_index():
+
+    rng = np.random.default_rng(2)
+    s   = random_stream(3000, rng)
+    for entries in (1, 16, 256):
+        for history in (None, 0, 3):
+            bits = history if history is not None else entries.bit_length() - 1
+            assert np.array_equal(bp.gshare_index(s, entries, history), gshare_reference(s, entries, bits)), (entries, history)
+
+
+def test_btb_hits():
+
+    rng = np.random.default_rng(3)
+    for n in (1, 2, 3000):
+        s = random_stream(n, rng)
+        for entries in (1, 4, 16, 64):
+            assert np.array_equal(bp.btb_hits(s, entries), btb_reference(s, entries)), (n, entries)
+
+
+def test_predictors():
+    """ Bimodal and gshare predictions are the counter reference on their table index """
+
+    s = random_stream(3000, np.random.default_rng(4))
+    pc, taken = s.pc[s.branch], s.taken[s.branch]
+    for entries in (16, 256):
+        assert np.array_equal(bp.predict(s, 'bimodal', entries), counter_reference((pc >> 2) & (entries - 1), taken))
+        index = gshare_reference(s, entries, entries.bit_length() - 1)
+        assert np.array_equal(bp.predict(s, 'gshare', entries), counter_reference(index, taken))
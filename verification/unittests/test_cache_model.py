@@ -0,0 +1,61 @@
+"""
+cache_model.py against a sequential reference on random address streams:
+
+    python -m pytest verification/unittests/test_cache_model.py
+
+The reference keeps one OrderedDict of line tags per set, in replacement order.
+
+"""
+
+import collections
+import numpy as np
+import cache_model
+from cache_model import Config
+
+
+def reference(addrs : np.ndarray, config : Config) -> int:
+    """ Misses of an lru or fifo cache, one access after the other """
+
+    sets    = [collections.OrderedDict() for _ in range(config.sets)]
+    misses  = 0
+    for addr in addrs.tolist():
+        line    = addr // config.line
+        ways    = sets[line % config.sets]
+        tag     = line // config.sets
+        if tag in ways:
+            if config.policy == 'lru':
+                ways.move_to_end(tag)
+            continue
+        misses += 1
+        if len(ways) == config.ways:
+            ways.popitem(last=False)
+        ways[tag] = True
+    return misses
+
+
+def random_addrs(n : int, rng) -> np.ndarray:
+    """ Loops over a few regions with random jumps, like fetch and data streams """
+
+    region  = rng.integers(0, 8, n) * 4096
+    offset  = (np.cumsum(rng.integers(0, 3, n)) * 4) % 512
+    return np.where(rng.random(n) < 0.1, rng.integers(0, 1 << 16, n) & ~3, region + offset)
+
+
+def test_lru_fifo():
+
+    rng = np.random.default_rng(1)
+    for _ in range(5):
+        addrs = random_addrs(int(rng.integers(1, 3000)), rng)
+        for config in cache_model.configs(sizes=(64, 256, 1024), lines=(4, 16), ways=(1, 2, 4), policies=('lru', 'fifo')):
+            assert cache_model.misses(addrs, config) == reference(addrs, config), config
+
+
+def test_random_policy_bounds():
+    """ Random replacement has no sequential reference, it misses at least once per line and at most per access """
+
+    rng   = np.random.default_rng(2)
+    addrs = random_addrs(3000, rng)
+    for config in cache_model.configs(sizes=(256, 1024), lines=(4, 16), ways=(2, 4), policies=('random',)):
+        lines   = len(np.unique(addrs // config.line))
+        misses  = cache_model.misses(addrs, config)
+        assert lines <= misses <= len(addrs), config
@@ -0,0 +1,101 @@
+"""
+pipeline_model.py against a cycle by cycle reference on random traces with many hazards:
+
+    python -m pytest verification/unittests/test_pipeline_model.py
+
+The reference issues one instruction after the other and delays each until all of its source
+operands are available, it knows nothing about producer distances or coupled stalls.
+
+"""
+
+import numpy as np
+import rv_instructions as rv
+import pipeline_model
+from commit_trace import TRACE_DTYPE
+
+
+REGISTERS   = 4                     # x0..x3, most operands have a producer close by
+MNEMONICS   = ('ADD', 'ADDI', 'LW', 'SW', 'BEQ', 'JAL', 'JALR', 'LUI')
+JUMP        = 64                    # bytes between a taken transfer and its target
+
+
+def random_trace(n : int, rng) -> np.ndarray:
+    """ Commit trace records of a random instruction stream, branches taken at random """
+
+    mnemonics   = rng.choice(MNEMONICS, n)
+    rd          = rng.integers(0, REGISTERS, n)
+    rs1         = rng.integers(0, REGISTERS, n)
+    rs2         = rng.integers(0, REGISTERS, n)
+    imm         = rng.integers(-8, 8, n) * 4
+
+    records     = np.zeros(n, dtype=TRACE_DTYPE)
+    for mnemonic in MNEMONICS:
+        k = mnemonics == mnemonic
+        records['instr'][k] = rv.encode(mnemonic, rd=rd[k], rs1=rs1[k], rs2=rs2[k], imm=imm[k])
+
+    writes      = ~np.isin(mnemonics, ['SW', 'BEQ'])
+    records['rd'] = np.where(writes, rd, 0)
+
+    taken       = np.isin(mnemonics, ['JAL', 'JALR']) | ((mnemonics == 'BEQ') & (rng.random(n) < 0.5))
+    records['pc'] = 0x10074 + np.cumsum(np.r_[0, np.where(taken, JUMP, 4)[:-1]])
+    return records
+
+
+def reference(records : np.ndarray, p : pipeline_model.Pipeline) -> pipeline_model.Result:
+    """ Issue cycle of every instruction in order, the earliest at which all its operands are available """
+
+    t       = pipeline_model._analyze(records)
+    n       = len(t.pc)
+    issue   = [0] * n                   # cycle the instruction is fetched
+    data    = control = load_use = 0
+    regfile = p.writeback - p.decode
+
+    for i in range(n):
+        earliest = 0
+        if i:
+            flushed  = (p.execute - 1 if t.branch[i - 1] or t.jalr[i - 1] else 0) + (p.jump - 1 if t.jal[i - 1] else 0)
+            control += flushed
+            earliest = issue[i - 1] + 1 + flushed
+        in_order = earliest
+        behind_load = 0                                         # cycles the operands of the load before need
+
+        for k in range(2):
+            rs = int(t.rs[k][i])
+            j  = next((j for j in range(i - 1, -1, -1) if t.rd[j] == rs), None) if rs else None
+            if j is None:
+                continue
+            distance = regfile                                  # writeback, then decode in the same cycle
+            if p.forwarding:
+                ready    = p.memory if t.load[j] else p.execute
+                need     = p.memory if k == 1 and t.store[i] else p.execute
+                distance = min(distance, ready - need + 1)      # end of the producer's stage, start of the consumer's
+            earliest = max(earliest, issue[j] + distance)
+            if j == i - 1 and t.load[j]:
+                behind_load = max(behind_load, issue[j] + distance - in_order)
+
+        issue[i]  = earliest
+        data     += earliest - in_order
+        load_use += behind_load
+
+    cycles = issue[-1] + p.stages if n else 0
+    return pipeline_model.Result(p.name, n, cycles, cycles / n if n else 0.0, data, load_use, control)
+
+
+def test_random_traces():
+
+    rng = np.random.default_rng(1)
+    for _ in range(20):
+        records = random_trace(int(rng.integers(1, 400)), rng)
+        for p, result in zip(pipeline_model.PIPELINES, pipeline_model.evaluate_all(records)):
+            assert result == reference(records, p), p.name
+
+
+def test_deep_pipeline():
+    """ Producers farther back than memory - execute + 1, the max_d cutoff of the forwarding case """
+
+    deep = pipeline_model.Pipeline('7-stage', 7, 2, 3, 6, 7, 2, True)
+    rng  = np.random.default_rng(2)
+    for _ in range(20):
+        records = random_trace(200, rng)
+        for p in (deep, deep._replace(name='7-stage-nofwd', forwarding=False)):
+            assert pipeline_model.evaluate(records, p) == reference(records, p), p.name
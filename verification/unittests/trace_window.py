@@ -0,0 +1,81 @@
+"""
+Waveform of the last cycles before a failure, for runs without simulator tracing (make TRACE=window).
+
+A CoreMonitor listener keeps the samples of the last N cycles in a ring buffer. Passing runs
+cost one append per cycle and write nothing, a failing test writes the window as a VCD file
+with one signal per Sample field, time in ns as in the simulation:
+
+    window = TraceWindow(1000)
+    monitor.listeners.insert(0, window)
+    ...
+    if error:
+        window.write_vcd("window.vcd")
+
+"""
+
+import collections
+import harness
+from core_monitor import Sample
+
+
+# VCD width of each Sample field
+WIDTHS = {
+    'pc'            : 32,
+    'instr'         : 32,
+    'rd'            : 5,
+    'rd_value'      : 32,
+    'instr_invalid' : 1,
+    'mem_req'       : 1,
+    'mem_we'        : 1,
+    'mem_addr'      : 32,
+    'mem_wdata'     : 32,
+    'mem_be'        : 4,
+}
+
+
+def _value(value : int, width : int, ident : str) -> str:
+    if width == 1:
+        return f"{int(value)}{ident}"
+    return f"b{int(value):b} {ident}"
+
+
+class TraceWindow:
+    """ Listener keeping the samples of the last cycles """
+
+    def __init__(self, cycles : int = 1000):
+        self.samples = collections.deque(maxlen=cycles)
+
+
+    def __call__(self, sample : Sample):
+        self.samples.append(sample)
+        return None
+
+
+    def clear(self):
+        self.samples.clear()
+
+
+    def write_vcd(self, path : str, scope : str = 'core'):
+        """ Samples as VCD, a clock plus one signal per field, changes only """
+
+        idents = {name : chr(ord('"') + k) for k, name in enumerate(WIDTHS)}      # '!' is the clock
+        period = harness.CLK_PRD
+
+        with open(path, 'w') as f:
+            f.write("$timescale 1ns $end\n")
+            f.write(f"$scope module {scope} $end\n")
+            f.write("$var wire 1 ! clk $end\n")
+            for name, width in WIDTHS.items():
+                f.write(f"$var wire {width} {idents[name]} {name} $end\n")
+            f.write("$upscope $end\n$enddefinitions $end\n")
+
+            last = {}
+            for sample in self.samples:
+                # sampled at the falling edge of cycle, committed at the next rising edge
+                f.write(f"#{sample.cycle * period}\n0!\n")
+                for name, width in WIDTHS.items():
+                    value = getattr(sample, name)
+                    if last.get(name) != value:
+                        f.write(_value(value, width, idents[name]) + "\n")
+                        last[name] = value
+                f.write(f"#{sample.cycle * period + period // 2}\n1!\n")